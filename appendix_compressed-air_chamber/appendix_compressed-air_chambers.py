@@ -16,10 +16,16 @@ __email__ = "e.zillen@student.tudelft.nl"
 
 
 # #### Imports
-import math
 import pandas as pd
 import matplotlib.pyplot as plt
-import numpy as np
+import os
+import sys
+
+# The shared signal processing code is kept with the results of the pneumatic actuator
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'results_pneumatic-actuator'))
+from archive import read_acquisition
+from filtering import savgol
+from resampling import resample, resample_run
 
 
 # #### Global variables
@@ -36,8 +42,8 @@ air_chambers = {}
 
 # For each model type
 for model in models:
-    # Load the data of the corresponding results in .CSV and drop unnecessary columns
-    model_df = pd.read_csv(f'./data/{model}.csv',delimiter=';',header=None,names=(['Time','A','Pressure']))
+    # Load the data of the corresponding results in .CSV (also when compressed or archived) and drop unnecessary columns
+    model_df = read_acquisition(f'./data/{model}.csv',delimiter=';',header=None,names=(['Time','A','Pressure']))
     model_df.drop(columns=['A'],axis=1,inplace=True)
 
     # Store the data in our larger dictionary
@@ -48,9 +54,18 @@ for model in models:
     air_chambers[model]['Time'] = air_chambers[model]['Time'].head(1400)
     air_chambers[model]['Pressure'] = model_df['Pressure'].head(1400)/10
 
+    # Map the pressure onto an exactly uniform time grid of 0.1 s, the timestamps of LabView jitter
+    time, pressure, _ = resample(air_chambers[model]['Time'], air_chambers[model]['Pressure'], dt=0.1)
+    air_chambers[model]['Time'] = pd.Series(time)
+    air_chambers[model]['Pressure'] = pd.Series(pressure)
+
     # Define the pressure drop by reducing all pressures with the first measures pressure (in MPa)
     air_chambers[model]['PressureDrop'] = air_chambers[model]['Pressure'] - air_chambers[model]['Pressure'][0]
 
+# Filtering the pressure drop of all models at once with a zero-phase Savitzky-Golay filter of 21 samples (in MPa)
+for model, pressure_drop in zip(models, savgol([air_chambers[model]['PressureDrop'] for model in models], window=21, order=2)):
+    air_chambers[model]['PressureDropFiltered'] = pressure_drop
+
 
 # #### All models with their pressure drop (in MPa) over time (in s)
 
@@ -72,12 +87,12 @@ plt.clf()
 
 # #### Models with their pressure drop (in MPa) over time (in s) (excluding Ultimaker 0.15 mm and 0.20 mm)
 
-# To smoothen out the lines a sampling [::4] and a rolling window of 20 are applied
-plt.plot(air_chambers['Aluminium']['Time'][::4],air_chambers['Aluminium']['PressureDrop'].rolling(window=20).mean()[::4],'black', label='Aluminium', linestyle=(0,(1,1,1)),linewidth=2)
-plt.plot(air_chambers['Prusa']['Time'][::4],air_chambers['Prusa']['PressureDrop'].rolling(window=20).mean()[::4],'tab:orange', label='SLA Prusa', linestyle='dashdot')
-plt.plot(air_chambers['Formlabs']['Time'][::4],air_chambers['Formlabs']['PressureDrop'].rolling(window=20).mean()[::4],'tab:green', label='SLA Formlabs', linestyle='dotted',linewidth=3)
-plt.plot(air_chambers['Ultimaker_006']['Time'][::4],air_chambers['Ultimaker_006']['PressureDrop'].rolling(window=20).mean()[::4],'tab:red',label='Ultimaker 0.06 mm')
-plt.plot(air_chambers['Ultimaker_010']['Time'][::4],air_chambers['Ultimaker_010']['PressureDrop'].rolling(window=20).mean()[::4],'tab:purple',label='Ultimaker 0.10 mm', linestyle='dashed')
+# To smoothen out the lines a sampling [::4] is applied to the filtered pressure drop
+plt.plot(air_chambers['Aluminium']['Time'][::4],air_chambers['Aluminium']['PressureDropFiltered'][::4],'black', label='Aluminium', linestyle=(0,(1,1,1)),linewidth=2)
+plt.plot(air_chambers['Prusa']['Time'][::4],air_chambers['Prusa']['PressureDropFiltered'][::4],'tab:orange', label='SLA Prusa', linestyle='dashdot')
+plt.plot(air_chambers['Formlabs']['Time'][::4],air_chambers['Formlabs']['PressureDropFiltered'][::4],'tab:green', label='SLA Formlabs', linestyle='dotted',linewidth=3)
+plt.plot(air_chambers['Ultimaker_006']['Time'][::4],air_chambers['Ultimaker_006']['PressureDropFiltered'][::4],'tab:red',label='Ultimaker 0.06 mm')
+plt.plot(air_chambers['Ultimaker_010']['Time'][::4],air_chambers['Ultimaker_010']['PressureDropFiltered'][::4],'tab:purple',label='Ultimaker 0.10 mm', linestyle='dashed')
 
 # Set the labels and save the figure
 plt.legend()
@@ -96,14 +111,17 @@ plt.clf()
 # ### Rerun
 
 # Load the data for the rerun repeatability test
-test_rerun=pd.read_csv(r'data/Resultaten_opnieuwaanzetten.csv', delimiter=";", header=1, names=(['Time',"Test1","Test2","Test3",'Aluminium','G','SLA Prusa','SLA Formlabs','Ultimaker 0.10']))
+test_rerun=read_acquisition(r'data/Resultaten_opnieuwaanzetten.csv', delimiter=";", header=1, decimal=',', names=(['Time',"Test1","Test2","Test3",'Aluminium','G','SLA Prusa','SLA Formlabs','Ultimaker 0.10']))
 
-# Apply a rolling window for each type of additive manufacturing and convert pressure data to MPa
-for model in list(test_rerun.keys())[1:]:
-    test_rerun[model]=test_rerun[model].rolling(window=20).mean()/1000
+# Map all tests onto an exactly uniform time grid of 0.1 s
+test_rerun, _ = resample_run(test_rerun, dt=0.1)
 
-# Format the time accordingly
-tr = np.arange(0, len(test_rerun["Time"])/10, 0.1)
+# Filter all types of additive manufacturing at once and convert pressure data to MPa
+for model, pressure in zip(list(test_rerun.keys())[1:], savgol([test_rerun[model] for model in list(test_rerun.keys())[1:]], window=21, order=2)):
+    test_rerun[model]=pressure/1000
+
+# The uniform time (in s) of the tests
+tr = test_rerun['Time']
 
 # Visualize the rerun repeatability test
 plt.plot(tr,test_rerun['Aluminium'], color = 'tab:grey',alpha=0.25, linestyle=(0,(1,1,1)),linewidth=2)
@@ -124,14 +142,17 @@ plt.clf()
 # ### Reconnected
 
 # Load the data for the reconnected repeatability test
-test_reconnected=pd.read_csv(r'data/Resultaten_In_en_uit_elkaar_deel.csv', delimiter=";", header=1, names=(['Time',"Test1","Test2","Test3",'Aluminium','G','SLA Prusa','SLA Formlabs','Ultimaker 0.10']))
+test_reconnected=read_acquisition(r'data/Resultaten_In_en_uit_elkaar_deel.csv', delimiter=";", header=1, decimal=',', names=(['Time',"Test1","Test2","Test3",'Aluminium','G','SLA Prusa','SLA Formlabs','Ultimaker 0.10']))
+
+# Map all tests onto an exactly uniform time grid of 0.1 s
+test_reconnected, _ = resample_run(test_reconnected, dt=0.1)
 
-# Apply a rolling window for each type of additive manufacturing and convert pressure data to MPa
-for model in list(test_reconnected.keys())[1:]:
-    test_reconnected[model]=test_reconnected[model].rolling(window=20).mean()/1000
+# Filter all types of additive manufacturing at once and convert pressure data to MPa
+for model, pressure in zip(list(test_reconnected.keys())[1:], savgol([test_reconnected[model] for model in list(test_reconnected.keys())[1:]], window=21, order=2)):
+    test_reconnected[model]=pressure/1000
 
-# Format the time accordingly
-tr = np.arange(0, len(test_reconnected["Time"])/10, 0.1)
+# The uniform time (in s) of the tests
+tr = test_reconnected['Time']
 
 # Visualize the reconnected repeatability test
 plt.plot(tr,test_reconnected['Aluminium'], color = 'tab:grey',alpha=0.25, linestyle=(0,(1,1,1)),linewidth=2)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the cross-sections of the stadium and kidney cylinders and their pistons are generated from the
+solved dimensions (geometry.py), and exported for printing as extruded STL files and as DXF drawings.
+
+Both shapes are a centre line (a straight line for the stadium, an arc of angle gamma for the kidney) with a half
+circle at each end. Every outline is an offset of that centre line, so the outlines of one design are
+generated with the same points along the centre line:
+  - the bore of the cylinder, with the width D (stadium) or a (kidney) and the perimeter of the O-ring
+  - the piston, the bore offset inwards by the clearance C
+  - the bottom of the piston groove, the bore offset inwards by the squeezed cross-section of the O-ring
+  - the outside of the cylinder, the bore offset outwards by the wall thickness
+All designs of a sweep have the same number of points, so the outlines are one array (designs, points, 2) and
+the triangles are the same indices for every design.
+
+Run `python3 cross_section.py --ID 18 20 22 24 --S 2.5 3 3.5` to export the sweep to ./exports
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from geometry import A_target, C, gamma, groove, kidney, r_sq, stadium
+
+
+# #### Global variables
+
+# The number of points on a quarter circle of the ends and on the centre line
+cap_points = 16
+line_points = 48
+# Dimensions of the printed parts (in mm): the wall of the cylinder, the length of the cylinder and of the piston
+wall = 3
+cylinder_length = 60
+piston_length = 15
+# The location of the exported files
+export_dir = './exports'
+
+
+# #### Functions
+
+# Function to give the points on the centre line (designs, points, 2), with the normal pointing to the
+# outer side and the tangent pointing to the end, for the stadium (length L) or kidney (radius r of the inner arc)
+def centre_line(shape, width, length, gamma=gamma, line_points=line_points):
+    s = np.linspace(0, 1, line_points + 1)
+    if shape == 'Stadium':
+        x = (s - 0.5) * length[:, None]
+        centre = np.stack((x, np.zeros_like(x)), axis=-1)
+        normal = np.broadcast_to([0.0, 1.0], centre.shape)
+        tangent = np.broadcast_to([1.0, 0.0], centre.shape)
+    elif shape == 'Kidney':
+        # The arc is symmetric around the y-axis, its radius is in the middle of the width
+        theta = (s - 0.5) * gamma
+        radius = (length + width / 2)[:, None]
+        normal = np.stack(np.broadcast_arrays(np.sin(theta), np.cos(theta)), axis=-1) * np.ones_like(radius)[..., None]
+        tangent = np.stack((normal[..., 1], -normal[..., 0]), axis=-1)
+        centre = radius[..., None] * normal
+    else:
+        raise ValueError(f'Unknown shape {shape}, choose from Stadium or Kidney')
+    return centre, normal, tangent
+
+
+# Function to give the two sides of an outline at a distance (designs,) from the centre line
+# The outer side runs along the normal, the inner side is its mirror image, from the start to the end of the shape
+# Point i of both sides lies on the same line through the centre line, which is used to triangulate the outline
+def outline_sides(centre, normal, tangent, distance, cap_points=cap_points):
+    # The angle from the normal on the half circles: from the tip of the start to the centre line, and to the tip of the end
+    start = np.pi / 2 * (1 - np.arange(cap_points) / cap_points)
+    end = np.pi / 2 * np.arange(1, cap_points + 1) / cap_points
+    centres = np.concatenate((np.repeat(centre[:, :1], cap_points, axis=1), centre, np.repeat(centre[:, -1:], cap_points, axis=1)), axis=1)
+    normals = np.concatenate((np.repeat(normal[:, :1], cap_points, axis=1), normal, np.repeat(normal[:, -1:], cap_points, axis=1)), axis=1)
+    tangents = np.concatenate((-np.repeat(tangent[:, :1], cap_points, axis=1), tangent * 0, np.repeat(tangent[:, -1:], cap_points, axis=1)), axis=1)
+    angle = np.concatenate((start, np.zeros(centre.shape[1]), end))
+    across = np.cos(angle)[None, :, None] * normals
+    along = np.sin(angle)[None, :, None] * tangents
+    distance = np.asarray(distance, dtype='float64')[:, None, None]
+    return centres + distance * (across + along), centres + distance * (along - across)
+
+
+# Function to join the two sides into a closed polyline (designs, points, 2), counterclockwise
+# The tips of both sides are the same points and are only used once
+def polyline(outer, inner):
+    return np.concatenate((inner, outer[:, -2:0:-1]), axis=1)
+
+
+# Function to give the triangles of the area inside a polyline made by polyline(), as indices (triangles, 3)
+# The triangles join point i and i + 1 of both sides, facing up (counterclockwise)
+def fill_triangles(n_side):
+    i = np.arange(n_side - 1)
+    inner = np.arange(n_side)
+    # The outer side is stored backwards after the inner side, its tips are those of the inner side
+    outer = np.concatenate(([0], 2 * n_side - 2 - np.arange(1, n_side - 1), [n_side - 1]))
+    # The triangle at a tip has only one point there, the other triangle would have no area
+    first = np.stack((inner[i], inner[i + 1], outer[i + 1]), axis=1)[:-1]
+    second = np.stack((inner[i], outer[i + 1], outer[i]), axis=1)[1:]
+    return np.concatenate((first, second))
+
+
+# Function to give the triangles of the band between two closed polylines of n points, as indices (triangles, 3)
+# Seen from outside of the band, the first polyline is below the second
+def band_triangles(first, second, n):
+    i = np.arange(n)
+    j = (i + 1) % n
+    return np.concatenate((np.stack((first + i, first + j, second + j), axis=1),
+                           np.stack((first + i, second + j, second + i), axis=1)))
+
+
+# Function to stack polylines (designs, points, 2) at heights z into one closed mesh
+# The polylines are joined in order, the profile is either closed (a tube) or capped at the first and last polyline
+def sweep_mesh(polylines, z, closed=False):
+    n = polylines[0].shape[1]
+    vertices = np.concatenate([np.concatenate((points, np.full(points.shape[:2] + (1,), height)), axis=-1)
+                               for points, height in zip(polylines, z)], axis=1)
+    faces = [band_triangles(k * n, (k + 1) % len(polylines) * n, n) for k in range(len(polylines) - (not closed))]
+    if not closed:
+        cap = fill_triangles((n + 2) // 2)
+        faces += [cap[:, ::-1], cap + (len(polylines) - 1) * n]
+    return vertices, np.concatenate(faces)
+
+
+# Function to give the outlines (designs, points, 2) of the bore, piston, groove and outside of the cylinder
+# The designs are a DataFrame with the shape, width and length, and the O-ring ID and S (in mm)
+def cross_sections(designs, r_sq=r_sq, C=C, wall=wall, cap_points=cap_points, line_points=line_points):
+    S_sq = designs['S'].to_numpy() * (1 - r_sq)
+    offsets = {'bore': 0, 'piston': -C, 'groove': -S_sq, 'outside': wall}
+    sections = {name: np.empty((len(designs), 2 * (2 * cap_points + line_points + 1) - 2, 2)) for name in offsets}
+    for shape, rows in designs.groupby('shape').indices.items():
+        width, length = designs['width'].to_numpy()[rows], designs['length'].to_numpy()[rows]
+        centre, normal, tangent = centre_line(shape, width, length, line_points=line_points)
+        for name, offset in offsets.items():
+            distance = width / 2 + (offset[rows] if np.ndim(offset) else offset)
+            sections[name][rows] = polyline(*outline_sides(centre, normal, tangent, distance, cap_points))
+    return sections
+
+
+# Function to give the meshes of the cylinder (a tube around the bore) and the piston (with the groove in the middle)
+def meshes(sections, groove_width, cylinder_length=cylinder_length, piston_length=piston_length):
+    # The cylinder, around the profile: outside up, top, bore down, bottom
+    cylinder = sweep_mesh([sections['outside'], sections['outside'], sections['bore'], sections['bore']],
+                          [0, cylinder_length, cylinder_length, 0], closed=True)
+    # The groove width differs per design, the heights of the piston are set per design afterwards
+    piston_vertices, piston_faces = sweep_mesh([sections['piston'], sections['piston'], sections['groove'],
+                                                sections['groove'], sections['piston'], sections['piston']], np.zeros(6))
+    n = sections['piston'].shape[1]
+    low, high = (piston_length - groove_width) / 2, (piston_length + groove_width) / 2
+    heights = np.stack((np.zeros_like(low), low, low, high, high, np.full_like(low, piston_length)), axis=1)
+    piston_vertices[..., 2] = np.repeat(heights, n, axis=1)
+    return {'cylinder': cylinder, 'piston': (piston_vertices, piston_faces)}
+
+
+# Function to write a mesh of one design as a binary STL file
+def write_stl(path, vertices, faces):
+    triangles = vertices[faces]
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+    records = np.zeros(len(faces), dtype=[('normal', '<f4', 3), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+    records['normal'], records['vertices'] = normals, triangles
+    with open(path, 'wb') as file:
+        file.write(os.path.basename(path).encode()[:80].ljust(80, b' '))
+        file.write(np.uint32(len(faces)).tobytes())
+        file.write(records.tobytes())
+
+
+# Function to write the outlines of one design as closed polylines in a DXF (R12) drawing, one layer per outline
+def write_dxf(path, outlines):
+    lines = ['0', 'SECTION', '2', 'ENTITIES']
+    for layer, points in outlines.items():
+        lines += ['0', 'POLYLINE', '8', layer.upper(), '66', '1', '10', '0.0', '20', '0.0', '30', '0.0', '70', '1']
+        for x, y in points:
+            lines += ['0', 'VERTEX', '8', layer.upper(), '10', f'{x:.4f}', '20', f'{y:.4f}', '30', '0.0']
+        lines += ['0', 'SEQEND', '8', layer.upper()]
+    lines += ['0', 'ENDSEC', '0', 'EOF']
+    with open(path, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+# Function to solve the dimensions of every combination of shape and O-ring, designs without a solution are left out
+def design_variants(shapes=['Stadium','Kidney'], ID=[22], S=[3.5], A_target=A_target, r_sq=r_sq, C=C, wall=wall):
+    designs = pd.DataFrame(itertools.product(shapes, ID, S), columns=['shape','ID','S'])
+    ID, S = designs['ID'].to_numpy(dtype='float64'), designs['S'].to_numpy(dtype='float64')
+    D, L, stadium_area = stadium(ID, S, A_target)
+    a, r, kidney_area = kidney(ID, S, A_target=A_target)
+    is_stadium = (designs['shape'] == 'Stadium').to_numpy()
+    designs['width'] = np.where(is_stadium, D, a)
+    designs['length'] = np.where(is_stadium, L, r)
+    designs['area'] = np.where(is_stadium, stadium_area, kidney_area)
+    designs['groove_width'] = groove(ID, S, r_sq, C)['groove_width']
+    # The groove bottom has to stay inside the piston, and the kidney has to stay open in the middle around the outside
+    solved = designs['width'].notna() & (designs['width'] / 2 > designs['S'] * (1 - r_sq))
+    solved &= ~is_stadium & (designs['length'] > wall) | is_stadium
+    return designs[solved].reset_index(drop=True)
+
+
+# Function to export the outlines (DXF) and the cylinder and piston (STL) of every design to a folder
+def export(designs, directory=export_dir, formats=('stl','dxf'), **kwargs):
+    os.makedirs(directory, exist_ok=True)
+    sections = cross_sections(designs, **{name: kwargs[name] for name in ['r_sq','C','wall'] if name in kwargs})
+    parts = meshes(sections, designs['groove_width'].to_numpy(),
+                   **{name: kwargs[name] for name in ['cylinder_length','piston_length'] if name in kwargs})
+    names = [f"{row.shape}_{row.ID:g}x{row.S:g}" for row in designs.itertuples()]
+    for i, name in enumerate(names):
+        if 'dxf' in formats:
+            write_dxf(os.path.join(directory, f'{name}.dxf'), {outline: points[i] for outline, points in sections.items()})
+        if 'stl' in formats:
+            for part, (vertices, faces) in parts.items():
+                write_stl(os.path.join(directory, f'{name}_{part}.stl'), vertices[i], faces)
+    designs.assign(name=names).to_csv(os.path.join(directory, 'designs.csv'), index=False)
+    return names
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapes', nargs='+', default=['Stadium','Kidney'])
+    parser.add_argument('--ID', nargs='+', type=float, default=[22], help='inner diameters of the O-rings (in mm)')
+    parser.add_argument('--S', nargs='+', type=float, default=[3.5], help='cross-sections of the O-rings (in mm)')
+    parser.add_argument('--formats', nargs='+', default=['stl','dxf'], choices=['stl','dxf'])
+    parser.add_argument('--wall', type=float, default=wall)
+    parser.add_argument('--output', default=export_dir)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    designs = design_variants(args.shapes, args.ID, args.S, wall=args.wall)
+    names = export(designs, args.output, args.formats, wall=args.wall)
+    print(designs[['shape','ID','S','width','length','area']].round(2).to_string(index=False))
+    print(f'\nExported {len(names)} designs in {time.perf_counter() - start:.1f} s')
+    print(f'\n ------ Succesfully saved the cross-sections to {args.output} ------')
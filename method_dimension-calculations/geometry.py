@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the dimensions of the piston groove and the non-conventional cylinders are determined for many O-rings at once.
+The same search as stadium() and optimize_range() in dimension_calculations.py is done,
+but the perimeter equations are solved directly and all O-rings are evaluated as one array.
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import math
+
+import numpy as np
+
+
+# #### Global variables
+
+# Target area - the area of the circular shape with diameter = 25 mm
+A_target = math.pi * (25/2)**2
+# The values of D (stadium) and a (kidney) that are tried, as in dimension_calculations.py
+search_grid = np.round(np.arange(5,20,0.1),2)
+# The angle of the kidney shape (see Figure 2 in report)
+gamma = 100/180*math.pi
+# The squeeze ratio of the O-ring and the clearance (in mm) between the piston and the cylinder used in this study
+r_sq = 0.1
+C = 0.5
+
+
+# #### Functions
+
+# Function to determine the piston and groove dimensions (in mm) for arrays of O-ring dimensions ID and S (in mm)
+# The same equations as calculate_groove() in dimension_calculations.py
+def groove(ID, S, r_sq=r_sq, C=C):
+    ID, S = np.asarray(ID, dtype='float64'), np.asarray(S, dtype='float64')
+    # Determine the outer diameter and the squeezed cross-section of the O-ring
+    OD = ID + 2 * S
+    S_sq = S * (1 - r_sq)
+    return {'OD': OD, 'piston_diameter': OD - 2 * C, 'groove_diameter': OD - 2 * S_sq, 'groove_width': S + 1}
+
+
+# Function to select, for each O-ring, the last grid value before the area exceeds the target area
+def _closest_below(values, areas, A_target):
+    # The area increases along the grid, find the first value that reaches the target
+    crossed = (areas[:, :-1] <= A_target[:, None]) & (areas[:, 1:] >= A_target[:, None])
+    found = crossed.any(axis=1)
+    index = crossed.argmax(axis=1)
+    rows = np.arange(len(areas))
+    return np.where(found, values[rows, index], np.nan), np.where(found, areas[rows, index], np.nan), found
+
+
+# Function to determine D and L of the stadium shape for arrays of O-ring dimensions ID and S (in mm)
+# The target area (in mm^2) may differ per O-ring, no solution (NaN) is found when the O-ring is too small
+def stadium(ID, S, A_target=A_target, grid=search_grid):
+    ID, S, A_target = np.broadcast_arrays(*(np.atleast_1d(np.asarray(value, dtype='float64')) for value in (ID, S, A_target)))
+    # Determine the perimeter of the O-ring
+    P_c = (math.pi * (ID + 2 * S))[:, None]
+    D = np.broadcast_to(grid, (len(ID), len(grid)))
+    # Solve the perimeter equation for L, then apply the equation for the surface area
+    L = (P_c - math.pi * D) / 2
+    A_s = math.pi * (D/2)**2 + L * D
+    D_found, area, found = _closest_below(D, A_s, A_target)
+    L_found = (P_c[:, 0] - math.pi * D_found) / 2
+    return D_found, L_found, area
+
+
+# Function to determine a and r of the kidney shape for arrays of O-ring dimensions ID and S (in mm)
+# The angle gamma is in radians
+def kidney(ID, S, gamma=gamma, A_target=A_target, grid=search_grid):
+    ID, S, A_target = np.broadcast_arrays(*(np.atleast_1d(np.asarray(value, dtype='float64')) for value in (ID, S, A_target)))
+    # Determine the perimeter of the O-ring
+    P_c = (math.pi * (ID + 2 * S))[:, None]
+    a = np.broadcast_to(grid, (len(ID), len(grid)))
+    # Solve the perimeter equation for r, then apply the equation for the surface area
+    r = ((P_c - math.pi * a) / gamma - a) / 2
+    A_k = math.pi * (a / 2)**2 + (gamma * (r * a + (a**2 / 2)))
+    a_found, area, found = _closest_below(a, A_k, A_target)
+    r_found = ((P_c[:, 0] - math.pi * a_found) / gamma - a_found) / 2
+    return a_found, r_found, area
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the extension stroke of a pneumatic cylinder is simulated for many design variants at once.
+The lumped-parameter model has one chamber fed from the supply through a valve, a piston with seal friction,
+an external load and leakage past the seal. Every design variant is one element of the state arrays,
+so thousands of variants are integrated together with a fixed time step.
+
+The designs are parameterised from:
+  - the fitted friction table (stribeck.py or lugre.py in results_pneumatic-actuator)
+  - the leak table (leakage.py in results_pneumatic-actuator)
+  - the stadium and kidney dimensions (geometry.py)
+The seals are the sealing rings of the tests. The effect of the cross-section comes from the shape models:
+the friction and leakage of a shape relative to the circle, both tested with the 22 x 3.5 mm O-ring.
+
+Run `python3 simulation.py` to sweep O-ring sizes, shapes, seals and supply pressures
+
+Model (isothermal chamber, p in Pa, x in m, v in m/s):
+    dp/dt = (R T (m_in - m_leak) - p A v) / (V0 + A x)
+    m dv/dt = (p - p_atm) A - F_load - F_friction
+    F_friction = (Fc0 + Fc1 p_gauge) sign(v) + b v, the piston sticks while the net force is below the Coulomb friction
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import itertools
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'results_pneumatic-actuator'))
+from metadata import bore_diameter, rings
+
+from geometry import kidney, stadium
+
+
+# #### Global variables
+
+# Properties of air: atmospheric pressure (in Pa), gas constant (in J/kgK), temperature (in K)
+# and the density at the reference conditions of ISO 6358 (in kg/m^3)
+p_atm = 101325
+R = 287
+T = 293.15
+rho_0 = 1.185
+# The valve: sonic conductance (in m^3/(s Pa)) and critical pressure ratio
+conductance = 1e-9
+critical_ratio = 0.5
+# The cylinder: stroke (in m), dead volume (in m^3) and moving mass (in kg), as in the test setup
+stroke = 0.04
+dead_volume = 2e-6
+mass = 0.05
+# The position (as part of the stroke) at which the extension is complete
+extended = 0.95
+
+# The seal perimeter (in mm) of each tested sealing ring, the rings fill the perimeter of the bore
+tested_perimeter = {ring: math.pi * bore_diameter[ring] for ring in rings}
+# The shape model to which the other shapes are compared
+reference_shape = 'Circle'
+
+# Default locations of the fitted tables
+friction_table = '../results_pneumatic-actuator/data/derived/friction_parameters.csv'
+leak_table = '../results_pneumatic-actuator/data/derived/leak_rates.csv'
+
+
+# #### Functions
+
+# Function to reduce the friction table to a Coulomb friction linear in the pressure and a viscous coefficient per model
+# Both the Stribeck table (b) and the LuGre table (sigma2) are accepted, the viscous friction is in N/(mm/s)
+def seal_parameters(friction_path=friction_table, leak_path=leak_table):
+    if not os.path.exists(friction_path):
+        raise FileNotFoundError(f'{friction_path} does not exist, run stribeck.py or lugre.py in results_pneumatic-actuator first')
+    friction = pd.read_csv(friction_path, index_col=['model','bar'])
+    viscous = 'b' if 'b' in friction.columns else 'sigma2'
+
+    rows = []
+    for model, fits in friction.groupby(level='model'):
+        bar = fits.index.get_level_values('bar').to_numpy(dtype='float64')
+        # A single pressure gives a constant Coulomb friction
+        Fc1, Fc0 = np.polyfit(bar, fits['Fc'].to_numpy(), 1) if len(bar) > 1 else (0.0, fits['Fc'].iloc[0])
+        rows.append({'seal': model, 'Fc0': Fc0, 'Fc1': Fc1, 'b': fits[viscous].mean() * 1000})
+    seals = pd.DataFrame(rows).set_index('seal')
+
+    # Without static leakage data the seals are assumed not to leak
+    if os.path.exists(leak_path):
+        seals['time_constant'] = pd.read_csv(leak_path, index_col='model')['time_constant'].reindex(seals.index).fillna(np.inf)
+    else:
+        print(f'{leak_path} does not exist, leakage is not simulated')
+        seals['time_constant'] = np.inf
+    return seals
+
+
+# Function to give the friction and leakage of the shapes relative to the circle, at the supply pressure (in bar) of every design
+# The Coulomb friction is compared at the supply pressure, the leakage through the time constant of the static test
+# A shape that was not tested, or not compared with a tested circle, gets a factor of 1
+def shape_factors(parameters, shape, supply):
+    shape = np.asarray(shape)
+    factors = {factor: np.ones(len(shape)) for factor in ['friction','viscous','leak']}
+    if reference_shape not in parameters.index:
+        return factors
+    reference = parameters.loc[reference_shape]
+    coulomb = lambda fit, rows: fit['Fc0'] + fit['Fc1'] * supply[rows]
+    for name in np.unique(shape):
+        if name == reference_shape or name not in parameters.index:
+            continue
+        tested, rows = parameters.loc[name], shape == name
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = {'friction': coulomb(tested, rows) / coulomb(reference, rows), 'viscous': tested['b'] / reference['b'],
+                      # A longer time constant is a smaller leak, a circle without leakage gives no reference
+                      'leak': reference['time_constant'] / tested['time_constant'] if np.isfinite(reference['time_constant']) else 1.0}
+        for factor, value in values.items():
+            value = np.broadcast_to(np.asarray(value, dtype='float64'), rows.sum())
+            # A factor that cannot be compared (e.g. a negative friction fit at low pressure) is left at 1
+            factors[factor][rows] = np.where(np.isfinite(value) & (value > 0 if factor != 'leak' else value >= 0), value, 1.0)
+    return factors
+
+
+# Function to build the table of design variants, one row for every combination of the options
+# The fitted parameters hold the sealing rings and the shape models, only the rings are used as seal
+# The O-ring dimensions ID and S are in mm, the supply pressure in bar (gauge) and the load in N
+def design_variants(parameters, shapes, ID, S, supply, load, diameter=25):
+    seals = parameters[parameters.index.isin(rings)]
+    designs = pd.DataFrame(list(itertools.product(seals.index, shapes, ID, S, supply, load)),
+                           columns=['seal','shape','ID','S','supply','load'])
+    OD = designs['ID'].to_numpy() + 2 * designs['S'].to_numpy()
+    shape = designs['shape'].to_numpy()
+
+    # The circle is as large as the O-ring, the other shapes get the area of a circle with the given diameter (in mm^2)
+    area = math.pi * (OD / 2)**2
+    target = np.full(len(designs), math.pi * (diameter / 2)**2)
+    is_stadium, is_kidney = shape == 'Stadium', shape == 'Kidney'
+    area[is_stadium] = stadium(designs['ID'][is_stadium], designs['S'][is_stadium], A_target=target[is_stadium])[2]
+    area[is_kidney] = kidney(designs['ID'][is_kidney], designs['S'][is_kidney], A_target=target[is_kidney])[2]
+    designs['area'] = area / 10**6
+
+    # Friction and leakage scale with the length of the seal, relative to the tested model
+    designs['perimeter'] = math.pi * OD
+    scale = designs['perimeter'].to_numpy() / designs['seal'].map(tested_perimeter).to_numpy()
+    # The cross-section changes the friction and leakage of the seal as it did for the tested shapes
+    factors = shape_factors(parameters, designs['shape'], designs['supply'].to_numpy())
+    for column, factor in [('Fc0','friction'), ('Fc1','friction'), ('b','viscous')]:
+        designs[column] = designs['seal'].map(seals[column]).to_numpy() * scale * factors[factor]
+    # The leakage of the tested model is converted into a flow conductance (in kg/(s Pa))
+    # The static test holds the tested cylinder at the end of the stroke
+    tested_area = designs['seal'].map(lambda model: math.pi * (bore_diameter[model] / 2000)**2).to_numpy()
+    time_constant = designs['seal'].map(seals['time_constant']).to_numpy()
+    designs['leak'] = (dead_volume + tested_area * stroke) / (R * T * time_constant) * scale * factors['leak']
+
+    # Shapes the O-ring cannot enclose are left out
+    return designs[~np.isnan(designs['area'])].reset_index(drop=True)
+
+
+# Function to simulate the extension stroke of all designs, starting at rest at atmospheric pressure
+# When record_every is given, the position and pressure are stored every record_every steps
+def simulate(designs, dt=1e-4, duration=1.0, record_every=None):
+    A = designs['area'].to_numpy()
+    p_supply = designs['supply'].to_numpy() * 10**5 + p_atm
+    load = designs['load'].to_numpy()
+    Fc0, Fc1, b = (designs[column].to_numpy() for column in ['Fc0','Fc1','b'])
+    leak = designs['leak'].to_numpy()
+    n = len(designs)
+
+    # The state of all designs
+    p = np.full(n, float(p_atm))
+    x = np.zeros(n)
+    v = np.zeros(n)
+    # The performance of all designs
+    t_extended = np.full(n, np.nan)
+    t_breakaway = np.full(n, np.nan)
+    peak_velocity = np.zeros(n)
+    air_supplied = np.zeros(n)
+    air_leaked = np.zeros(n)
+    steps = int(round(duration / dt))
+    record = [] if record_every else None
+
+    for k in range(steps):
+        # Flow through the valve (ISO 6358), choked below the critical pressure ratio
+        ratio = p / p_supply
+        subsonic = np.sqrt(np.clip(1 - ((ratio - critical_ratio) / (1 - critical_ratio))**2, 0, 1))
+        m_in = conductance * rho_0 * p_supply * np.where(ratio <= critical_ratio, 1.0, subsonic)
+        m_leak = leak * (p - p_atm)
+
+        # Net force on the piston and the Coulomb friction at the current pressure
+        drive = (p - p_atm) * A - load
+        Fc = np.maximum(Fc0 + Fc1 * (p - p_atm) / 10**5, 0)
+        moving = v != 0
+        breakaway = ~moving & (np.abs(drive) > Fc)
+        direction = np.where(moving, np.sign(v), np.where(breakaway, np.sign(drive), 0))
+
+        # The viscous friction is taken implicitly, which keeps the step stable for any damping
+        v_new = (v + dt * (drive - Fc * direction) / mass) / (1 + dt * b / mass)
+        # The piston sticks when it reverses, or when the net force does not overcome the friction
+        v_new[(moving & (np.sign(v_new) != np.sign(v))) | (~moving & ~breakaway)] = 0
+        x_new = x + v_new * dt
+        # The end stops of the cylinder
+        at_stop = (x_new <= 0) | (x_new >= stroke)
+        x_new = np.clip(x_new, 0, stroke)
+        v_new[at_stop] = 0
+
+        # Isothermal chamber, the pressure cannot exceed the supply
+        volume = dead_volume + A * x
+        p = np.minimum(p + dt * (R * T * (m_in - m_leak) - p * A * (x_new - x) / dt) / volume, p_supply)
+        x, v = x_new, v_new
+
+        # Keep track of the performance
+        air_supplied += m_in * dt
+        air_leaked += m_leak * dt
+        peak_velocity = np.maximum(peak_velocity, v)
+        t_breakaway[np.isnan(t_breakaway) & (v != 0)] = (k + 1) * dt
+        t_extended[np.isnan(t_extended) & (x >= extended * stroke)] = (k + 1) * dt
+        if record is not None and k % record_every == 0:
+            record.append(np.stack((x, p)).astype('float32'))
+
+    # The performance: times in s, velocity in mm/s, pressure in bar (gauge), force in N and air in g
+    results = designs.copy()
+    results['breakaway_time'] = t_breakaway
+    results['extension_time'] = t_extended
+    results['peak_velocity'] = peak_velocity * 1000
+    results['end_pressure'] = (p - p_atm) / 10**5
+    results['end_force'] = (p - p_atm) * A - load
+    results['air_supplied'] = air_supplied * 1000
+    results['air_leaked'] = air_leaked * 1000
+    if record is None:
+        return results
+    return results, np.stack(record)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--friction', default=friction_table)
+    parser.add_argument('--leak', default=leak_table)
+    parser.add_argument('--dt', type=float, default=1e-4)
+    parser.add_argument('--duration', type=float, default=1.0)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    parameters = seal_parameters(args.friction, args.leak)
+    designs = design_variants(parameters, shapes=['Circle','Stadium','Kidney'], ID=np.arange(16,25,1.0), S=[2,2.5,3,3.5,4],
+                              supply=[2,3,4,5,6,7], load=[0,20])
+
+    start = time.perf_counter()
+    results = simulate(designs, args.dt, args.duration)
+    print(f'Simulated {len(designs)} designs in {time.perf_counter() - start:.1f} s')
+
+    # The fastest designs that extend against the load
+    columns = ['seal','shape','ID','S','supply','load','area','extension_time','peak_velocity','end_force','air_leaked']
+    print(results.dropna(subset=['extension_time']).nsmallest(10, 'extension_time')[columns].to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
+        print(f'\n ------ Succesfully saved the simulated designs to {args.output} ------')
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, acquisitions are read directly from compressed files and archives, without extracting them.
+An acquisition keeps its plain path, e.g. ./data/friction/Circle_1bar.csv, and is found as:
+  - the file itself, or the compressed file ./data/friction/Circle_1bar.csv.gz (.xz, .bz2 or .zst)
+  - a member of an archive of one of its folders, e.g. ./data/friction.zip or ./data/friction.tar.zst
+  - the archived voltages ./data/friction/Circle_1bar.npz, calibrated while they are read (see quantized.py)
+The file is decompressed while it is parsed, so no temporary files are written.
+Several acquisitions are read in parallel processes, and all members of a tar archive are read in one pass.
+The .zst files need the zstandard package, the other formats are part of Python.
+
+Run `python3 archive.py` to benchmark the size and reading time of every format on ./data/friction
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import bz2
+import fnmatch
+import glob
+import gzip
+import io
+import lzma
+import os
+import posixpath
+import shutil
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from quantized import iter_quantized, read_quantized
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# #### Global variables
+
+# The compressed files, by their extension
+compressions = ['.gz', '.xz', '.bz2', '.zst']
+# The archives, by their extension
+archives = ['.zip', '.tar', '.tar.gz', '.tgz', '.tar.xz', '.tar.bz2', '.tar.zst']
+# The compression of a tar archive
+tar_compressions = {'.tar': None, '.tar.gz': '.gz', '.tgz': '.gz', '.tar.xz': '.xz', '.tar.bz2': '.bz2', '.tar.zst': '.zst'}
+# The extension of an acquisition archived as quantized voltages, it replaces the .csv extension
+quantized_extension = '.npz'
+
+
+# #### Functions
+
+# Function to open a decompressing stream on a file (a path or a binary file), the compression is an extension
+def decompress(file, compression):
+    if compression is None:
+        return open(file, 'rb') if isinstance(file, str) else file
+    if compression == '.gz':
+        return gzip.open(file, 'rb')
+    if compression == '.xz':
+        return lzma.open(file, 'rb')
+    if compression == '.bz2':
+        return bz2.open(file, 'rb')
+    if compression == '.zst':
+        if zstandard is None:
+            raise ImportError('Reading .zst files needs the zstandard package, install it with pip install zstandard')
+        return zstandard.ZstdDecompressor().stream_reader(open(file, 'rb') if isinstance(file, str) else file, closefd=True)
+    raise ValueError(f'Unknown compression {compression}, choose from {compressions}')
+
+
+# A member of a tar archive read as a stream cannot seek, it is given the interface of a file so pandas can parse it
+class StreamReader(io.RawIOBase):
+    def __init__(self, stream):
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+# Function to open a compressing stream to write a file, used to build the archives of the benchmark
+def compress(path, compression):
+    if compression is None:
+        return open(path, 'wb')
+    if compression == '.zst':
+        if zstandard is None:
+            raise ImportError('Writing .zst files needs the zstandard package, install it with pip install zstandard')
+        return zstandard.ZstdCompressor().stream_writer(open(path, 'wb'), closefd=True)
+    return {'.gz': gzip, '.xz': lzma, '.bz2': bz2}[compression].open(path, 'wb')
+
+
+def compression_of(path):
+    return next((extension for extension in compressions if path.endswith(extension)), None)
+
+
+def archive_of(path):
+    return next((extension for extension in sorted(archives, key=len, reverse=True) if path.endswith(extension)), None)
+
+
+# Function to find where an acquisition is stored, returns the file on disk and the possible names of the member in an
+# archive (None for a plain or compressed file), or None when it is not found
+def locate(path):
+    if os.path.isfile(path):
+        return path, None
+    for extension in compressions:
+        if os.path.isfile(path + extension):
+            return path + extension, None
+    if os.path.isfile(os.path.splitext(path)[0] + quantized_extension):
+        return os.path.splitext(path)[0] + quantized_extension, None
+
+    # Look for an archive of each folder above the acquisition, the member is relative to that folder
+    # An archive made of the folder itself (e.g. zip -r friction.zip friction) has the folder name in front
+    folder, member = os.path.split(os.path.normpath(path))
+    while folder and os.path.basename(folder) not in ('', '.', '..'):
+        for extension in archives:
+            if os.path.isfile(folder + extension):
+                return folder + extension, [member, f'{os.path.basename(folder)}/{member}']
+        folder, name = os.path.split(folder)
+        member = f'{name}/{member}'
+    return None
+
+
+# Function to open an acquisition as a binary stream, decompressing it while it is read
+def open_acquisition(path):
+    found = locate(path)
+    if found is None:
+        raise FileNotFoundError(f'{path} does not exist, also not compressed or in an archive')
+    source, members = found
+    if members is None:
+        return decompress(source, compression_of(source))
+
+    if source.endswith('.zip'):
+        archive = zipfile.ZipFile(source)
+        names = {posixpath.normpath(name): name for name in archive.namelist()}
+        member = next((member for member in members if member in names), None)
+        if member is None:
+            archive.close()
+            raise FileNotFoundError(f'{path} is not in {source}')
+        return archive.open(names[member])
+
+    # A tar archive is read as a stream until the member, compressed archives cannot be read from the middle
+    archive = tarfile.open(fileobj=decompress(source, tar_compressions[archive_of(source)]), mode='r|')
+    for info in archive:
+        if posixpath.normpath(info.name) in members and info.isfile():
+            return io.BufferedReader(StreamReader(archive.extractfile(info)))
+    archive.close()
+    raise FileNotFoundError(f'{path} is not in {source}')
+
+
+# Function to parse an acquisition with pd.read_csv, the keyword arguments are passed on
+def read_acquisition(path, **kwargs):
+    found = locate(path)
+    if found is not None and found[0].endswith(quantized_extension):
+        return read_quantized(found[0], **kwargs)
+    with open_acquisition(path) as stream:
+        return pd.read_csv(stream, **kwargs)
+
+
+# Function to parse an acquisition in blocks of rows, so a long test is never held in memory at once
+def iter_acquisition(path, chunksize, **kwargs):
+    found = locate(path)
+    if found is not None and found[0].endswith(quantized_extension):
+        yield from iter_quantized(found[0], chunksize, **kwargs)
+        return
+    with open_acquisition(path) as stream:
+        yield from pd.read_csv(stream, chunksize=chunksize, **kwargs)
+
+
+# Function to read all wanted members of a tar archive in one pass over the (decompressed) archive
+def read_tar(source, members, kwargs):
+    tables = {}
+    with tarfile.open(fileobj=decompress(source, tar_compressions[archive_of(source)]), mode='r|') as archive:
+        for info in archive:
+            path = next((path for path, names in members.items() if posixpath.normpath(info.name) in names), None)
+            if path is not None and info.isfile():
+                tables[path] = pd.read_csv(io.BufferedReader(StreamReader(archive.extractfile(info))), **kwargs)
+    missing = set(members) - set(tables)
+    if missing:
+        raise FileNotFoundError(f'{sorted(missing)} are not in {source}')
+    return tables
+
+
+def read_file(path, kwargs):
+    return {path: read_acquisition(path, **kwargs)}
+
+
+# Function to read a number of acquisitions in parallel processes, returns a dictionary of tables by path
+def read_acquisitions(paths, workers=None, **kwargs):
+    tasks, in_tar = [], {}
+    for path in paths:
+        found = locate(path)
+        if found is not None and found[1] is not None and archive_of(found[0]) in tar_compressions:
+            in_tar.setdefault(found[0], {})[path] = found[1]
+        else:
+            tasks.append((read_file, path))
+    tasks += [(read_tar, source, members) for source, members in in_tar.items()]
+
+    tables = {}
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(task[0], *task[1:], kwargs) for task in tasks]
+        for future in futures:
+            tables.update(future.result())
+    return {path: tables[path] for path in paths}
+
+
+# Function to find the acquisitions that match a pattern, including compressed files and members of archives
+# The acquisitions are returned by their plain path, which is accepted by open_acquisition
+def find_acquisitions(pattern):
+    found = set(glob.glob(pattern))
+    for extension in compressions:
+        found.update(path[:-len(extension)] for path in glob.glob(pattern + extension))
+    if pattern.endswith('.csv'):
+        found.update(path[:-len(quantized_extension)] + '.csv' for path in glob.glob(pattern[:-len('.csv')] + quantized_extension))
+
+    # The archives of the folders in the pattern, their members are relative to the folder or start with its name
+    folder = os.path.dirname(pattern)
+    while os.path.basename(folder) not in ('', '.', '..'):
+        for extension in archives:
+            for source in glob.glob(folder + extension):
+                base = source[:-len(extension)]
+                for name in archive_names(source):
+                    for path in (os.path.join(base, *name.split('/')), os.path.join(os.path.dirname(base), *name.split('/'))):
+                        # As in glob, a wildcard does not match across folders
+                        if path.count(os.sep) == pattern.count(os.sep) and fnmatch.fnmatch(path, pattern):
+                            found.add(path)
+        folder = os.path.dirname(folder)
+    return sorted(found)
+
+
+# Function to list the files in an archive
+def archive_names(source):
+    if source.endswith('.zip'):
+        with zipfile.ZipFile(source) as archive:
+            return [posixpath.normpath(name) for name in archive.namelist() if not name.endswith('/')]
+    with tarfile.open(fileobj=decompress(source, tar_compressions[archive_of(source)]), mode='r|') as archive:
+        return [posixpath.normpath(info.name) for info in archive if info.isfile()]
+
+
+# Function to store a number of files in the given format, one (compressed) file each or one archive in the folder
+def write_format(paths, folder, extension):
+    os.makedirs(folder, exist_ok=True)
+    if extension in compressions or extension == '.csv':
+        for path in paths:
+            with open(path, 'rb') as source, compress(os.path.join(folder, os.path.basename(path)) + extension.replace('.csv', ''),
+                                                      compression_of(extension)) as target:
+                shutil.copyfileobj(source, target)
+    elif extension == '.zip':
+        with zipfile.ZipFile(f'{folder}.zip', 'w', zipfile.ZIP_DEFLATED) as archive:
+            for path in paths:
+                archive.write(path, os.path.basename(path))
+        os.rmdir(folder)
+    else:
+        with compress(f'{folder}{extension}', tar_compressions[extension]) as target, tarfile.open(fileobj=target, mode='w|') as archive:
+            for path in paths:
+                archive.add(path, os.path.basename(path))
+        os.rmdir(folder)
+
+
+# Function to give the size (in bytes) of the files of a format
+def format_size(folder):
+    if os.path.isdir(folder):
+        return sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder))
+    return sum(os.path.getsize(folder + extension) for extension in archives if os.path.isfile(folder + extension))
+
+
+if __name__ == '__main__':
+    from loading import columns
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='./data/friction')
+    parser.add_argument('--output', default='./data/derived/archive_benchmark')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.data, '*.csv')))
+    read_kwargs = {'delimiter': r'\s+', 'header': None, 'names': columns}
+    formats = ['.csv', '.gz', '.xz', '.bz2', '.zip', '.tar', '.tar.gz', '.tar.xz']
+    if zstandard is not None:
+        formats += ['.zst', '.tar.zst']
+    else:
+        print('zstandard is not installed, the .zst formats are left out')
+
+    rows = []
+    for extension in formats:
+        folder = os.path.join(args.output, f'format{extension.replace(".", "_")}', os.path.basename(os.path.normpath(args.data)))
+        shutil.rmtree(os.path.dirname(folder), ignore_errors=True)
+        start = time.perf_counter()
+        write_format(paths, folder, extension)
+        write_time = time.perf_counter() - start
+
+        stored = [os.path.join(folder, os.path.basename(path)) for path in paths]
+        start = time.perf_counter()
+        for path in stored:
+            read_acquisition(path, **read_kwargs)
+        sequential = time.perf_counter() - start
+        start = time.perf_counter()
+        read_acquisitions(stored, args.workers, **read_kwargs)
+        parallel = time.perf_counter() - start
+        rows.append({'format': extension, 'MB': format_size(folder) / 1024**2, 'write_s': write_time,
+                     'read_s': sequential, 'parallel_read_s': parallel})
+        shutil.rmtree(os.path.dirname(folder))
+
+    benchmark = pd.DataFrame(rows).set_index('format')
+    # The ratio of the plain size over the stored size, and the reading speed of the plain data (in MB/s)
+    benchmark.insert(1, 'ratio', benchmark.loc['.csv', 'MB'] / benchmark['MB'])
+    benchmark['read_MB/s'] = benchmark.loc['.csv', 'MB'] / benchmark['read_s']
+    benchmark['parallel_read_MB/s'] = benchmark.loc['.csv', 'MB'] / benchmark['parallel_read_s']
+    print(benchmark.round(2).to_string())
+    os.makedirs(args.output, exist_ok=True)
+    benchmark.to_csv(os.path.join(args.output, 'benchmark.csv'))
+    print(f'\n ------ Succesfully saved the benchmark to {args.output} ------')
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, large batches of acquisitions (e.g. a night of quality tests of printed actuators) are analysed.
+The files are handed out to a pool of worker processes one at a time, so fast and slow files balance out.
+Every finished file is checkpointed in a SQLite results store. After a crash or interruption the
+batch resumes where it stopped, and files that did not change are not analysed again.
+A file that is missing or cannot be analysed is recorded as failed, the rest of the batch continues.
+A file that fails validation (see validation.py) is quarantined with its validation report and not analysed.
+
+Run `python3 batch.py './data/friction/*.csv' --store ./data/derived/batch.sqlite`
+The analysis follows from the folder of a file (friction, static or dynamic), unless --analysis is given
+A file in another folder is recorded as failed, give its analysis with --analysis
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import collections
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from archive import find_acquisitions, locate
+from friction import stroke_ranges
+from leakage import static_leak_rate
+from loading import drop_amount, load_run
+from metadata import bore_area
+from validation import ValidationError
+
+
+# #### Global variables
+
+# The position (in mm) and margin where the dynamic pressure is compared, as in results_dynamic_leakage.py
+alpha = 37.7
+margin = 0.02
+# Seconds between two progress reports
+report_every = 10
+# Files handed out per worker at a time, a small number keeps the load balanced
+in_flight = 2
+
+
+# #### Analyses of a single file
+
+# Function to find the model and pressure in a file name, e.g. O-ring_3bar.csv or 1_O-ring257_3bar.csv
+def file_model(path):
+    match = re.match(r'(?:\d+_)?(?P<model>.+?)(?:_(?P<bar>\d+)bar)?\.csv$', os.path.basename(path))
+    return match.group('model'), int(match.group('bar')) if match.group('bar') else None
+
+
+def analyse_friction(path):
+    model, bar = file_model(path)
+    # A model without a known bore (see metadata.py) raises a KeyError and is recorded as failed
+    area = bore_area(model)
+    test_df = load_run(path, ['Time','Pressure(bar)','Force(N)'], drop_amount, validate='strict')
+    # Calculate the friction force by substracting Fp from the measured force (see equation 3 in the report)
+    friction_force = test_df['Force(N)'] - test_df['Pressure(bar)'] * 10**5 * area
+    ranges = stroke_ranges.uncached(friction_force)[0]
+    return {'model': model, 'bar': bar, 'drop_amount': test_df.attrs['drop_amount'], 'validation': test_df.attrs['validation']['status'], 'strokes': len(ranges), 'mean_range': float(np.mean(ranges)),
+            'se_range': float(np.std(ranges)), 'friction_from': float(friction_force[friction_force > friction_force.mean()].mean()),
+            'friction_to': float(friction_force[friction_force < friction_force.mean()].mean())}
+
+
+def analyse_static(path):
+    model, _ = file_model(path)
+    test_df = load_run(path, ['Time','Pressure(bar)'], drop_amount, validate='strict')
+    leakage = static_leak_rate(test_df)
+    return {'model': model, 'drop_amount': test_df.attrs['drop_amount'], 'validation': test_df.attrs['validation']['status'], **{key: float(value) for key, value in leakage.items()}}
+
+
+def analyse_dynamic(path, alpha=alpha, margin=margin):
+    model, _ = file_model(path)
+    test_df = load_run(path, ['Time','Laser(mm)','Pressure(bar)'], drop_amount, validate='strict')
+    pressure = test_df['Pressure(bar)'][(test_df['Laser(mm)'] - alpha).abs() < margin].to_numpy()
+    if len(pressure) == 0:
+        raise ValueError(f'The piston never reached alpha = {alpha} mm')
+    # The pressure at alpha at the start and end of the test, averaged over a tenth of the passes
+    part = max(len(pressure) // 10, 1)
+    return {'model': model, 'drop_amount': test_df.attrs['drop_amount'], 'validation': test_df.attrs['validation']['status'], 'passes': len(pressure), 'start_pressure': float(pressure[:part].mean()),
+            'end_pressure': float(pressure[-part:].mean()), 'pressure_drop': float(pressure[-part:].mean() - pressure[:part].mean())}
+
+
+analyses = {'friction': analyse_friction, 'static': analyse_static, 'dynamic': analyse_dynamic}
+
+
+# Function to analyse a single file in a worker process, failures are returned instead of raised
+# The status is done, quarantined (the validation report is returned as result) or failed
+def run_file(path, analysis):
+    start = time.perf_counter()
+    try:
+        if analysis not in analyses:
+            raise ValueError(f'Unknown analysis {analysis} (the folder of the file), give one of {list(analyses)} with --analysis')
+        status, result, error = 'done', analyses[analysis](path), None
+    except ValidationError as exception:
+        status, result, error = 'quarantined', exception.report, str(exception)
+    except Exception as exception:
+        status, result, error = 'failed', None, f'{type(exception).__name__}: {exception}'
+    return path, analysis, status, result, error, time.perf_counter() - start
+
+
+# #### Results store
+
+# Function to give the size and modification time of a file, for a compressed or archived file those of the file on disk
+def file_signature(path):
+    found = locate(path)
+    if found is None:
+        return None, None
+    stat = os.stat(found[0])
+    return stat.st_size, stat.st_mtime_ns
+
+
+class ResultStore:
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS runs (path TEXT PRIMARY KEY, analysis TEXT, size INTEGER, mtime INTEGER, '
+                                'status TEXT, result TEXT, error TEXT, seconds REAL, finished REAL)')
+
+    # Function to select the files that still have to be analysed
+    # A file is done when it was analysed successfully or quarantined, and its size and modification time did not change
+    def pending(self, files, retry_failed=True):
+        done = {path: (size, mtime, status) for path, size, mtime, status in self.connection.execute('SELECT path, size, mtime, status FROM runs')}
+        pending = []
+        for path, analysis in files:
+            signature = file_signature(path)
+            previous = done.get(path)
+            if previous is None or previous[:2] != signature or (previous[2] == 'failed' and retry_failed):
+                pending.append((path, analysis))
+        return pending
+
+    def record(self, path, analysis, status, result, error, seconds):
+        size, mtime = file_signature(path)
+        self.connection.execute('INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                (path, analysis, size, mtime, status, json.dumps(result), error, seconds, time.time()))
+        # Every file is committed at once, so a crash loses at most the files being analysed
+        self.connection.commit()
+
+    # Function to collect the results of one analysis in a table (one row per file)
+    def results(self, analysis):
+        rows = self.connection.execute("SELECT path, result, seconds FROM runs WHERE status = 'done' AND analysis = ? ORDER BY path", (analysis,))
+        return pd.DataFrame([{'path': path, **json.loads(result), 'seconds': seconds} for path, result, seconds in rows])
+
+    def failures(self):
+        return pd.read_sql_query("SELECT path, analysis, error FROM runs WHERE status = 'failed' ORDER BY path", self.connection)
+
+    # Function to list the issues of the quarantined files, one row per issue
+    def quarantined(self):
+        rows = self.connection.execute("SELECT path, analysis, result FROM runs WHERE status = 'quarantined' ORDER BY path")
+        return pd.DataFrame([{'path': path, 'analysis': analysis, **issue} for path, analysis, report in rows
+                             for issue in json.loads(report)['issues']], columns=['path','analysis','check','channel','severity','message'])
+
+
+# #### Batch runner
+
+# Function to analyse a batch of (path, analysis) files, skipping the files that are already in the store
+def run_batch(files, store, workers=None, retry_failed=True, report_every=report_every):
+    pending = store.pending(files, retry_failed)
+    print(f'{len(files) - len(pending)} of {len(files)} files already done, analysing {len(pending)} files')
+    if not pending:
+        return
+
+    start = last_report = time.perf_counter()
+    finished = failed = quarantined = 0
+    queue = collections.deque(pending)
+    workers = workers or os.cpu_count() or 1
+    while queue:
+        # A worker that dies (e.g. out of memory) breaks the whole pool: the files in flight are recorded as failed,
+        # and a new pool continues with the rest of the queue
+        with ProcessPoolExecutor(workers) as executor:
+            running, broken = {}, False
+            while (queue and not broken) or running:
+                # Only a few files per worker are submitted at once, a worker that finishes early gets the next file
+                try:
+                    while queue and not broken and len(running) < in_flight * workers:
+                        running[executor.submit(run_file, *queue[0])] = queue[0]
+                        queue.popleft()
+                except BrokenProcessPool:
+                    broken = True
+                if not running:
+                    break
+
+                completed, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    path, analysis = running.pop(future)
+                    try:
+                        _, _, status, result, error, seconds = future.result()
+                    except Exception as exception:
+                        broken = broken or isinstance(exception, BrokenProcessPool)
+                        status, result, error, seconds = 'failed', None, f'{type(exception).__name__}: {exception}', 0.0
+                    store.record(path, analysis, status, result, error, seconds)
+                    finished += 1
+                    failed += status == 'failed'
+                    quarantined += status == 'quarantined'
+
+                now = time.perf_counter()
+                if now - last_report >= report_every or not (queue or running):
+                    rate = finished / (now - start)
+                    remaining = (len(pending) - finished) / rate if rate else math.inf
+                    print(f'{finished}/{len(pending)} files ({failed} failed, {quarantined} quarantined), {rate:.1f} files/s, {remaining:.0f} s remaining')
+                    last_report = now
+
+
+# Function to expand the file patterns into (path, analysis) pairs
+# With analysis='auto' the analysis is the folder of a file, a folder that is no analysis fails in run_file()
+def batch_files(patterns, analysis='auto'):
+    files = []
+    for pattern in patterns:
+        # A pattern without matches is kept, so the missing file is reported as failed
+        for path in find_acquisitions(pattern) or [pattern]:
+            kind = os.path.basename(os.path.dirname(os.path.abspath(path))) if analysis == 'auto' else analysis
+            files.append((path, kind))
+    return files
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('patterns', nargs='+', help='files or glob patterns of the acquisitions')
+    parser.add_argument('--analysis', choices=['auto'] + list(analyses), default='auto')
+    parser.add_argument('--store', default='./data/derived/batch.sqlite')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--keep-failed', action='store_true', help='do not retry the files that failed before')
+    parser.add_argument('--export', default=None, help='folder to write one .csv of results per analysis')
+    args = parser.parse_args()
+
+    files = batch_files(args.patterns, args.analysis)
+    store = ResultStore(args.store)
+    # The dropped start of every test is logged next to the results store
+    logging.basicConfig(filename=f'{os.path.splitext(args.store)[0]}.log', level=logging.INFO, format='%(asctime)s %(processName)s %(message)s')
+    run_batch(files, store, args.workers, not args.keep_failed)
+
+    failures = store.failures()
+    if len(failures):
+        print(f'\n{len(failures)} files failed:')
+        print(failures.to_string(index=False))
+    quarantined = store.quarantined()
+    if len(quarantined):
+        print(f'\n{quarantined["path"].nunique()} files quarantined:')
+        print(quarantined.to_string(index=False))
+    if args.export:
+        os.makedirs(args.export, exist_ok=True)
+        for analysis in analyses:
+            results = store.results(analysis)
+            if len(results):
+                results.to_csv(os.path.join(args.export, f'batch_{analysis}.csv'), index=False)
+        if len(quarantined):
+            quarantined.to_csv(os.path.join(args.export, 'batch_quarantined.csv'), index=False)
+    print(f'\n ------ Succesfully saved the batch results to {args.store} ------')
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the models are compared pairwise with permutation tests.
+The friction force is compared on the friction force range of every stroke (see friction.py) of the tests
+at the same pressure, the static leakage on the leak rate of consecutive windows of the static tests (see leakage.py).
+For each pair, a batch of permutations is drawn as one array of random orders. The pairs are spread over
+a process pool and the p-values are corrected for multiple comparisons (Holm and Benjamini-Hochberg).
+
+Run `python3 comparison.py` to compare all models in ./data/friction and ./data/static
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from friction import stroke_ranges
+from leakage import windowed_leak_rates
+from loading import drop_amount, load_run
+from metadata import bore_area, friction_tests, static_tests
+
+
+# #### Global variables
+
+# The number of permutations of each test, and how many are drawn at once
+# The smallest p-value is 1 / (n_permutations + 1), which has to stay below alpha divided by the number of pairs
+# compare() raises the number of permutations, so the smallest corrected p-value is at most alpha / resolution
+n_permutations = 10000
+batch = 1000
+resolution = 2
+# The significance level, after correction for multiple comparisons
+alpha = 0.05
+
+
+# #### Functions
+
+# Function to test whether the means of two samples differ, the p-value is two-sided
+def permutation_test(x, y, rng, n_permutations=n_permutations, batch=batch):
+    pooled = np.concatenate((x, y))
+    observed = abs(x.mean() - y.mean())
+    exceeded = 0
+    for start in range(0, n_permutations, batch):
+        size = min(batch, n_permutations - start)
+        # Every row of random keys sorts into a random order of the pooled samples
+        shuffled = pooled[np.argsort(rng.random((size, len(pooled))), axis=1)]
+        difference = shuffled[:, :len(x)].mean(axis=1) - shuffled[:, len(x):].mean(axis=1)
+        # The tolerance keeps permutations equal to the observed split from being missed by rounding
+        exceeded += np.count_nonzero(np.abs(difference) >= observed - 1e-12)
+    # The observed split counts as one of the permutations, so the p-value is never zero
+    return (exceeded + 1) / (n_permutations + 1)
+
+
+# Function to test a number of pairs, run in a separate process
+def _test_pairs(job):
+    pairs, seed, n_permutations = job
+    rng = np.random.default_rng(seed)
+    return [permutation_test(x, y, rng, n_permutations) for x, y in pairs]
+
+
+# Function to correct the p-values for the family-wise error rate (Holm-Bonferroni)
+def holm(p):
+    p = np.asarray(p, dtype='float64')
+    order = np.argsort(p)
+    adjusted = np.empty_like(p)
+    adjusted[order] = np.minimum(np.maximum.accumulate(p[order] * (len(p) - np.arange(len(p)))), 1)
+    return adjusted
+
+
+# Function to correct the p-values for the false discovery rate (Benjamini-Hochberg)
+def benjamini_hochberg(p):
+    p = np.asarray(p, dtype='float64')
+    order = np.argsort(p)
+    ranked = p[order] * len(p) / np.arange(1, len(p) + 1)
+    adjusted = np.empty_like(p)
+    adjusted[order] = np.minimum(np.minimum.accumulate(ranked[::-1])[::-1], 1)
+    return adjusted
+
+
+# Function to give the number of permutations needed for a family of pairs
+# Holm multiplies the smallest p-value, 1 / (n_permutations + 1), by the number of pairs, it has to stay below alpha
+def needed_permutations(n_pairs, alpha=alpha, resolution=resolution):
+    return int(np.ceil(resolution * n_pairs / alpha))
+
+
+# Function to compare pairs of samples, the samples are a dictionary of label -> measurements
+# Without pairs, all combinations of labels are compared. All pairs form one family for the correction
+# Too few permutations for the family are raised to needed_permutations(), otherwise nothing could be significant
+def compare(samples, pairs=None, n_permutations=n_permutations, workers=None, seed=0, alpha=alpha):
+    pairs = list(itertools.combinations(samples, 2)) if pairs is None else list(pairs)
+    needed = needed_permutations(len(pairs), alpha)
+    if n_permutations < needed:
+        print(f'{n_permutations} permutations cannot reach alpha={alpha} for {len(pairs)} pairs, using {needed}')
+        n_permutations = needed
+    data = [(np.asarray(samples[a], dtype='float64'), np.asarray(samples[b], dtype='float64')) for a, b in pairs]
+
+    # Hand out the pairs in chunks, every chunk gets its own independent random stream
+    n_chunks = min(len(pairs), 4 * (workers or os.cpu_count() or 1))
+    chunks = np.array_split(np.arange(len(pairs)), max(n_chunks, 1))
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    jobs = [([data[i] for i in chunk], chunk_seed, n_permutations) for chunk, chunk_seed in zip(chunks, seeds)]
+    with ProcessPoolExecutor(workers) as executor:
+        p = np.concatenate([np.asarray(result, dtype='float64') for result in executor.map(_test_pairs, jobs)])
+
+    comparisons = pd.DataFrame({
+        'a': [a for a, _ in pairs],
+        'b': [b for _, b in pairs],
+        'n_a': [len(x) for x, _ in data],
+        'n_b': [len(y) for _, y in data],
+        'mean_a': [x.mean() for x, _ in data],
+        'mean_b': [y.mean() for _, y in data],
+        'p': p,
+        'n_permutations': n_permutations,
+    })
+    comparisons['difference'] = comparisons['mean_a'] - comparisons['mean_b']
+    comparisons['p_holm'] = holm(p)
+    comparisons['p_bh'] = benjamini_hochberg(p)
+    comparisons['significant'] = comparisons['p_holm'] < alpha
+    return comparisons
+
+
+# Function to arrange the comparisons as a square matrix (label x label) of one of the columns
+def comparison_matrix(comparisons, column='p_holm'):
+    mirrored = pd.concat((comparisons[['a','b',column]], comparisons[['b','a',column]].set_axis(['a','b',column], axis=1)))
+    return mirrored.pivot(index='a', columns='b', values=column)
+
+
+# Function to collect the friction force range of every stroke of all friction tests, labelled 'model bar'
+def friction_samples(tests):
+    samples = {}
+    for model, bar, path in tests:
+        test_df = load_run(path, ['Time','Pressure(bar)','Force(N)'], drop_amount)
+        # Calculate the friction force by substracting Fp from the measured force (see equation 3 in the report)
+        friction_force = test_df['Force(N)'] - test_df['Pressure(bar)'] * 10**5 * bore_area(model)
+        samples[f'{model} {bar}bar'] = stroke_ranges(friction_force)[0]
+    return samples
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--friction', default='./data/friction')
+    parser.add_argument('--static', default='./data/static')
+    parser.add_argument('--output', default='./data/derived')
+    parser.add_argument('--permutations', type=int, default=n_permutations)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--all-pairs', action='store_true', help='also compare the friction of tests at different pressures')
+    args = parser.parse_args()
+    os.makedirs(args.output, exist_ok=True)
+
+    # The friction force of the models at the same pressure, as in the error-bar plots
+    samples = friction_samples(friction_tests(args.friction))
+    pairs = [(a, b) for a, b in itertools.combinations(samples, 2) if args.all_pairs or a.split()[-1] == b.split()[-1]]
+    friction = compare(samples, pairs, args.permutations, args.workers)
+    friction.to_csv(os.path.join(args.output, 'friction_comparisons.csv'), index=False)
+    print(f'Friction force range: {friction["significant"].sum()} of {len(friction)} pairs differ significantly')
+
+    # The static leakage of all models
+    if os.path.isdir(args.static):
+        samples = {model: windowed_leak_rates(load_run(path, ['Time','Pressure(bar)'], drop_amount)) for model, path in static_tests(args.static)}
+        leakage = compare(samples, None, args.permutations, args.workers)
+        leakage.to_csv(os.path.join(args.output, 'leak_comparisons.csv'), index=False)
+        print(f'Static leak rate: {leakage["significant"].sum()} of {len(leakage)} pairs differ significantly')
+        print(comparison_matrix(leakage).round(3).to_string())
+
+    print(f'\n ------ Succesfully saved the comparisons to {args.output} ------')
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the extend and retract cycles of a test are averaged into one representative cycle.
+The cycle boundaries are found in the laser position, each cycle is resampled onto a common
+phase grid and all cycles are stacked into a (cycles x phase) array.
+Phase 0 to 0.5 is the stroke in which the laser position increases, which is the retracting stroke
+(friction force above the mean in calculate_se()), and 0.5 to 1 the extending stroke.
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import numpy as np
+
+from resampling import interpolate
+
+
+# #### Global variables
+
+# Number of points on the phase grid of a single cycle (half for each stroke)
+n_phase = 200
+# The percentiles of the bands around the mean cycle
+percentiles = (5, 25, 50, 75, 95)
+# The channels that are averaged, when they are available
+cycle_channels = ['Laser(mm)','Pressure(bar)','Force(N)','FrictionForce']
+
+
+# #### Functions
+
+# Function to label every sample as low (-1) or high (1) position of the piston, using two thresholds
+# In between the thresholds a sample keeps the label of the last threshold passed (hysteresis)
+def position_state(laser, low=0.25, high=0.75):
+    laser = np.asarray(laser, dtype='float64')
+    minimum, maximum = np.nanpercentile(laser, [1, 99])
+    event = np.zeros(len(laser), dtype=int)
+    event[laser < minimum + low * (maximum - minimum)] = -1
+    event[laser > minimum + high * (maximum - minimum)] = 1
+    # Carry the last event forward: take the index of the most recent event for every sample
+    last = np.maximum.accumulate(np.where(event != 0, np.arange(len(laser)), 0))
+    return event[last]
+
+
+# Function to find the turning points of the piston: the lowest point of each low and the highest of each high part
+def turning_points(laser, low=0.25, high=0.75):
+    laser = np.asarray(laser, dtype='float64')
+    state = position_state(laser, low, high)
+    # Split the test into parts of constant state
+    part = np.cumsum(np.diff(state, prepend=state[0]) != 0)
+    # The lowest (or highest) point of each part, found for all parts at once by sorting
+    signed = np.where(state < 0, laser, -laser)
+    order = np.lexsort((signed, part))
+    first_of_part = np.flatnonzero(np.diff(part[order], prepend=-1))
+    points = order[first_of_part]
+    return points, state[points]
+
+
+# Function to find the start of each cycle (bottom turning point) and the top turning point within it
+def cycle_boundaries(laser, low=0.25, high=0.75):
+    points, kind = turning_points(laser, low, high)
+    # A cycle runs from a bottom turning point via a top turning point to the next bottom turning point
+    bottoms = np.flatnonzero(kind < 0)
+    bottoms = bottoms[bottoms + 2 < len(points)]
+    return points[bottoms], points[bottoms + 1], points[bottoms + 2]
+
+
+# Function to stack all cycles of a test on a common phase grid
+# The test is a dictionary or DataFrame with the time, the laser position and any other channels
+def stack_cycles(test, channels=None, n_phase=n_phase, time_column='Time', low=0.25, high=0.75):
+    channels = [channel for channel in (channels or cycle_channels) if channel in test]
+    time = np.asarray(test[time_column], dtype='float64')
+    values = np.column_stack([np.asarray(test[channel], dtype='float64') for channel in channels])
+    start, top, end = cycle_boundaries(test['Laser(mm)'], low, high)
+
+    # The time of every phase point of every cycle: each stroke is divided into equal time steps
+    # From the bottom to the top turning point the laser position increases (retracting), then decreases (extending)
+    fraction = np.linspace(0, 1, n_phase // 2, endpoint=False)
+    retract_time = time[start, None] + fraction * (time[top] - time[start])[:, None]
+    extend_time = time[top, None] + fraction * (time[end] - time[top])[:, None]
+    grid = np.hstack((retract_time, extend_time))
+
+    # Interpolate all channels of all cycles in a single call
+    stacked = interpolate(time, values, grid.ravel()).reshape(len(start), 2 * (n_phase // 2), len(channels))
+    return {
+        'phase': np.linspace(0, 1, 2 * (n_phase // 2), endpoint=False),
+        'cycles': {channel: stacked[:, :, i] for i, channel in enumerate(channels)},
+        'start': time[start],
+        'duration': time[end] - time[start],
+    }
+
+
+# Function to reduce the stacked cycles to a mean cycle with percentile bands
+def ensemble(test, channels=None, n_phase=n_phase, percentiles=percentiles, **kwargs):
+    stacked = stack_cycles(test, channels, n_phase, **kwargs)
+    result = {'phase': stacked['phase'], 'n_cycles': len(stacked['start']), 'duration': stacked['duration'].mean()}
+    for channel, cycles in stacked['cycles'].items():
+        result[channel] = {
+            # Cycles crossing a gap of a resampled test contain NaN, these are left out per phase point
+            'mean': np.nanmean(cycles, axis=0),
+            'std': np.nanstd(cycles, axis=0),
+            **{f'p{p}': band for p, band in zip(percentiles, np.nanpercentile(cycles, percentiles, axis=0))},
+        }
+    return result
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the measured signals are smoothed without introducing lag.
+Savitzky-Golay, zero-phase Butterworth and median filters are applied to many tests at once:
+the tests are padded into a single 2-D array, filtered in one call and trimmed back to their own length.
+The Butterworth filter extends the edges of a test from its own length, so it filters the tests of equal length together.
+Unlike the rolling means they replace in the results scripts, these filters do not delay the signal and do not start with NaN values.
+The filter coefficients are cached, so they are only designed once for each setting.
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy import ndimage, signal
+
+
+# #### Padding
+
+# Function to place tests of different length in one 2-D array
+def pad_runs(runs):
+    lengths = np.array([len(run) for run in runs])
+    padded = np.empty((len(runs), lengths.max()))
+    for i, run in enumerate(runs):
+        padded[i, :lengths[i]] = run
+        # Repeat the last value, so the padding does not pull the end of a test towards 0
+        padded[i, lengths[i]:] = padded[i, lengths[i] - 1]
+    return padded, lengths
+
+
+# Function to cut the filtered tests back to their own length
+# Tests passed as pandas Series are returned as Series with the same index
+def unpad_runs(padded, lengths, runs):
+    filtered = []
+    for row, length, run in zip(padded, lengths, runs):
+        if isinstance(run, pd.Series):
+            filtered.append(pd.Series(row[:length], index=run.index, name=run.name))
+        else:
+            filtered.append(row[:length].copy())
+    return filtered
+
+
+# #### Filter coefficients
+
+@lru_cache(maxsize=None)
+def savgol_coefficients(window, order, fs=1.0, deriv=0):
+    # Coefficients of the centred window, used for all samples away from the edges
+    centre = signal.savgol_coeffs(window, order, deriv=deriv, delta=1 / fs, use='dot')
+    # At the edges the polynomial is fitted to the first (or last) window and evaluated at each position
+    edge = np.array([signal.savgol_coeffs(window, order, deriv=deriv, delta=1 / fs, pos=pos, use='dot') for pos in range(window // 2)])
+    return centre, edge
+
+
+@lru_cache(maxsize=None)
+def butter_coefficients(cutoff, order, fs):
+    # Second order sections are numerically more robust than the (b, a) coefficients
+    return signal.butter(order, cutoff, fs=fs, output='sos')
+
+
+# #### Filters
+
+# Function to apply a Savitzky-Golay filter to a number of tests
+# With deriv=1 the smoothed derivative (per second when fs is given in Hz) is returned
+def savgol(runs, window, order=2, fs=1.0, deriv=0):
+    padded, lengths = pad_runs(runs)
+    if lengths.min() < window:
+        raise ValueError(f'All tests need at least {window} samples, the shortest has {lengths.min()}')
+    centre, edge = savgol_coefficients(window, order, fs, deriv)
+    half = window // 2
+
+    # Filter the middle of all tests at once, correlating with the centred coefficients
+    filtered = ndimage.correlate1d(padded, centre, axis=1, mode='nearest')
+
+    # Replace the first and last samples of each test by the polynomial fitted to its edge window
+    filtered[:, :half] = padded[:, :window] @ edge.T
+    rows = np.arange(len(runs))[:, None]
+    last_window = padded[rows, lengths[:, None] - window + np.arange(window)]
+    # The end of a test is the start of the reversed test, the sign flips for odd derivatives
+    sign = (-1)**deriv
+    filtered[rows, lengths[:, None] - 1 - np.arange(half)] = sign * (last_window[:, ::-1] @ edge.T)
+    return unpad_runs(filtered, lengths, runs)
+
+
+# Function to apply a zero-phase Butterworth low-pass filter to a number of tests
+# A test is filtered over its own length, so its result does not depend on the other tests
+def butter_filtfilt(runs, cutoff, fs, order=4):
+    sos = butter_coefficients(cutoff, order, fs)
+    lengths = np.array([len(run) for run in runs])
+    filtered = [None] * len(runs)
+    for length in np.unique(lengths):
+        group = np.flatnonzero(lengths == length)
+        rows = signal.sosfiltfilt(sos, np.array([np.asarray(runs[i], dtype='float64') for i in group]), axis=1)
+        for i, row in zip(group, rows):
+            filtered[i] = row
+    return unpad_runs(filtered, lengths, runs)
+
+
+# Function to apply a median filter to a number of tests, which removes spikes without rounding the steps
+def median(runs, window):
+    padded, lengths = pad_runs(runs)
+    return unpad_runs(ndimage.median_filter(padded, size=(1, window), mode='nearest'), lengths, runs)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the friction force of a test is broken up into its separate strokes.
+The friction force range of every stroke is the basis of the mean and standard error
+in results_friction_force.py and of the statistical comparison of the models.
+The friction force of many tests is calculated at once, with the tests joined into one flat array (see friction_kernel()).
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+from statistics import mean
+
+import numpy as np
+import pandas as pd
+
+from memo import memoize
+
+
+# #### Functions
+
+# Function to join the channels of a number of loaded tests into flat arrays
+# Returns an array per channel and the offsets, test i is [offsets[i]:offsets[i + 1]] of every array
+def concatenate_runs(test_dfs, channels):
+    offsets = np.concatenate(([0], np.cumsum([len(test_df) for test_df in test_dfs])))
+    if len(test_dfs) and np.any(np.diff(offsets) == 0):
+        raise ValueError('Every test needs at least one sample to be joined')
+    return [np.concatenate([test_df[channel].to_numpy(dtype='float64') for test_df in test_dfs]) for channel in channels], offsets
+
+
+# Function to calculate Fp and the friction force of all joined tests at once, with the bore area (in m^2) of every test
+# Also returns, per test, the mean friction force above its mean (FrictionFrom) and below its mean (FrictionTo)
+# Missing values are left out of the means, as pandas does
+def friction_kernel(pressure, force, offsets, areas):
+    starts, lengths = offsets[:-1], np.diff(offsets)
+    # Calculate force Fp based on the measured pressure (see equation 2 in the report)
+    Fp = pressure * 10**5 * np.repeat(np.asarray(areas, dtype='float64'), lengths)
+    # Calculate the friction force by substracting the measured force with Fp (see equation 3 in the report)
+    FF = force - Fp
+
+    # One reduction per sum over all tests, the means are repeated to compare every sample with the mean of its test
+    def mean_where(mask):
+        return np.add.reduceat(np.where(mask, FF, 0), starts) / np.add.reduceat(mask, starts)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        FF_mean = np.repeat(mean_where(~np.isnan(FF)), lengths)
+        friction_from, friction_to = mean_where(FF > FF_mean), mean_where(FF < FF_mean)
+    return Fp, FF, friction_from, friction_to
+
+
+# Function to calculate the friction force of a number of loaded tests, with the bore area (in m^2) of every test
+# Returns the friction force of every test (with the index of the test), FrictionFrom and FrictionTo
+def friction_forces(test_dfs, areas):
+    (pressure, force), offsets = concatenate_runs(test_dfs, ['Pressure(bar)','Force(N)'])
+    _, FF, friction_from, friction_to = friction_kernel(pressure, force, offsets, areas)
+    FF = [pd.Series(FF[start:end], index=test_df.index) for start, end, test_df in zip(offsets[:-1], offsets[1:], test_dfs)]
+    return FF, friction_from, friction_to
+
+
+# Function to calculate the friction force range of each retracting and extending stroke of a test
+# Also returns the last extending and retracting stroke, to determine the standard deviation of a single stroke
+@memoize
+def stroke_ranges(friction_force):
+    # Calculate the mean to define retracting and extending parts
+    frictionforce_mean = np.asarray(friction_force, dtype='float64').mean()
+    # Variable to store the friction force
+    frictionforce = list(friction_force)
+    # Variables for results and counter
+    frictionforce_ranges = []
+    i = 0
+
+    # Loop through the data and break them up into separate tests
+    while i < len(frictionforce) - 1:
+        # Lists for retracting and extending parts of a single test
+        retracting = []
+        extending = []
+
+        # First the retracting part of a test is done
+        # Get all values above the mean
+        while len(retracting) < 100 or frictionforce[i] > frictionforce_mean:
+            retracting.append(frictionforce[i])
+            i += 1
+            # Break if it gets below the mean
+            if i > len(frictionforce) - 1:
+                break
+
+        # Secondly the extending part of a test is done
+        # Get all values below the mean
+        while len(extending) < 100 or frictionforce[i] < frictionforce_mean:
+            extending.append(frictionforce[i])
+            i += 1
+            # Break if it gets above the mean
+            if i > len(frictionforce) - 1:
+                break
+
+        # The friction force range is defined as the difference between the mean friction force of the retracting and extending strokes
+        frictionforce_ranges.append(mean(retracting)-mean(extending))
+
+    return frictionforce_ranges,extending,retracting
+
+
+# Function to calculate the speed (in mm/s) of each extending and retracting stroke from the peaks of the laser
+@memoize
+def stroke_speeds(time, laser):
+    time = list(time)
+    laser = list(laser)
+
+    # Boolean variables to keep track of which peak we are looking for next (low or high)
+    high_peak_found = False
+    low_peak_found = False
+
+    # The peaks will be stored in lists as tuples
+    high_peaks = []
+    low_peaks = []
+
+    # For each distance measured by the laser, find both peaks
+    for cur_distance in range(0,len(laser)):
+        # Get the previous and next distance points of the laser
+        previous_distances = laser[cur_distance-20:cur_distance]
+        next_distances = laser[cur_distance:cur_distance+20]
+
+        # Make sure both lists are not empty
+        if previous_distances != [] and next_distances != []:
+            # A peak can be found if the distance is higher (or lower) than all the surrounding distances
+            if (all(laser[cur_distance] >= i for i in previous_distances) and all(laser[cur_distance] >= i for i in next_distances)) == True and high_peak_found == False:
+                # If this is true, add the distance and time to our list
+                high_peaks.append((laser[cur_distance], time[cur_distance]))
+                # A high peak has been found, next will be a low peak
+                high_peak_found = True
+                low_peak_found = False
+            # The next peak can be found if the distance is higher (or lower) than all the surrounding distances
+            if (all(laser[cur_distance] <= i for i in previous_distances) and all(laser[cur_distance] <= i for i in next_distances)) == True and low_peak_found == False:
+                low_peaks.append((laser[cur_distance], time[cur_distance]))
+                low_peak_found = True
+                high_peak_found = False
+
+    # List to store extending speeds for each run
+    extending_speeds = []
+    # For each high peak, calculate the speed
+    for i in range(0, len(high_peaks)):
+        # Delta distance (in mm) is the difference between the high peak and next low peak
+        delta_distance = high_peaks[i][0] - low_peaks[i][0]
+        # Same goes for the time (in s)
+        delta_time = high_peaks[i][1] - low_peaks[i][1]
+        # Calculate speed (in mm/s)
+        speed = delta_distance/delta_time
+        # Add speed to our list
+        extending_speeds.append(speed)
+
+    # List to store extending speeds for each run
+    retracting_speeds = []
+    # For each low peak, calculate the speed
+    for i in range(0, len(low_peaks)-1):
+        # Delta distance (in mm) is the difference between the low peak and next high peak (therefore +1)
+        delta_distance = low_peaks[i][0] - high_peaks[i+1][0]
+        # Same goes for the time (in s)
+        delta_time =  low_peaks[i][1] - high_peaks[i+1][1]
+        # Calculate speed (in mm/s)
+        speed = delta_distance/delta_time
+        # Add speed to our list
+        retracting_speeds.append(speed)
+
+    return extending_speeds,retracting_speeds
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the friction force is binned over the position of the piston to form hysteresis loops.
+The samples of all tests are concatenated and binned by test, stroke direction and position
+with a single np.bincount, which gives the mean and standard deviation of every loop in one pass.
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import numpy as np
+
+from filtering import savgol
+
+
+# #### Global variables
+
+# The position bins (in mm), covering the full stroke of the laser
+position_edges = np.arange(-3, 39.5, 0.5)
+# The strokes of a loop: the laser position increases while retracting and decreases while extending
+directions = ['retracting','extending']
+# Samples moving slower than this (in mm per sample) are turning points and are left out
+min_speed = 0.01
+
+
+# #### Functions
+
+# Function to bin the friction force of a number of tests over position and stroke direction
+# The tests are a dictionary of label -> test, each test having the 'Laser(mm)' and 'FrictionForce'
+def hysteresis_loops(tests, edges=position_edges, window=21, min_speed=min_speed, channel='FrictionForce'):
+    labels = list(tests)
+    laser = [np.asarray(tests[label]['Laser(mm)'], dtype='float64') for label in labels]
+    force = np.concatenate([np.asarray(tests[label][channel], dtype='float64') for label in labels])
+
+    # The stroke direction follows from the smoothed velocity of all tests, computed at once
+    velocity = np.concatenate(savgol(laser, window, order=2, deriv=1))
+    run = np.repeat(np.arange(len(labels)), [len(test) for test in laser])
+    laser = np.concatenate(laser)
+
+    # Keep the moving samples within the position range
+    position_bin = np.searchsorted(edges, laser, side='right') - 1
+    valid = (np.abs(velocity) > min_speed) & (position_bin >= 0) & (position_bin < len(edges) - 1) & ~np.isnan(force)
+    direction = (velocity < 0).astype(int)
+
+    # One flat bin index for every combination of test, direction and position
+    n_bins = len(edges) - 1
+    flat_bin = (run[valid] * 2 + direction[valid]) * n_bins + position_bin[valid]
+    size = len(labels) * 2 * n_bins
+    count = np.bincount(flat_bin, minlength=size)
+    total = np.bincount(flat_bin, weights=force[valid], minlength=size)
+    total_squared = np.bincount(flat_bin, weights=force[valid]**2, minlength=size)
+
+    # Mean and standard deviation per bin, empty bins are NaN
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        std = np.sqrt(np.maximum(total_squared / count - mean**2, 0))
+    shape = (len(labels), 2, n_bins)
+    return {
+        'labels': labels,
+        'edges': edges,
+        'centres': (edges[:-1] + edges[1:]) / 2,
+        'mean': mean.reshape(shape).astype('float32'),
+        'std': std.reshape(shape).astype('float32'),
+        'count': count.reshape(shape).astype('int32'),
+    }
+
+
+# Function to find the position (in mm) at which the friction force of each loop peaks, per direction
+def peak_position(loops):
+    magnitude = np.abs(np.nan_to_num(loops['mean'], nan=0.0))
+    return loops['centres'][magnitude.argmax(axis=2)]
+
+
+# Function to store the loops compactly, the labels are stored as text
+def save_loops(path, loops):
+    np.savez_compressed(path, **{**loops, 'labels': np.array([str(label) for label in loops['labels']])})
+
+
+def load_loops(path):
+    with np.load(path) as stored:
+        loops = {key: stored[key] for key in stored.files}
+    loops['labels'] = list(loops['labels'])
+    return loops
@@ -0,0 +1,413 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the samples of the test setup are streamed straight into the analysis.
+An asyncio server receives the seven channels over a local TCP or UNIX socket,
+batches them into preallocated ring buffers and passes every batch on to the
+friction, static leakage and dynamic leakage metrics.
+A stream may start with a header line, e.g. `# test=static model=O-ring`, the type of test selects the metrics
+(the leak alarm only runs on static and air-chamber tests, which are not vented every cycle, and the wear trend on
+dynamic and endurance tests) and the model gives the bore of the cylinder to the metrics that need it.
+A replay client streams the recorded .CSV files to the server, to test without the setup.
+
+Start the server with `python3 ingestion.py serve --port 5000`
+and replay a test with `python3 ingestion.py replay ./data/friction/O-ring_1bar.csv --port 5000 --speed 10`
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import asyncio
+import collections
+import inspect
+import io
+import math
+import os
+import time
+
+import numpy as np
+
+from batch import file_model
+from leak_alarm import LeakAlarmMetric, load_pressure
+from loading import columns, load_run
+from metadata import bore_area
+from wear import WearMetric
+
+
+# #### Global variables
+
+# Number of samples collected before a batch is passed on to the metrics
+batch_size = 256
+# Number of samples kept in the ring buffer of each connection (about 3 minutes at 11 ms)
+capacity = 2**14
+# Number of batches a metric may lag behind before the oldest batches are dropped
+queue_size = 64
+# Number of finished sessions of which the last snapshot is kept
+history = 100
+# The surface area (in m^2) of the 25 mm pneumatic cylinder, used when the model of the part is not known
+area = math.pi * (25 / 1000 / 2)**2
+
+
+# #### Ring buffer
+
+class RingBuffer:
+    # Preallocated circular buffer holding the latest samples of all channels
+    def __init__(self, capacity, n_channels=len(columns), dtype='float64'):
+        self.data = np.empty((capacity, n_channels), dtype=dtype)
+        self.capacity = capacity
+        # Total number of samples ever written, the write position follows from it
+        self.count = 0
+
+    def extend(self, block):
+        # Only the last capacity samples of a block can be kept, they are written where they would have ended up
+        kept = block[-self.capacity:]
+        start = (self.count + len(block) - len(kept)) % self.capacity
+        # Write the block in at most two slices, wrapping around the end of the buffer
+        first = min(len(kept), self.capacity - start)
+        self.data[start:start + first] = kept[:first]
+        self.data[:len(kept) - first] = kept[first:]
+        self.count += len(block)
+
+    def view(self):
+        # Return the stored samples in the order they were received
+        if self.count <= self.capacity:
+            return self.data[:self.count]
+        start = self.count % self.capacity
+        return np.concatenate((self.data[start:], self.data[:start]))
+
+
+# #### Metrics
+
+# Each metric receives the batches of a single connection and keeps its own state
+# The columns of a batch are the seven channels in the order of loading.columns
+time_col = columns.index('Time')
+laser_col = columns.index('Laser(mm)')
+pressure_col = columns.index('Pressure(bar)')
+force_col = columns.index('Force(N)')
+
+
+class FrictionMetric:
+    # The friction force range over the latest window of samples (see equation 3 in the report)
+    name = 'friction'
+
+    def __init__(self, model=None, area=area, window=capacity):
+        self.area = area if model is None else bore_area(model)
+        self.friction_force = RingBuffer(window, 1)
+
+    def update(self, batch):
+        # Calculate force Fp based on the measured pressure and subtract it from the measured force
+        FF = batch[:, force_col] - batch[:, pressure_col] * 10**5 * self.area
+        self.friction_force.extend(FF[:, None])
+
+    def result(self):
+        FF = self.friction_force.view()[:, 0]
+        if len(FF) == 0:
+            return {}
+        FF_mean = FF.mean()
+        friction_from = FF[FF > FF_mean].mean() if (FF > FF_mean).any() else FF_mean
+        friction_to = FF[FF < FF_mean].mean() if (FF < FF_mean).any() else FF_mean
+        return {'FrictionFrom': friction_from, 'FrictionTo': friction_to, 'FrictionRange': friction_from - friction_to}
+
+
+class StaticLeakageMetric:
+    # The pressure drop with respect to the first received pressure, one value per batch
+    name = 'static_leakage'
+
+    def __init__(self, history=4096):
+        self.first_pressure = None
+        self.pressure_drop = collections.deque(maxlen=history)
+
+    def update(self, batch):
+        if self.first_pressure is None:
+            self.first_pressure = batch[0, pressure_col]
+        # Time (in s) and pressure drop (in MPa), averaged over the batch
+        self.pressure_drop.append((batch[-1, time_col] / 1000, (batch[:, pressure_col].mean() - self.first_pressure) / 10))
+
+    def result(self):
+        if not self.pressure_drop:
+            return {}
+        return {'Time': self.pressure_drop[-1][0], 'PressureDrop(MPa)': self.pressure_drop[-1][1]}
+
+
+class DynamicLeakageMetric:
+    # The pressure each time the piston passes position alpha (in mm) within the margin
+    name = 'dynamic_leakage'
+
+    def __init__(self, alpha=37.7, margin=0.02, history=4096):
+        self.alpha = alpha
+        self.margin = margin
+        self.pressure = collections.deque(maxlen=history)
+
+    def update(self, batch):
+        # Selecting the data points around the chosen position with the chosen margin
+        at_alpha = np.abs(batch[:, laser_col] - self.alpha) < self.margin
+        self.pressure.extend(zip(batch[at_alpha, time_col] / 1000, batch[at_alpha, pressure_col] / 10))
+
+    def result(self):
+        if not self.pressure:
+            return {}
+        return {'Time': self.pressure[-1][0], 'Pressure(MPa)': self.pressure[-1][1], 'Passes': len(self.pressure)}
+
+
+# The metrics of each type of test, given in the header of a stream
+# The leak alarm needs a constant pressure, the friction and dynamic tests pressurise and vent every cycle
+test_metrics = {
+    'friction': (FrictionMetric,),
+    'static': (StaticLeakageMetric, LeakAlarmMetric),
+    'chamber': (StaticLeakageMetric, LeakAlarmMetric),
+    'dynamic': (DynamicLeakageMetric, WearMetric),
+    'endurance': (DynamicLeakageMetric, WearMetric),
+}
+# The metrics of a stream without a header
+default_metrics = (FrictionMetric, StaticLeakageMetric, DynamicLeakageMetric)
+
+
+# Function to tell whether a metric takes the model of the part, and whether it cannot do without it
+def takes_model(metric, required=False):
+    parameter = inspect.signature(metric).parameters.get('model')
+    return parameter is not None and (not required or parameter.default is inspect.Parameter.empty)
+
+
+# Function to read the header line of a stream, e.g. '# test=static model=O-ring', into a dictionary
+def parse_header(line, test_metrics=test_metrics):
+    header = dict(field.split('=', 1) for field in line.lstrip('#').split() if '=' in field)
+    if 'test' in header and header['test'] not in test_metrics:
+        raise ValueError(f"Unknown type of test {header['test']}, choose from {list(test_metrics)}")
+    if 'test' in header and 'model' not in header and any(takes_model(metric, True) for metric in test_metrics[header['test']]):
+        raise ValueError(f"The metrics of a {header['test']} test need the model, e.g. '# test={header['test']} model=O-ring'")
+    return header
+
+
+# Function to parse the complete lines of a stream into a (samples, channels) array
+# A line without exactly one number per channel is left out, so it cannot shift the samples after it
+# Returns the samples and the number of lines left out
+def parse_lines(data, n_channels=len(columns)):
+    rows = [line.split() for line in data.splitlines() if line.strip()]
+    complete = [row for row in rows if len(row) == n_channels]
+    try:
+        samples = np.array(complete, dtype='float64')
+    except ValueError:
+        # Only when a line holds something else than numbers, check the lines one by one
+        samples = []
+        for row in complete:
+            try:
+                samples.append([float(value) for value in row])
+            except ValueError:
+                pass
+        samples = np.array(samples, dtype='float64')
+    return samples.reshape(-1, n_channels), len(rows) - len(samples)
+
+
+# #### Server
+
+class Session:
+    # The ring buffer, metrics and counters of a single connected acquisition
+    def __init__(self, name, metrics, batch_size=batch_size, capacity=capacity, header=None):
+        self.name = name
+        self.header = header or {}
+        self.ring = RingBuffer(capacity)
+        # The metrics that take the model get the model of the header, an unknown model raises a KeyError
+        self.metrics = [metric(model=self.header['model']) if takes_model(metric) and 'model' in self.header else metric()
+                        for metric in metrics]
+        self.queues = [asyncio.Queue(queue_size) for _ in self.metrics]
+        # Preallocated batch that is filled while parsing the stream
+        self.batch = np.empty((batch_size, len(columns)))
+        self.filled = 0
+        self.dropped = 0
+        self.bad_lines = 0
+        self.started = time.perf_counter()
+
+    def add(self, samples):
+        # Copy the parsed samples into the batch and hand over every completed batch
+        while len(samples):
+            take = min(len(samples), len(self.batch) - self.filled)
+            self.batch[self.filled:self.filled + take] = samples[:take]
+            self.filled += take
+            samples = samples[take:]
+            if self.filled == len(self.batch):
+                self.flush()
+
+    def flush(self):
+        if self.filled == 0:
+            return
+        block = self.batch[:self.filled].copy()
+        self.filled = 0
+        self.ring.extend(block)
+        # The reader never waits for the metrics, a metric lagging behind loses its oldest batch
+        for queue in self.queues:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(block)
+
+    async def run_metric(self, metric, queue):
+        while True:
+            block = await queue.get()
+            if block is None:
+                return
+            metric.update(block)
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            **self.header,
+            'samples': self.ring.count,
+            'samples_per_s': self.ring.count / elapsed if elapsed > 0 else 0.0,
+            'dropped_batches': self.dropped,
+            'bad_lines': self.bad_lines,
+            **{metric.name: metric.result() for metric in self.metrics},
+        }
+
+
+class IngestionServer:
+    # Accepts any number of acquisitions, each connection gets its own session
+    # The metrics of a session follow from the type of test in its header, a stream without a header gets the default metrics
+    # A session is closed when its connection ends, only its last snapshot is kept in the bounded history
+    def __init__(self, metrics=default_metrics, batch_size=batch_size, capacity=capacity, test_metrics=test_metrics, history=history):
+        self.metrics = metrics
+        self.test_metrics = test_metrics
+        self.batch_size = batch_size
+        self.capacity = capacity
+        self.sessions = {}
+        self.finished = collections.deque(maxlen=history)
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info('peername') or 'unix'
+        # The first line is a header when it starts with '#', otherwise it holds the first sample
+        first = await reader.readline()
+        try:
+            header = parse_header(first.decode(), self.test_metrics) if first.startswith(b'#') else {}
+            metrics = self.test_metrics[header['test']] if 'test' in header else self.metrics
+            self.connections += 1
+            session = Session(f'{peer}#{self.connections}', metrics, self.batch_size, self.capacity, header)
+        except (ValueError, KeyError) as exception:
+            print(f'{peer}: {exception}')
+            writer.close()
+            return
+        self.sessions[session.name] = session
+        tasks = [asyncio.ensure_future(session.run_metric(metric, queue)) for metric, queue in zip(session.metrics, session.queues)]
+
+        # Incomplete lines are kept until the rest of the line arrives
+        remainder = b'' if first.startswith(b'#') else first
+        try:
+            while True:
+                chunk = await reader.read(2**16)
+                if not chunk:
+                    break
+                chunk = remainder + chunk
+                end = chunk.rfind(b'\n') + 1
+                remainder = chunk[end:]
+                if end:
+                    # Parse all complete lines at once, every line holds the seven channels
+                    samples, bad_lines = parse_lines(chunk[:end])
+                    session.bad_lines += bad_lines
+                    session.add(samples)
+            # The last line of a stream may lack its line ending
+            samples, bad_lines = parse_lines(remainder)
+            session.bad_lines += bad_lines
+            session.add(samples)
+        finally:
+            if session.bad_lines:
+                print(f'{session.name}: left out {session.bad_lines} malformed lines')
+            session.flush()
+            for queue in session.queues:
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+            await asyncio.gather(*tasks)
+            writer.close()
+            self.close_session(session)
+
+    def close_session(self, session):
+        # The ring buffers and metrics of the session are released, its final snapshot is kept
+        snapshot = session.snapshot()
+        print(session.name, 'finished', snapshot)
+        self.finished.append((session.name, snapshot))
+        del self.sessions[session.name]
+
+    async def serve(self, host='127.0.0.1', port=5000, path=None, report_every=5.0):
+        # Listen on a UNIX socket if a path is given, otherwise on TCP
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path=path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            while True:
+                await asyncio.sleep(report_every)
+                for name, session in self.sessions.items():
+                    print(name, session.snapshot())
+
+
+# #### Replay client
+
+async def replay(path, host='127.0.0.1', port=5000, unix_path=None, speed=1.0, chunk=0.01, test=None):
+    # Stream a recorded test at real (speed=1) or accelerated speed, speed=0 streams as fast as possible
+    # The type of test follows from the folder of the file (friction, static or dynamic), unless it is given
+    test = test or os.path.basename(os.path.dirname(os.path.abspath(path)))
+    if test == 'chamber':
+        # An air-chamber test only has the time and pressure, the other channels are streamed as NaN
+        chamber_time, pressure = load_pressure(path, 'airchamber')
+        samples = np.full((len(pressure), len(columns)), np.nan)
+        samples[:, time_col], samples[:, pressure_col] = chamber_time * 1000, pressure
+    else:
+        samples = load_run(path, drop_amount=0).to_numpy()
+    if unix_path is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    if test in test_metrics:
+        writer.write(f'# test={test} model={file_model(path)[0]}\n'.encode())
+
+    # The time of each sample (in s) at which it should be sent
+    send_at = (samples[:, time_col] - samples[0, time_col]) / 1000 / speed if speed > 0 else np.zeros(len(samples))
+    started = time.perf_counter()
+    i = 0
+    while i < len(samples):
+        # Send every sample that is due within the next chunk (in s) of wall time
+        elapsed = time.perf_counter() - started
+        j = int(np.searchsorted(send_at, elapsed + chunk, side='right'))
+        j = max(j, i + 1)
+        lines = io.StringIO()
+        np.savetxt(lines, samples[i:j], fmt='%.3f', delimiter='\t')
+        writer.write(lines.getvalue().encode())
+        await writer.drain()
+        i = j
+        if i < len(samples) and send_at[i] > elapsed + chunk:
+            await asyncio.sleep(send_at[i] - (time.perf_counter() - started))
+
+    writer.close()
+    await writer.wait_closed()
+    print(f'Replayed {len(samples)} samples of {path} in {time.perf_counter() - started:.2f} s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command in ['serve', 'replay']:
+        subparser = subparsers.add_parser(command)
+        subparser.add_argument('--host', default='127.0.0.1')
+        subparser.add_argument('--port', type=int, default=5000)
+        subparser.add_argument('--unix', default=None, help='path of a UNIX socket, used instead of TCP')
+    subparsers.choices['replay'].add_argument('files', nargs='+')
+    subparsers.choices['replay'].add_argument('--speed', type=float, default=1.0, help='1 is real time, 0 as fast as possible')
+    subparsers.choices['replay'].add_argument('--test', choices=list(test_metrics), default=None, help='type of test, by default the folder of a file')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        asyncio.run(IngestionServer().serve(args.host, args.port, args.unix))
+    else:
+        async def replay_all():
+            # Replay all files at the same time, as if each was a separate test setup
+            await asyncio.gather(*[replay(file, args.host, args.port, args.unix, args.speed, test=args.test) for file in args.files])
+        asyncio.run(replay_all())
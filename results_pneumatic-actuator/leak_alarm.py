@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, leaking parts are detected while the static leakage or air-chamber test is running.
+A one-sided CUSUM on the pressure decrease raises an alarm within seconds of a leak,
+instead of showing it after the 20 minute test.
+The cumulative sum of the pressure decreases telescopes to a level change: the statistic is the pressure residual
+below a reference level, the highest earlier pressure lowered by the allowed drift for every sample since.
+The threshold is calibrated for white noise on this residual, not for a random walk.
+All chambers are monitored at once, the state of each chamber is one element of an array.
+
+Replay recorded tests with
+`python3 leak_alarm.py ../appendix_compressed-air_chamber/data/Formlabs.csv ../appendix_compressed-air_chamber/data/Ultimaker_015.csv --format airchamber`
+Files with another layout, such as the Resultaten_*.csv repeatability tables, are skipped
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import math
+import time
+
+import numpy as np
+from scipy import optimize, stats
+
+from archive import read_acquisition
+from loading import columns, load_run
+
+
+# #### Global variables
+
+# The smallest leak (in bar/s) that should raise an alarm
+# Properly sealed chambers lose less than 0.001 bar/s, the Ultimaker 0.15 and 0.20 mm prints over 0.1 bar/s
+leak_rate = 0.01
+# Standard deviation (in bar) of the difference between two pressure samples of a sealed chamber
+# Measured on the aluminium air chamber, the pressure sensor resolution is 0.001 bar
+noise = 0.003
+# Accepted number of false alarms per hour of monitoring, for each chamber
+false_alarms_per_hour = 0.01
+
+
+# #### Functions
+
+# Function to determine the alarm threshold (in bar) from the accepted false alarm rate
+# The statistic of a sealed chamber exceeds the threshold when an earlier sample, j samples back, lies more than
+# the threshold plus j times the drift above the current sample. For white pressure noise this chance is
+# calculated for every value of the current sample, and the threshold is chosen so that it happens once in the
+# accepted number of samples. Exceedances come in short runs, so the false alarms are at most this frequent.
+def cusum_threshold(leak_rate, noise, dt, false_alarms_per_hour):
+    # The CUSUM subtracts half of the smallest leak per sample, so a sealed chamber drifts back to 0
+    drift = leak_rate * dt / 2
+    if drift <= 0:
+        raise ValueError('The leak rate and sample interval have to be positive')
+    # The noise of a single pressure sample (in bar), the noise is given for the difference of two samples
+    sigma = noise / math.sqrt(2)
+    # Average number of samples between two false alarms
+    average_run_length = 3600 / dt / false_alarms_per_hour
+
+    # The current sample (in units of sigma) and its probability, the earlier samples that can still exceed it
+    current = np.linspace(-8, 8, 641)
+    weight = stats.norm.pdf(current) * (current[1] - current[0])
+    back = np.arange(1, math.ceil(16 * sigma / drift) + 2)
+
+    def log_exceedance(threshold):
+        # Chance that no earlier sample exceeds the current one, for every value of the current sample
+        below = stats.norm.logcdf(current[:, None] + (threshold + drift * back[None, :]) / sigma).sum(axis=1)
+        return math.log(np.sum(weight * -np.expm1(below))) + math.log(average_run_length)
+
+    return optimize.brentq(log_exceedance, 0, 20 * sigma)
+
+
+class LeakAlarm:
+    # One-sided CUSUM on the pressure decrease of a number of chambers
+    def __init__(self, n_chambers, dt, leak_rate=leak_rate, noise=noise, false_alarms_per_hour=false_alarms_per_hour):
+        self.dt = dt
+        self.drift = leak_rate * dt / 2
+        self.threshold = cusum_threshold(leak_rate, noise, dt, false_alarms_per_hour)
+        # The state of all chambers: the previous pressure, the cumulative sum and its running minimum
+        self.previous = np.full(n_chambers, np.nan)
+        self.cumulative = np.zeros(n_chambers)
+        self.minimum = np.zeros(n_chambers)
+        self.samples = 0
+        # The sample at which each chamber raised its alarm, -1 if it did not
+        self.alarm_at = np.full(n_chambers, -1)
+
+    @property
+    def statistic(self):
+        # The CUSUM statistic is the rise of the cumulative sum above its running minimum
+        return self.cumulative - self.minimum
+
+    def update(self, pressure):
+        # Update with one sample (n_chambers,) or a block of samples (n_samples, n_chambers)
+        pressure = np.atleast_2d(np.asarray(pressure, dtype='float64'))
+
+        # The pressure decrease of each sample minus the allowed drift
+        # The first sample of a chamber has no previous pressure and adds nothing
+        previous = np.where(np.isnan(self.previous), pressure[0], self.previous)
+        decrease = -np.diff(np.vstack((previous, pressure)), axis=0) - self.drift
+        decrease[np.isnan(decrease)] = 0
+
+        # The CUSUM recursion S = max(0, S + x) equals the cumulative sum minus its running minimum,
+        # which is evaluated for the whole block at once
+        cumulative = self.cumulative + np.cumsum(decrease, axis=0)
+        minimum = np.minimum(self.minimum, np.minimum.accumulate(cumulative, axis=0))
+        statistic = cumulative - minimum
+
+        # Register the first sample above the threshold for chambers without an alarm
+        above = statistic > self.threshold
+        first = np.where(above.any(axis=0), above.argmax(axis=0), -1)
+        new_alarm = (self.alarm_at < 0) & (first >= 0)
+        self.alarm_at[new_alarm] = self.samples + first[new_alarm]
+
+        # Keep the state of the last sample
+        last_valid = ~np.isnan(pressure[-1])
+        self.previous[last_valid] = pressure[-1, last_valid]
+        self.cumulative = cumulative[-1]
+        self.minimum = minimum[-1]
+        self.samples += len(pressure)
+        return self.alarm_at >= 0
+
+    def alarm_time(self):
+        # Time (in s) after the start of monitoring at which each chamber raised its alarm, NaN if it did not
+        return np.where(self.alarm_at >= 0, self.alarm_at * self.dt, np.nan)
+
+
+class LeakAlarmMetric:
+    # Leak alarm for a single streamed static leakage or air-chamber test (see ingestion.py)
+    # Without a sample interval dt (in s), it is the median interval of the Time (in ms) of the first batch,
+    # the static tests are sampled every 11 ms and the air chambers every 100 ms
+    name = 'leak_alarm'
+
+    def __init__(self, dt=None, **kwargs):
+        self.dt = dt
+        self.kwargs = kwargs
+        self.alarm = None if dt is None else LeakAlarm(1, dt, **kwargs)
+
+    def update(self, batch):
+        if self.alarm is None:
+            if len(batch) < 2:
+                return
+            self.alarm = LeakAlarm(1, np.median(np.diff(batch[:, columns.index('Time')])) / 1000, **self.kwargs)
+        self.alarm.update(batch[:, columns.index('Pressure(bar)'), None])
+
+    def result(self):
+        if self.alarm is None:
+            return {}
+        return {'Leaking': bool(self.alarm.alarm_at[0] >= 0), 'AlarmTime': self.alarm.alarm_time()[0],
+                'Statistic': self.alarm.statistic[0], 'Threshold': self.alarm.threshold}
+
+
+# Function to load the pressure (in bar) and time (in s) of a test
+# A file with another layout raises a ValueError
+def load_pressure(path, data_format='labview'):
+    if data_format == 'airchamber':
+        # The air-chamber tests only have the time, the pressure in V and the pressure in bar
+        # The time is written in microseconds with dots as thousands separators
+        try:
+            test_df = read_acquisition(path, delimiter=';', header=None, names=['Time','A','Pressure'], usecols=['Time','Pressure'], dtype={'Time': str})
+            return test_df['Time'].str.replace('.', '', regex=False).astype('float64').to_numpy() / 1000000, test_df['Pressure'].to_numpy(dtype='float64')
+        except ValueError as exception:
+            raise ValueError(f'{path} is not an air-chamber test with the columns Time;A;Pressure ({exception})') from exception
+    test_df = load_run(path, ['Time','Pressure(bar)'])
+    return test_df['Time'].to_numpy() / 1000, test_df['Pressure(bar)'].to_numpy()
+
+
+# Function to replay recorded tests side by side, as if the chambers were monitored at the same time
+# Returns the alarm, the throughput and the replayed paths, the files with another layout are skipped
+def replay(paths, data_format='labview', block=1, **kwargs):
+    tests, replayed = [], []
+    for path in paths:
+        try:
+            tests.append(load_pressure(path, data_format))
+            replayed.append(path)
+        except ValueError as exception:
+            print(f'Skipped {exception}')
+    if not tests:
+        raise ValueError('None of the files could be replayed')
+    # The sample interval (in s) of the slowest test sets the monitoring interval
+    dt = max(np.median(np.diff(test_time)) for test_time, _ in tests)
+
+    # Place all tests in one array, shorter tests are padded with NaN which does not change their state
+    length = max(len(pressure) for _, pressure in tests)
+    pressure = np.full((length, len(tests)), np.nan)
+    for i, (_, test_pressure) in enumerate(tests):
+        pressure[:len(test_pressure), i] = test_pressure
+
+    # Feed the samples one by one (block=1) or in blocks, as they would arrive from the test setup
+    alarm = LeakAlarm(len(tests), dt, **kwargs)
+    started = time.perf_counter()
+    for start in range(0, length, block):
+        alarm.update(pressure[start:start + block])
+    elapsed = time.perf_counter() - started
+    return alarm, length * len(tests) / elapsed, replayed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--format', choices=['labview','airchamber'], default='labview')
+    parser.add_argument('--leak-rate', type=float, default=leak_rate, help='smallest leak to detect (in bar/s)')
+    parser.add_argument('--noise', type=float, default=noise, help='standard deviation of a pressure difference (in bar)')
+    parser.add_argument('--false-alarms', type=float, default=false_alarms_per_hour, help='accepted false alarms per hour')
+    parser.add_argument('--block', type=int, default=1, help='number of samples processed at once')
+    args = parser.parse_args()
+
+    alarm, throughput, replayed = replay(args.files, args.format, args.block, leak_rate=args.leak_rate, noise=args.noise, false_alarms_per_hour=args.false_alarms)
+    print(f'Threshold: {alarm.threshold:.4f} bar, sample interval: {alarm.dt:.3f} s')
+    for path, alarm_time in zip(replayed, alarm.alarm_time()):
+        print(f'{path}: ' + ('no leak detected' if np.isnan(alarm_time) else f'leak detected after {alarm_time:.1f} s'))
+    print(f'Throughput: {throughput:,.0f} chamber samples/s')
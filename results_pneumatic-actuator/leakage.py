@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the static leakage of every model is summarised in a leak table.
+The pressure of a static test decays towards atmospheric pressure, so the leakage is described by
+the initial pressure decay rate and the time constant of the decay (p - p_atm) / (dp/dt).
+The time constant does not depend on the pressure and is used to parameterise the cylinder simulator.
+
+Run `python3 leakage.py` to summarise all tests in ./data/static
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from loading import drop_amount, load_run
+from metadata import static_tests
+
+
+# #### Global variables
+
+# The channels used in the static leakage analysis
+channels = ['Time','Pressure(bar)']
+# The part of the static test (in s) over which the decay rate is fitted, as plotted in results_static_leakage.py
+fit_duration = 130
+# The length (in s) of the windows that give the repeated leak rates of a single test
+rate_window = 10
+
+
+# #### Functions
+
+# Function to summarise the leakage of a static test, the pressure is the gauge pressure (in bar)
+def static_leak_rate(test_df, fit_duration=fit_duration):
+    time = (test_df['Time'].to_numpy() - test_df['Time'].iloc[0]) / 1000
+    pressure = test_df['Pressure(bar)'].to_numpy()
+    fitted = time <= fit_duration
+
+    # A straight line through the start of the test gives the decay rate (in bar/s)
+    rate, start_pressure = np.polyfit(time[fitted], pressure[fitted], 1)
+    # The pressure decays exponentially, the time constant (in s) follows from the initial rate
+    time_constant = start_pressure / -rate if rate < 0 else np.inf
+    return {'start_pressure': start_pressure, 'rate': rate, 'time_constant': time_constant,
+            'pressure_drop': pressure[fitted][-1] - pressure[0]}
+
+
+# Function to fit the decay rate (in bar/s) of consecutive windows of a static test, all windows at once
+# The rates of the windows are the repeated measurements of the leakage of a model
+def windowed_leak_rates(test_df, window=rate_window, fit_duration=fit_duration):
+    time = (test_df['Time'].to_numpy() - test_df['Time'].iloc[0]) / 1000
+    pressure = test_df['Pressure(bar)'].to_numpy()
+    fitted = time < fit_duration
+    time, pressure = time[fitted], pressure[fitted]
+    index = (time // window).astype(int)
+    # The time within each window keeps the sums below small
+    time = time - index * window
+
+    # Least squares slope of every window from the sums of its samples
+    count = np.bincount(index)
+    t_mean = np.bincount(index, time) / count
+    p_mean = np.bincount(index, pressure) / count
+    covariance = np.bincount(index, time * pressure) / count - t_mean * p_mean
+    variance = np.bincount(index, time**2) / count - t_mean**2
+    # Only complete windows are used
+    complete = count >= 0.9 * count.max()
+    return (covariance / variance)[complete]
+
+
+# Function to summarise all static tests in a table (one row per model)
+def leak_table(tests):
+    rows = [{'model': model, **static_leak_rate(load_run(path, channels, drop_amount))} for model, path in tests]
+    return pd.DataFrame(rows).set_index('model')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='./data/static')
+    parser.add_argument('--output', default='./data/derived/leak_rates.csv')
+    args = parser.parse_args()
+
+    leak_rates = leak_table(static_tests(args.data))
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    leak_rates.to_csv(args.output)
+    print(leak_rates.round(5).to_string())
+    print(f'\n ------ Succesfully saved the leak rates to {args.output} ------')
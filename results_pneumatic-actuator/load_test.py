@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this script, the latency of the metrics service (service.py) is measured under concurrent load.
+A number of clients request a mix of endpoints as fast as they can, after which the latency percentiles
+and the throughput are reported per endpoint. The first requests fill the cache of the service,
+run the test twice to compare a cold and a warm cache.
+The percentiles only include the successful (200) requests, an error is returned faster or slower than a metric
+and is counted separately. Add e.g. --path '/leakage/static?model=O-ring' when the static tests are in ./data.
+
+Start the service with `python3 service.py`, then run `python3 load_test.py --requests 2000 --clients 16`
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import http.client
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+
+# #### Global variables
+
+# The requests of the mix, the per-run friction metrics are requested most
+# Only the tests in the repository (./data/friction) are requested, the leakage tests are not included
+requests = [
+    '/models',
+    '/friction?model=O-ring&bar=1',
+    '/friction?model=O-ring&bar=3',
+    '/friction?model=NAPN&bar=5',
+    '/friction?model=Kidney',
+    '/velocity?model=O-ring&bar=3',
+    '/dimensions?ID=22&S=3.5',
+    '/dimensions?ID=18.64&S=3.53',
+]
+
+
+# #### Functions
+
+# Every client thread keeps its own connection open, as a client of the service would
+local = threading.local()
+
+
+def request(host, port, path):
+    if getattr(local, 'connection', None) is None:
+        local.connection = http.client.HTTPConnection(host, port, timeout=300)
+    start = time.perf_counter()
+    try:
+        local.connection.request('GET', path)
+        response = local.connection.getresponse()
+        response.read()
+        status = response.status
+    except (OSError, http.client.HTTPException):
+        local.connection.close()
+        local.connection = None
+        status = None
+    return path, status, time.perf_counter() - start
+
+
+# Function to send a number of requests from a number of clients at once, returns the latency (in ms) per request
+def load_test(url, paths=requests, n_requests=1000, clients=8, seed=0):
+    address = urlparse(url)
+    mix = np.random.default_rng(seed).choice(paths, n_requests)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        results = list(executor.map(lambda path: request(address.hostname, address.port, path), mix))
+    duration = time.perf_counter() - start
+    latencies = pd.DataFrame(results, columns=['path','status','latency'])
+    latencies['latency'] *= 1000
+    return latencies, duration
+
+
+# Function to summarise the latencies per endpoint and over all requests
+# The latency percentiles are taken over the successful requests, the errors are only counted
+def summarise(latencies, duration):
+    def percentiles(group):
+        latency = group.loc[group['status'] == 200, 'latency']
+        return pd.Series({'requests': len(group), 'errors': int((group['status'] != 200).sum()),
+                          'p50_ms': latency.quantile(0.5), 'p90_ms': latency.quantile(0.9),
+                          'p99_ms': latency.quantile(0.99), 'max_ms': latency.max()})
+    summary = latencies.groupby('path').apply(percentiles)
+    summary.loc['all'] = percentiles(latencies)
+    summary['requests/s'] = summary['requests'] / duration
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--path', action='append', default=[], help='request to add to the mix, can be given more than once')
+    parser.add_argument('--output', default=None, help='.csv to store the latency of every request')
+    args = parser.parse_args()
+
+    latencies, duration = load_test(args.url, requests + args.path, args.requests, args.clients)
+    print(summarise(latencies, duration).round(2).to_string())
+    print(f'\n{len(latencies)} requests from {args.clients} clients in {duration:.1f} s')
+    if args.output:
+        latencies.to_csv(args.output, index=False)
+        print(f'\n ------ Succesfully saved the latencies to {args.output} ------')
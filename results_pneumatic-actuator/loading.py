@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the LabView acquisitions of the pneumatic actuator tests are loaded.
+Each analysis declares the channels it needs and only those columns are parsed.
+The acquisitions may be compressed or stored in archives (see archive.py).
+The start of a test, before the setup has settled, is detected per test and dropped.
+Every loaded test is validated (see validation.py), the report is kept with the test.
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import logging
+
+import numpy as np
+
+from archive import read_acquisition, read_acquisitions
+from memo import memoize
+from validation import ValidationError, summary, validate_run
+
+
+# #### Global variables
+
+# The seven columns LabView writes for every sample (see README)
+# A, B and C are the raw voltages of the laser, pressure and force sensor
+columns = ['Time','A','B','C','Laser(mm)','Pressure(bar)','Force(N)']
+# The deviating starting values are detected for each test ('auto'), a number drops that many data points
+drop_amount = 'auto'
+# The fixed number of data points dropped when no settled part is found
+fixed_drop_amount = 15
+# The channel that has to settle, the sliding window (in samples) and the thresholds relative to the noise of the test
+settle_channel = 'Pressure(bar)'
+settle_window = 50
+std_factor = 2
+slope_factor = 3
+# The start transient is searched within this part of the test
+max_transient = 0.1
+# An interval longer than this (in ms), or time going back, is a restart of the acquisition
+# The hiccups of a few hundred ms in the friction tests (a few dropped samples) are no restart
+restart_gap = 2000
+
+logger = logging.getLogger(__name__)
+
+
+# #### Functions
+
+# Function to find where a test settles, returns the number of samples to drop
+# The values are compared in a sliding window: the standard deviation and the change (slope times window) within
+# the window have to be small compared to the typical standard deviation of the whole test
+def detect_transient(values, time=None, window=settle_window, std_factor=std_factor, slope_factor=slope_factor,
+                     max_transient=max_transient, restart_gap=restart_gap):
+    values = np.asarray(values, dtype='float64')
+    limit = int(len(values) * max_transient)
+    if len(values) < 2 * window or limit < 1:
+        return 0
+
+    # Sums over every window from cumulative sums, relative to the first value to keep them small
+    x = values - values[0]
+    k = np.arange(len(x))
+    sums = [np.concatenate(([0], np.cumsum(term))) for term in (x, x**2, k * x)]
+    total, squares, moments = (cumulative[window:] - cumulative[:-window] for cumulative in sums)
+    start = np.arange(len(total))
+    mean = total / window
+    std = np.sqrt(np.maximum(squares / window - mean**2, 0))
+    # The least squares slope within each window, with the time counted from the start of the window
+    slope = (moments - start * total - (window - 1) / 2 * total) / (window * (window**2 - 1) / 12)
+
+    noise = np.median(std)
+    settled = (std <= std_factor * noise) & (np.abs(slope) * window <= slope_factor * noise)
+    cut = int(settled[:limit].argmax()) if settled[:limit].any() else None
+
+    # Samples before a restart of the acquisition (a reset or a gap of seconds in the time) are part of the transient
+    if time is not None:
+        intervals = np.diff(np.asarray(time, dtype='float64')[:limit + 1])
+        restarts = np.flatnonzero((intervals <= 0) | (intervals > restart_gap))
+        if len(restarts):
+            cut = max(cut or 0, int(restarts[-1]) + 1)
+    return cut
+
+
+# Function to give the channels to parse and the arguments of the parser
+def parse_arguments(channels=columns, drop_amount=drop_amount, dtype='float64'):
+    # Unknown channels would otherwise silently end up as an empty selection
+    unknown = [channel for channel in channels if channel not in columns]
+    if unknown:
+        raise ValueError(f'Unknown channels {unknown}, choose from {columns}')
+
+    # The transient is detected on the time and settle channel, which are parsed as well
+    parsed = list(channels)
+    if drop_amount == 'auto':
+        parsed += [channel for channel in ['Time', settle_channel] if channel not in parsed]
+
+    # Project the columns at parse time, the parser skips converting everything else
+    # The dtype (e.g. 'float32') is applied while parsing, so no float64 copy is made
+    return {'delimiter': r'\s+', 'header': None, 'names': columns, 'usecols': parsed, 'dtype': {channel: dtype for channel in parsed}}
+
+
+# Function to validate a parsed test and drop its start transient
+# With validate='strict' a test that fails validation raises a ValidationError, otherwise its issues are logged by log_run()
+def prepare_run(run_df, path, channels=columns, drop_amount=drop_amount, validate=True):
+    # The whole acquisition is validated, including the start that is dropped below
+    report = None
+    if validate:
+        report = validate_run(run_df)
+        report['path'] = path
+        if report['status'] == 'error' and validate == 'strict':
+            raise ValidationError(report)
+
+    # How the start was cut: 'detected', 'fixed' when no settled start was found, or None for a given drop_amount
+    transient, settled_at = None, None
+    if drop_amount == 'auto':
+        cut = detect_transient(run_df[settle_channel].to_numpy(), run_df['Time'].to_numpy())
+        if cut is None:
+            cut, transient = fixed_drop_amount, 'fixed'
+        else:
+            transient, settled_at = 'detected', run_df['Time'].iloc[cut]
+    else:
+        cut = drop_amount
+
+    # Keep the requested order of the channels
+    run_df = run_df[list(channels)]
+
+    # Drop the first data points, the original index is kept so run_df[...].iloc[0] is the first value
+    run_df = run_df.iloc[cut:]
+    # The number of dropped data points stays available with the test, also in the cache
+    run_df.attrs['drop_amount'] = cut
+    run_df.attrs['transient'] = transient
+    run_df.attrs['settled_at'] = settled_at
+    run_df.attrs['validation'] = report
+    return run_df
+
+
+# Function to log the data quality of a loaded test: its validation issues and the dropped start
+# It is called on every load, also when the test comes from the cache
+def log_run(run_df, path):
+    report = run_df.attrs.get('validation')
+    if report is not None and report['status'] != 'ok':
+        logger.warning('%s: %s', path, summary(report))
+
+    cut = run_df.attrs.get('drop_amount')
+    if run_df.attrs.get('transient') == 'fixed':
+        logger.warning('%s: no settled start found, dropping the first %d data points', path, cut)
+    elif run_df.attrs.get('transient') == 'detected':
+        logger.info('%s: dropping the first %d data points (settled at %s ms)', path, cut, run_df.attrs['settled_at'])
+    return run_df
+
+
+# Function to parse and prepare a single test, without logging
+def _load_run(path, channels=columns, drop_amount=drop_amount, dtype='float64', validate=True):
+    run_df = read_acquisition(path, **parse_arguments(channels, drop_amount, dtype))
+    return prepare_run(run_df, path, channels, drop_amount, validate)
+
+
+# Function to load a single test, parsing only the requested channels
+# The test may be compressed or in an archive, it is decompressed while it is parsed (see archive.py)
+def load_run(path, channels=columns, drop_amount=drop_amount, dtype='float64', validate=True):
+    return log_run(_load_run(path, channels, drop_amount, dtype, validate), path)
+
+
+# Function to load a number of tests, they are parsed in parallel processes (see archive.py)
+# Returns a dictionary of the tests by path
+def load_runs(paths, channels=columns, drop_amount=drop_amount, dtype='float64', validate=True, workers=None):
+    tables = read_acquisitions(paths, workers, **parse_arguments(channels, drop_amount, dtype))
+    return {path: log_run(prepare_run(run_df, path, channels, drop_amount, validate), path) for path, run_df in tables.items()}
+
+
+# The same function, with the loaded tests cached on disk (see memo.py)
+# A second run reads the cached test instead of parsing the raw acquisition again
+# Only the parsing is cached; the data quality of the test is logged on every load, also on a cache hit
+_cached_load_run = memoize(_load_run, paths=('path',))
+
+
+def cached_load_run(path, channels=columns, drop_amount=drop_amount, dtype='float64', validate=True):
+    return log_run(_cached_load_run(path, channels, drop_amount, dtype, validate), path)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the parameters of the LuGre dynamic friction model are identified for every friction test.
+The model is simulated for a whole population of candidate parameter sets at once
+(one array element per candidate) and the population is improved with the cross-entropy method.
+The tests are distributed over a process pool.
+
+Run `python3 lugre.py` to identify all tests in ./data/friction
+
+LuGre model (velocity v in mm/s, bristle deflection z in mm):
+    dz/dt = v - sigma0 * |v| / g(v) * z
+    g(v)  = Fc + (Fs - Fc) * exp(-(v / vs)^2)
+    F     = F0 + sigma0 * z + sigma1 * dz/dt + sigma2 * v
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from filtering import savgol
+from loading import drop_amount, load_run
+from metadata import bore_area, friction_tests
+from resampling import resample_run
+from stribeck import channels, fit_friction_models, window
+
+
+# #### Global variables
+
+# The parameters of the model, the positive parameters are searched on a logarithmic scale
+parameters = ['F0','Fc','Fs','vs','sigma0','sigma1','sigma2']
+positive = np.array([False, True, True, True, True, True, True])
+# Settings of the cross-entropy method
+population = 256
+elite_fraction = 0.1
+iterations = 30
+
+
+# #### Functions
+
+# Function to simulate the friction force for a population of parameter sets
+# v is the velocity (in mm/s) on a uniform grid with step dt (in s), theta has one row per candidate
+def simulate(v, dt, theta):
+    F0, Fc, Fs, vs, sigma0, sigma1, sigma2 = theta.T
+    z = np.zeros(len(theta))
+    force = np.empty((len(v), len(theta)))
+    for k, v_k in enumerate(v):
+        g = Fc + (Fs - Fc) * np.exp(-(v_k / vs)**2)
+        rate = sigma0 * abs(v_k) / g
+        # The bristle equation is integrated exactly over the step, which is stable for any stiffness
+        z_steady = np.sign(v_k) * g / sigma0
+        z = z_steady + (z - z_steady) * np.exp(-rate * dt)
+        dz = v_k - rate * z
+        force[k] = F0 + sigma0 * z + sigma1 * dz + sigma2 * v_k
+    return force
+
+
+# Function to prepare a test: velocity (in mm/s) and friction force (in N) on a uniform grid
+def prepare(test_df, area):
+    uniform_df, report = resample_run(test_df)
+    dt = report['dt'] / 1000
+    velocity = savgol([uniform_df['Laser(mm)'].to_numpy()], window, order=2, fs=1 / dt, deriv=1)[0]
+    friction_force = uniform_df['Force(N)'].to_numpy() - uniform_df['Pressure(bar)'].to_numpy() * 10**5 * area
+    # During gaps in the acquisition the piston is assumed at rest and the error is not counted
+    measured = ~np.isnan(velocity) & ~np.isnan(friction_force)
+    return np.nan_to_num(velocity), friction_force, measured, dt
+
+
+# Function to identify the LuGre parameters of a test with the cross-entropy method
+def identify(velocity, friction_force, measured, dt, seed=0, population=population, elite_fraction=elite_fraction, iterations=iterations):
+    rng = np.random.default_rng(seed)
+
+    # Start around the static Stribeck fit, the bristle stiffness and damping are unknown
+    static = fit_friction_models(velocity[measured], friction_force[measured])
+    Fc = max(abs(static['Fc']), 0.1)
+    start = np.array([static['F0'], Fc, 1.5 * Fc, max(np.median(np.abs(velocity[measured])) / 2, 0.1), 100.0, 1.0, max(static['b'], 1e-3)])
+    mean = np.where(positive, np.log(start), start)
+    std = np.where(positive, 1.0, max(1.0, abs(static['F0'])))
+
+    n_elite = max(2, int(population * elite_fraction))
+    best_theta, best_rmse = None, np.inf
+    for _ in range(iterations):
+        # Draw the candidates and simulate all of them at once
+        sample = mean + std * rng.standard_normal((population, len(parameters)))
+        theta = np.where(positive, np.exp(sample), sample)
+        error = simulate(velocity, dt, theta)[measured] - friction_force[measured, None]
+        rmse = np.sqrt(np.mean(error**2, axis=0))
+        rmse[~np.isfinite(rmse)] = np.inf
+
+        # Move the search distribution towards the best candidates
+        elite = np.argsort(rmse)[:n_elite]
+        mean = sample[elite].mean(axis=0)
+        std = sample[elite].std(axis=0) + 1e-3
+        if rmse[elite[0]] < best_rmse:
+            best_theta, best_rmse = theta[elite[0]], rmse[elite[0]]
+
+    return {**dict(zip(parameters, best_theta)), 'rmse': best_rmse}
+
+
+# Function to identify a single friction test, run in a separate process
+def identify_test(test):
+    model, bar, path = test
+    test_df = load_run(path, channels, drop_amount)
+    return {'model': model, 'bar': bar, **identify(*prepare(test_df, bore_area(model)))}
+
+
+# Function to identify all tests in parallel and collect the parameters in a table
+def identify_all(tests, workers=None):
+    with ProcessPoolExecutor(workers) as executor:
+        rows = list(executor.map(identify_test, tests))
+    return pd.DataFrame(rows).set_index(['model','bar'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='./data/friction')
+    parser.add_argument('--output', default='./data/derived/lugre_parameters.csv')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    lugre_parameters = identify_all(friction_tests(args.data), args.workers)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    lugre_parameters.to_csv(args.output)
+    print(lugre_parameters.round(3).to_string())
+    print(f'\n ------ Succesfully saved the LuGre parameters to {args.output} ------')
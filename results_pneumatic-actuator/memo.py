@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, derived results are cached on disk so they are not recomputed from the raw data on every run.
+A result is stored under a key made of:
+  - the function and the content hash of the module it is defined in and of the local modules it imports, directly or not
+  - the content hash of every data file passed to an argument declared as a path
+    (the hash is kept per file size and modification time)
+  - all other arguments, including defaults such as drop_amount, margin and window sizes, and an optional version
+Changing a data file, the code of the modules or any parameter therefore gives a new key.
+The cache is bounded in size, the least recently used results are removed first.
+
+Run `python3 memo.py` to show the size of the cache, or `python3 memo.py --clear` to empty it
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from archive import locate
+
+
+# #### Global variables
+
+# The location and maximum size (in bytes) of the cache, next to this module wherever the scripts are run from
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'derived', 'cache')
+# Modules within the repository are local, their code is part of the key of the functions that use them
+local_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+max_bytes = 512 * 1024**2
+# Files are hashed in blocks of 1 MB
+block_size = 1024**2
+
+
+# #### Functions
+
+# Function to find the source files of a module and of all local modules it uses, directly or through other modules
+# A module uses the modules it imports and the modules of the functions and classes it imports from them
+@functools.lru_cache(maxsize=None)
+def local_sources(module_name):
+    sources, modules = set(), [sys.modules.get(module_name)]
+    while modules:
+        module = modules.pop()
+        try:
+            source = os.path.abspath(inspect.getsourcefile(module))
+        except TypeError:
+            continue
+        if source in sources or not source.startswith(local_root + os.sep) or not os.path.isfile(source):
+            continue
+        sources.add(source)
+        for value in vars(module).values():
+            owner = getattr(value, '__module__', None)
+            modules.append(value if inspect.ismodule(value) else sys.modules.get(owner) if isinstance(owner, str) else None)
+    return sorted(sources)
+
+
+class Cache:
+    def __init__(self, directory=cache_dir, max_bytes=max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    # The index of the stored results and file hashes, every process and thread opens its own connection
+    @property
+    def index(self):
+        if getattr(self._local, 'index', None) is None or self._local.pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            self._local.index = sqlite3.connect(os.path.join(self.directory, 'index.sqlite'), timeout=60, isolation_level=None)
+            self._local.index.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER, accessed REAL)')
+            self._local.index.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, digest TEXT)')
+            self._local.pid = os.getpid()
+        return self._local.index
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.pkl')
+
+    # Function to get the content hash of a file, it is only read again when its size or modification time changed
+    def file_digest(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.index.execute('SELECT size, mtime, digest FROM files WHERE path = ?', (path,)).fetchone()
+        if row is not None and row[:2] == (stat.st_size, stat.st_mtime_ns):
+            return row[2]
+        digest = hashlib.blake2b()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(block_size), b''):
+                digest.update(block)
+        self.index.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)', (path, stat.st_size, stat.st_mtime_ns, digest.hexdigest()))
+        return digest.hexdigest()
+
+    # Function to add the fingerprint of an argument to the key, data is hashed by its content
+    # A string is only taken as a data file when the argument is declared as a path, any other string counts as it is
+    def _update(self, digest, value, is_path=False):
+        # A compressed acquisition or a member of an archive is hashed by the file it is stored in
+        found = locate(value) if is_path and isinstance(value, str) else None
+        if found is not None:
+            digest.update(b'file' + self.file_digest(found[0]).encode() + repr(found[1]).encode())
+        elif isinstance(value, np.ndarray):
+            digest.update(f'array{value.dtype}{value.shape}'.encode() + np.ascontiguousarray(value).tobytes())
+        elif isinstance(value, (pd.Series, pd.DataFrame)):
+            digest.update(f'pandas{value.shape}{list(value.dtypes) if isinstance(value, pd.DataFrame) else value.dtype}'.encode())
+            digest.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        elif isinstance(value, (list, tuple)):
+            digest.update(f'{type(value).__name__}{len(value)}'.encode())
+            for item in value:
+                self._update(digest, item, is_path)
+        elif isinstance(value, dict):
+            digest.update(f'dict{len(value)}'.encode())
+            for item_key in sorted(value, key=repr):
+                self._update(digest, item_key, is_path)
+                self._update(digest, value[item_key], is_path)
+        else:
+            digest.update(repr(value).encode())
+
+    # Function to make the key of a call of a function, the paths are the names of the arguments that hold data files
+    def key(self, func, args, kwargs, paths=(), version=None):
+        digest = hashlib.blake2b()
+        digest.update(f'{func.__module__}.{func.__qualname__}{version!r}'.encode())
+        # The whole module and the local modules it uses count, so a changed helper or setting also gives a new key
+        sources = local_sources(func.__module__)
+        for source in sources:
+            digest.update(self.file_digest(source).encode())
+        if not sources:
+            digest.update(func.__code__.co_code)
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        for name, value in bound.arguments.items():
+            digest.update(name.encode())
+            self._update(digest, value, name in paths)
+        return digest.hexdigest()
+
+    # Function to look up a result, returns whether it was found and the result
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as file:
+                value = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return False, None
+        self.index.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+        return True, value
+
+    # Function to store a result, written to a temporary file first so a crash never leaves a partial result
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+        self.index.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)', (key, os.path.getsize(path), time.time()))
+        self.evict()
+
+    # Function to remove the least recently used results until the cache fits its maximum size
+    def evict(self):
+        total = self.index.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.index.execute('SELECT key, size FROM entries ORDER BY accessed').fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self.index.execute('DELETE FROM entries WHERE key = ?', (key,))
+            total -= size
+
+    # Function to give the number of results and their total size (in bytes)
+    def stats(self):
+        return self.index.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+
+    def clear(self):
+        if getattr(self._local, 'index', None) is not None:
+            self._local.index.close()
+            self._local.index = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+# The cache shared by all memoized functions
+cache = Cache()
+
+
+# Decorator to cache the results of a function on disk, e.g. @memoize above the definition
+# The arguments that hold data files are given as paths, e.g. @memoize(paths=('path',)), they are hashed by their content
+# Raise the version when the result changes for another reason than the code of the local modules, e.g. a new library
+def memoize(func=None, paths=(), version=None):
+    if func is None:
+        return functools.partial(memoize, paths=paths, version=version)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = cache.key(func, args, kwargs, paths, version)
+        found, value = cache.get(key)
+        if not found:
+            value = func(*args, **kwargs)
+            cache.put(key, value)
+        return value
+    # The function itself remains available, e.g. to time it without the cache
+    wrapper.uncached = func
+    return wrapper
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clear', action='store_true')
+    args = parser.parse_args()
+
+    if args.clear:
+        cache.clear()
+        print(f' ------ Succesfully cleared {cache.directory} ------')
+    else:
+        entries, size = cache.stats()
+        print(f'{entries} cached results, {size / 1024**2:.1f} of {cache.max_bytes / 1024**2:.0f} MB in {cache.directory}')
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the tested models and their properties are defined in one place.
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import math
+import os
+import sys
+
+# geometry.py is found from the location of this module, so it can be imported from any folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'method_dimension-calculations'))
+from geometry import kidney, stadium
+
+
+# #### Global variables
+
+# The models with different sealing mechanism used in this test
+rings = ['O-ring','NAPN','NAP310','PK','KDN','O-ring257','X-ring257']
+# The models with different cross-sectional shape used in this test
+shapes = ['Circle','Stadium','Kidney','Stadium_lc','Kidney_lc']
+
+# The pressures (in bar) of the friction tests of each model
+# Some shapes extrude at higher pressure, no data is available for them
+friction_pressures = {ring: [1,3,5,7] for ring in rings}
+friction_pressures.update({
+    'Circle': [1,2,3,4,5,6,7],
+    'Stadium': [1,2,3],
+    'Kidney': [1,2,3,4],
+    'Stadium_lc': [1,2,3,4,5],
+    'Kidney_lc': [1,2,3,4,5,6,7],
+})
+
+# The diameter (in mm) of the pneumatic cylinder of each model, the X-ring and corresponding O-ring use a 25.7 mm cylinder
+# A new model or cylinder is added here, a model that is not listed has no known bore
+bore_diameter = {
+    'O-ring': 25,
+    'NAPN': 25,
+    'NAP310': 25,
+    'PK': 25,
+    'KDN': 25,
+    'O-ring257': 25.7,
+    'X-ring257': 25.7,
+    'Circle': 25,
+    'Stadium': 25,
+    'Kidney': 25,
+    'Stadium_lc': 25,
+    'Kidney_lc': 25,
+}
+# The non-circular shapes fit the 22 x 3.5 mm O-ring, with about the area of the 25 mm cylinder (see geometry.py)
+shape_ring = (22, 3.5)
+# The surface area (in mm^2) of the bore of each model, the stadium and kidney shapes have the area of their solved dimensions
+bore_surface = {model: math.pi * (diameter / 2)**2 for model, diameter in bore_diameter.items()}
+bore_surface.update({shape: float(stadium(*shape_ring)[2][0]) for shape in ['Stadium','Stadium_lc']})
+bore_surface.update({shape: float(kidney(*shape_ring)[2][0]) for shape in ['Kidney','Kidney_lc']})
+
+
+# #### Functions
+
+# Function to get the surface area (in m^2) of the pneumatic cylinder of a model
+# An unknown model raises a KeyError, its bore has to be added to bore_diameter first
+def bore_area(model):
+    if model not in bore_surface:
+        raise KeyError(f'The bore of {model} is unknown, add it to bore_diameter in metadata.py')
+    return bore_surface[model] / 10**6
+
+
+# Function to list the friction tests as (model, bar, path)
+def friction_tests(data_dir='./data/friction'):
+    return [(model, bar, os.path.join(data_dir, f'{model}_{bar}bar.csv')) for model in rings + shapes for bar in friction_pressures[model]]
+
+
+# Function to list the static leakage tests as (model, path)
+def static_tests(data_dir='./data/static'):
+    return [(model, os.path.join(data_dir, f'{model}.csv')) for model in rings + shapes]
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, long tests are prepared for interactive zooming with a min/max/mean pyramid.
+Level 0 holds the samples themselves, every next level combines a number of blocks (factor) of the level below
+into their minimum, maximum and mean. A window of the test is drawn from the finest level that has no more
+points in the window than needed, so a view of hours of data and a view of a second cost the same.
+The levels are stored as .npy files and read with memory mapping, only the part in the window is read from disk.
+
+Run `python3 pyramid.py './data/static/*.csv'` to build the pyramids in ./data/derived/pyramids
+In a notebook, explorer('./data/static/O-ring.csv') shows a test with widgets to pan and zoom
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import json
+import os
+import shutil
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from archive import find_acquisitions, locate
+from loading import columns, load_run
+
+try:
+    import ipywidgets as widgets
+    from IPython.display import display
+except ImportError:
+    widgets = None
+
+
+# #### Global variables
+
+# The location of the pyramids, one folder per test with the same path as the test in ./data
+pyramid_dir = './data/derived/pyramids'
+# The number of blocks combined into one block of the next level, and the size at which the pyramid stops
+factor = 8
+min_points = 1000
+# The number of points drawn in a window
+max_points = 2000
+
+
+# #### Functions
+
+# Function to build all levels of a pyramid from the time (n,) and the values of the channels (n, channels)
+# Returns a list of (time, values), the time being the start of each block and the values (blocks, channels, stats)
+def build_pyramid(time, values, factor=factor, min_points=min_points):
+    time = np.asarray(time, dtype='float64')
+    values = np.asarray(values, dtype='float32').reshape(len(time), -1)
+    levels = [(time, values)]
+
+    # Sums and counts of the valid samples are carried along, so every mean is that of the samples themselves
+    missing = np.isnan(values)
+    low, high = values, values
+    total, count = np.where(missing, 0, values).astype('float64'), (~missing).astype('int64')
+    while len(time) > min_points:
+        starts = np.arange(0, len(time), factor)
+        # NaN is ignored by fmin and fmax, a block with only NaN stays NaN
+        low, high = np.fmin.reduceat(low, starts, axis=0), np.fmax.reduceat(high, starts, axis=0)
+        total, count = np.add.reduceat(total, starts, axis=0), np.add.reduceat(count, starts, axis=0)
+        time = time[starts]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+        levels.append((time, np.stack((low, high, mean), axis=-1).astype('float32')))
+    return levels
+
+
+# Function to give the folder of the pyramid of a test
+def pyramid_path(path, directory=pyramid_dir):
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath('./data'))
+    return os.path.join(directory, os.path.splitext(relative)[0])
+
+
+# Function to store the levels of a pyramid, with the channels and the file it was built from
+def save_pyramid(levels, folder, channels, source=None):
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+    for level, (time, values) in enumerate(levels):
+        np.save(os.path.join(folder, f'time_{level}.npy'), time)
+        np.save(os.path.join(folder, f'values_{level}.npy'), values)
+    with open(os.path.join(folder, 'meta.json'), 'w') as file:
+        json.dump({'channels': channels, 'levels': len(levels), 'source': source}, file)
+
+
+# Function to give the size and modification time of the file a test is stored in, to recognise a changed test
+def source_signature(path):
+    found = locate(path)
+    if found is None:
+        raise FileNotFoundError(f'{path} does not exist, also not compressed or in an archive')
+    stat = os.stat(found[0])
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class Pyramid:
+    def __init__(self, folder):
+        with open(os.path.join(folder, 'meta.json')) as file:
+            self.meta = json.load(file)
+        self.channels = self.meta['channels']
+        # The levels are memory mapped, reading a window only reads that part of the file
+        self.levels = [(np.load(os.path.join(folder, f'time_{level}.npy'), mmap_mode='r'),
+                        np.load(os.path.join(folder, f'values_{level}.npy'), mmap_mode='r')) for level in range(self.meta['levels'])]
+
+    @property
+    def start(self):
+        return float(self.levels[0][0][0])
+
+    @property
+    def end(self):
+        return float(self.levels[0][0][-1])
+
+    # Function to select the finest level that has at most max_points points between start and end
+    def level(self, start, end, max_points=max_points):
+        for level, (time, _) in enumerate(self.levels):
+            if np.searchsorted(time, end, 'right') - np.searchsorted(time, start, 'left') <= max_points:
+                return level
+        return len(self.levels) - 1
+
+    # Function to get the time, minimum, maximum and mean of a channel between start and end
+    # The blocks that overlap the window are included, so the window is always filled up to its edges
+    def window(self, channel, start=None, end=None, max_points=max_points):
+        start = self.start if start is None else start
+        end = self.end if end is None else end
+        level = self.level(start, end, max_points)
+        time, values = self.levels[level]
+        first = max(np.searchsorted(time, start, 'right') - 1, 0)
+        last = np.searchsorted(time, end, 'right')
+        time = np.array(time[first:last])
+        values = np.array(values[first:last, self.channels.index(channel)])
+        if level == 0:
+            return time, values, values, values
+        return time, values[:, 0], values[:, 1], values[:, 2]
+
+
+# Function to get the pyramid of a test, it is built when it does not exist or when the test changed
+def get_pyramid(path, channels=None, directory=pyramid_dir, factor=factor):
+    channels = [channel for channel in columns if channel != 'Time'] if channels is None else list(channels)
+    folder = pyramid_path(path, directory)
+    signature = source_signature(path)
+    if os.path.isfile(os.path.join(folder, 'meta.json')):
+        pyramid = Pyramid(folder)
+        if pyramid.meta['source'] == signature and all(channel in pyramid.channels for channel in channels):
+            return pyramid
+
+    # The whole test is kept, including the start transient
+    test_df = load_run(path, ['Time'] + channels, drop_amount=0)
+    levels = build_pyramid(test_df['Time'].to_numpy() / 1000, test_df[channels].to_numpy(), factor)
+    save_pyramid(levels, folder, channels, signature)
+    return Pyramid(folder)
+
+
+# Function to draw the window of a number of channels, the range between the minimum and maximum is shaded
+def draw_window(pyramid, channels, start, end, max_points=max_points, ax=None):
+    ax = ax or plt.gca()
+    for channel in channels:
+        time, low, high, mean = pyramid.window(channel, start, end, max_points)
+        line, = ax.plot(time, mean, lw=1, label=channel)
+        ax.fill_between(time, low, high, color=line.get_color(), alpha=0.3, lw=0)
+    ax.set_xlim(start, end)
+    ax.set_xlabel('Time (s)')
+    ax.legend(loc='upper right')
+    return ax
+
+
+# Function to explore a test in a notebook, with widgets to select the channels and to pan and zoom
+def explorer(path, channels=None, max_points=max_points):
+    if widgets is None:
+        raise ImportError('The explorer needs the ipywidgets package, install it with pip install ipywidgets')
+    pyramid = get_pyramid(path, channels)
+    duration = pyramid.end - pyramid.start
+
+    # The requested channels are shown first, the other channels of the pyramid can be added
+    select = widgets.SelectMultiple(options=pyramid.channels, value=tuple(channels or pyramid.channels[-1:]), description='Channels')
+    width = widgets.FloatLogSlider(value=duration, min=np.log10(max(duration / 10**5, 0.01)), max=np.log10(duration),
+                                   step=0.01, description='Window (s)', continuous_update=False)
+    start = widgets.FloatSlider(value=pyramid.start, min=pyramid.start, max=pyramid.end, step=duration / 1000,
+                                description='Start (s)', continuous_update=False, layout=widgets.Layout(width='80%'))
+    output = widgets.Output()
+
+    def draw(change=None):
+        window_start = min(start.value, pyramid.end - width.value)
+        with output:
+            output.clear_output(wait=True)
+            fig, ax = plt.subplots(figsize=(10, 4))
+            draw_window(pyramid, select.value, window_start, window_start + width.value, max_points, ax)
+            ax.set_title(os.path.basename(path))
+            plt.show()
+
+    for widget in (select, width, start):
+        widget.observe(draw, names='value')
+    draw()
+    display(widgets.VBox([widgets.HBox([select, width]), start, output]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('patterns', nargs='+', help='files or glob patterns of the acquisitions')
+    parser.add_argument('--output', default=pyramid_dir)
+    args = parser.parse_args()
+
+    paths = sorted(path for pattern in args.patterns for path in find_acquisitions(pattern))
+    for path in paths:
+        pyramid = get_pyramid(path, directory=args.output)
+        print(f'{path}: {len(pyramid.levels)} levels, {len(pyramid.levels[0][0])} to {len(pyramid.levels[-1][0])} points')
+    print(f'\n ------ Succesfully saved {len(paths)} pyramids to {args.output} ------')
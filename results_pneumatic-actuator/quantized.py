@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, acquisitions are archived as the raw voltages of the sensors, quantized to 16-bit integers.
+LabView writes the voltages A, B and C (laser, pressure and force sensor) next to the calibrated channels, and the
+calibrated channels are a linear function of the voltages: Laser(mm) = gain * A + offset, and so on.
+The archive (.npz) of a test holds:
+  - the time, as the first time and the integer steps in milliseconds (or microseconds when the time has fractions of a
+    millisecond), as int16 when all steps fit and int32 otherwise
+  - the voltages, as int16 counts of voltage_resolution (1 mV, the resolution LabView writes)
+  - the calibration of the test: the gain and offset of every calibrated channel, fitted on the test itself
+The calibrated channels are not stored, they are calculated from the voltages when the test is read.
+A corrected calibration is written to the archives with correct_calibration(), after which every result is recomputed
+(the cache in memo.py follows the content of the archive).
+
+An archived test keeps its plain path: ./data/friction/O-ring_1bar.csv is read from ./data/friction/O-ring_1bar.npz
+when the .csv is not there (see archive.py), so load_run() and the scripts are unchanged.
+
+Run `python3 quantized.py './data/friction/*.csv'` to archive acquisitions next to the tests,
+add --remove-csv to remove every .csv once its archive is written and read back
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+
+# #### Global variables
+
+# The columns of an acquisition (as columns in loading.py), the voltages and the calibrated channel of every voltage
+columns = ['Time','A','B','C','Laser(mm)','Pressure(bar)','Force(N)']
+voltages = ['A','B','C']
+calibrated = ['Laser(mm)','Pressure(bar)','Force(N)']
+# The resolution (in V) of the stored voltages, a larger step is used when a voltage does not fit in 16 bits
+voltage_resolution = 0.001
+# The units (in ms) tried for the time steps, the first in which all steps are whole numbers is used
+time_units = [1, 0.001]
+# The count that marks a missing value
+missing = np.iinfo('int16').min
+# The gain of every sensor (in mm/V, bar/V and N/V), used when a voltage does not vary enough within a test to fit it
+nominal_gain = np.array([13.3376, 2.0, 46.52])
+# The largest difference between a test and its archive (in the unit of the column) for which --remove-csv removes the
+# .csv: the time is kept exactly, the calibrated channels to within the rounding of LabView (about 0.007 mm, 0.001 bar
+# and 0.025 N). The voltages are kept to within half of their step (voltage_scale in the archive)
+tolerance = {'Time': 1e-6, 'Laser(mm)': 0.01, 'Pressure(bar)': 0.002, 'Force(N)': 0.05}
+# The location of the archives, None places each archive next to its test, where archive.py finds it
+# In another folder, the archives get the same path as the tests in ./data
+quantized_dir = None
+
+
+# #### Functions
+
+# Function to fit the calibration of a test, the gain and offset of every calibrated channel on its voltage
+# All channels are fitted at once, returns the calibration (channels, 2) and the largest difference with the fit
+def fit_calibration(volts, values):
+    valid = ~(np.isnan(volts) | np.isnan(values))
+    count = np.maximum(valid.sum(axis=0), 1)
+    mean_v, mean_e = np.where(valid, volts, 0).sum(axis=0) / count, np.where(valid, values, 0).sum(axis=0) / count
+    variance = np.where(valid, (volts - mean_v)**2, 0).sum(axis=0) / count
+    covariance = np.where(valid, (volts - mean_v) * (values - mean_e), 0).sum(axis=0) / count
+    # A voltage that hardly changes (e.g. the laser in a static test) does not determine the gain
+    fitted = variance > (10 * voltage_resolution)**2
+    gain = np.where(fitted, covariance / np.where(fitted, variance, 1), nominal_gain)
+    offset = mean_e - gain * mean_v
+    residual = np.nanmax(np.abs(values - (volts * gain + offset)), axis=0, initial=0)
+    return np.stack((gain, offset), axis=1), residual
+
+
+# Function to calculate the calibrated channels from the voltages (samples, channels), one operation for all channels
+def calibrate(volts, calibration):
+    calibration = np.asarray(calibration, dtype='float64')
+    return volts * calibration[:, 0] + calibration[:, 1]
+
+
+# Function to quantize an acquisition with all columns, returns the arrays of the archive
+def quantize_run(run_df):
+    time = run_df['Time'].to_numpy(dtype='float64')
+    if np.isnan(time).any():
+        raise ValueError('The time has missing values, the test cannot be archived')
+    steps = np.diff(time)
+    unit = next((unit for unit in time_units if np.allclose(steps / unit, np.round(steps / unit), rtol=0, atol=1e-6)), time_units[-1])
+    steps = np.round(steps / unit)
+    largest = np.abs(steps).max(initial=0)
+    if largest > np.iinfo('int32').max:
+        raise ValueError('A time step does not fit in 32 bits')
+    steps = steps.astype('int16' if largest <= np.iinfo('int16').max else 'int32')
+
+    volts = run_df[voltages].to_numpy(dtype='float64')
+    # The step of every voltage, so its largest value fits in 16 bits
+    scale = np.maximum(voltage_resolution, np.nanmax(np.abs(volts), axis=0, initial=0) / np.iinfo('int16').max)
+    counts = np.where(np.isnan(volts), missing, np.round(np.nan_to_num(volts / scale))).astype('int16')
+    calibration, residual = fit_calibration(volts, run_df[calibrated].to_numpy(dtype='float64'))
+    return {'time_start': np.float64(time[0] if len(time) else 0), 'time_unit': np.float64(unit), 'time_steps': steps, 'voltages': counts,
+            'voltage_scale': scale, 'calibration': calibration, 'residual': residual}
+
+
+def save_quantized(path, arrays):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Written to a temporary file first, an archive is never left half written
+    temporary = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez(temporary, **arrays)
+    os.replace(temporary, path)
+
+
+# Function to read an archived test as a DataFrame with the columns of an acquisition
+# The arguments of pd.read_csv that select columns (names, usecols, dtype) are accepted, so it reads as read_acquisition()
+# A calibration (channels, 2) replaces the calibration stored with the test
+def read_quantized(path, names=None, usecols=None, dtype=None, calibration=None, **kwargs):
+    if names is not None and list(names) != columns:
+        raise ValueError(f'{path} holds the columns {columns}, not {list(names)}')
+    with np.load(path) as archive:
+        arrays = {name: archive[name] for name in archive.files}
+    counts = arrays['voltages']
+    steps = np.concatenate(([0], np.cumsum(arrays['time_steps'], dtype='int64')))[:len(counts)]
+    return dequantize(steps, counts, arrays, usecols, dtype, calibration)
+
+
+# Function to read an archived test in blocks of rows, only the block being read is held in memory
+# The counts and time steps are mapped from the archive and sliced per block, the arguments are as in read_quantized()
+def iter_quantized(path, chunksize, names=None, usecols=None, dtype=None, calibration=None, **kwargs):
+    if names is not None and list(names) != columns:
+        raise ValueError(f'{path} holds the columns {columns}, not {list(names)}')
+    with zipfile.ZipFile(path) as archive:
+        arrays = {name: np.load(archive.open(f'{name}.npy')) for name in ('time_start','time_unit','voltage_scale','calibration')}
+        counts, time_steps = map_array(path, archive, 'voltages'), map_array(path, archive, 'time_steps')
+
+    elapsed = 0
+    for start in range(0, len(counts), chunksize):
+        end = min(start + chunksize, len(counts))
+        # The step before every sample of the block, the first sample of the test has none
+        steps = time_steps[max(start - 1, 0):end - 1]
+        steps = elapsed + np.cumsum(np.concatenate(([0], steps)) if start == 0 else steps, dtype='int64')
+        elapsed = steps[-1]
+        run_df = dequantize(steps, np.asarray(counts[start:end]), arrays, usecols, dtype, calibration)
+        run_df.index = pd.RangeIndex(start, end)
+        yield run_df
+
+
+# Function to map an array of an archive into memory without reading it, only the slices that are used are read
+# np.savez stores every array uncompressed as a .npy file, the array is found after the headers of both formats
+def map_array(path, archive, name):
+    info = archive.getinfo(f'{name}.npy')
+    if info.compress_type != zipfile.ZIP_STORED:
+        return np.load(archive.open(info))
+    with open(path, 'rb') as file:
+        # The local header of the zip file is 30 bytes, followed by the file name and an extra field of given lengths
+        file.seek(info.header_offset)
+        local_header = file.read(30)
+        file.seek(info.header_offset + 30 + int.from_bytes(local_header[26:28], 'little') + int.from_bytes(local_header[28:30], 'little'))
+        version = np.lib.format.read_magic(file)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(file)
+        offset = file.tell()
+    if not np.prod(shape):
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape, order='F' if fortran_order else 'C')
+
+
+# Function to calculate the channels of an acquisition from the time steps and counts of an archive
+def dequantize(steps, counts, arrays, usecols=None, dtype=None, calibration=None):
+    volts = np.where(counts == missing, np.nan, counts * arrays['voltage_scale'])
+    time = arrays['time_start'] + steps * arrays['time_unit']
+    values = calibrate(volts, arrays['calibration'] if calibration is None else calibration)
+
+    run_df = pd.DataFrame(np.column_stack((time, volts, values)), columns=columns)
+    if usecols is not None:
+        run_df = run_df[[column for column in columns if column in usecols]]
+    if isinstance(dtype, dict):
+        run_df = run_df.astype({column: value for column, value in dtype.items() if column in run_df})
+    elif dtype is not None:
+        run_df = run_df.astype(dtype)
+    return run_df
+
+
+# Function to replace the calibration of a channel in a number of archives, e.g. after a sensor was calibrated again
+# Without an offset the offset of each test is kept, it holds the zero (tare) of that test
+def correct_calibration(paths, channel, gain, offset=None):
+    index = calibrated.index(channel)
+    for path in paths:
+        with np.load(path) as archive:
+            arrays = {name: archive[name] for name in archive.files}
+        arrays['calibration'][index] = [gain, arrays['calibration'][index, 1] if offset is None else offset]
+        save_quantized(path, arrays)
+
+
+# Function to compare a test with its archive as it is read back, returns the largest difference of every column
+# A value that is missing in only one of them counts as an infinite difference
+def archive_error(run_df, archived_df):
+    values, archived = run_df.to_numpy(dtype='float64'), archived_df.to_numpy(dtype='float64')
+    difference = np.where(np.isnan(values) != np.isnan(archived), np.inf, np.abs(archived - values))
+    return pd.Series(np.nanmax(difference, axis=0, initial=0), index=run_df.columns)
+
+
+# Function to tell whether the archive of a test holds the test within the tolerance of every column
+def within_tolerance(error, arrays, tolerance=tolerance):
+    limits = pd.Series({**tolerance, **dict(zip(voltages, np.asarray(arrays['voltage_scale']) / 2 + 1e-9))})
+    return bool((error[limits.index] <= limits).all())
+
+
+# Function to give the path of the archive of a test
+def quantized_path(path, directory=quantized_dir):
+    if directory is None:
+        return os.path.splitext(path)[0] + '.npz'
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath('./data'))
+    return os.path.join(directory, os.path.splitext(relative)[0] + '.npz')
+
+
+if __name__ == '__main__':
+    from archive import find_acquisitions, read_acquisition
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('patterns', nargs='+', help='files or glob patterns of the acquisitions')
+    parser.add_argument('--output', default=quantized_dir, help='folder of the archives, by default next to the tests')
+    parser.add_argument('--remove-csv', action='store_true', help='remove the .csv of every archived test')
+    args = parser.parse_args()
+    if args.remove_csv and args.output is not None:
+        parser.error('--remove-csv needs the archives next to the tests, where they are found instead of the .csv')
+
+    rows = []
+    for path in sorted(path for pattern in args.patterns for path in find_acquisitions(pattern)):
+        run_df = read_acquisition(path, delimiter=r'\s+', header=None, names=columns)
+        target = quantized_path(path, args.output)
+        arrays = quantize_run(run_df)
+        save_quantized(target, arrays)
+        # The channels as they are read back, compared with the channels LabView wrote
+        error = archive_error(run_df, read_quantized(target))
+        exact = within_tolerance(error, arrays)
+        # Only a plain .csv held by its archive is removed, the test is read from its archive from now on
+        # A calibrated channel that is not linear in its voltage is not held by the archive, its .csv is kept
+        removed = args.remove_csv and exact and path.endswith('.csv') and os.path.isfile(path)
+        if removed:
+            os.remove(path)
+        rows.append({'path': path, 'samples': len(run_df), 'float64_kB': run_df.shape[0] * 4 * 8 / 1024, 'archive_kB': os.path.getsize(target) / 1024,
+                     **{f'error_{column}': value for column, value in error.items()}, 'within_tolerance': exact, 'removed': removed})
+
+    archived = pd.DataFrame(rows)
+    print(archived.round(4).to_string(index=False))
+    print(f"\n{archived['float64_kB'].sum() / archived['archive_kB'].sum():.1f} times smaller than the time and calibrated channels as float64")
+    for path in archived.loc[~archived['within_tolerance'], 'path']:
+        print(f'{path}: the archive differs from the test by more than the tolerance' + (', the .csv is kept' if args.remove_csv else ''))
+    print(f"\n ------ Succesfully saved {len(archived)} archives to {args.output or 'the folders of the tests'} ------")
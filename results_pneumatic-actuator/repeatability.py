@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the repeatability tests are evaluated with agreement statistics instead of overlaid traces.
+The measurements of a repeatability campaign are one array of shape (sets, targets, repeats):
+  - sets: the repeat sets, e.g. rerun and reconnected, or every printed part
+  - targets: what is measured repeatedly, e.g. the pressures of a friction test or the times of a pressure drop
+  - repeats: the repeated tests (Test 1, 2, 3, ...), any number of them
+The intraclass correlation (ICC), Bland-Altman limits of agreement and coefficient of variation
+are computed for all sets at once.
+
+Run `python3 repeatability.py` to evaluate ./data/repeatability and the air-chamber repeatability tests
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from archive import find_acquisitions, read_acquisition
+from friction import stroke_ranges
+from loading import drop_amount, load_run
+from metadata import bore_area, friction_pressures
+from resampling import resample_run
+
+
+# #### Global variables
+
+# The model used in the repeatability tests
+model = 'O-ring257'
+# The times (in s) at which the static and air-chamber pressure drops are compared, averaged over 1 s
+drop_times = np.arange(10, 131, 10)
+# The position in the piston (in mm) where the dynamic pressure is compared, per repeat set and test
+# The tests were done with a different alpha, other tests use the alpha of the model
+dynamic_alpha = {
+    'rerun': {1: 38.5, 2: 35.5, 3: 35.5},
+    'reconnected': {1: 37.7, 2: 35.5, 3: 38.5},
+}
+default_alpha = 37.7
+margin = 0.02
+# The dynamic test is divided into windows, the mean pressure at alpha of each window is a target
+dynamic_windows = 10
+# The air-chamber repeatability tests (in kPa), the chamber was restarted (rerun) or taken apart (reconnected)
+airchamber_tests = {
+    'rerun': '../appendix_compressed-air_chamber/data/Resultaten_opnieuwaanzetten.csv',
+    'reconnected': '../appendix_compressed-air_chamber/data/Resultaten_In_en_uit_elkaar_deel.csv',
+}
+# The z-value of the 95% limits of agreement
+z = 1.96
+
+
+# #### Agreement statistics
+
+# Function to compute the two-way ANOVA mean squares of (sets, targets, repeats) measurements
+def _mean_squares(values):
+    n, k = values.shape[1], values.shape[2]
+    grand = values.mean(axis=(1, 2), keepdims=True)
+    target_mean = values.mean(axis=2, keepdims=True)
+    repeat_mean = values.mean(axis=1, keepdims=True)
+    ms_targets = k * ((target_mean - grand)**2).sum(axis=(1, 2)) / (n - 1)
+    ms_repeats = n * ((repeat_mean - grand)**2).sum(axis=(1, 2)) / (k - 1)
+    ms_error = ((values - target_mean - repeat_mean + grand)**2).sum(axis=(1, 2)) / ((n - 1) * (k - 1))
+    return ms_targets, ms_repeats, ms_error
+
+
+# Function to compute the intraclass correlation of every set (Shrout & Fleiss, single measurement)
+# ICC(2,1) counts a systematic offset between the repeats as disagreement, ICC(3,1) only the consistency
+# The two-way ANOVA needs every target measured in every repeat: a set with missing (NaN) measurements, e.g. a set
+# with fewer repeats padded by stack(), is evaluated on its repeats that were done and the targets measured in all of them
+def icc(values):
+    values = np.asarray(values, dtype='float64')
+    if not np.isnan(values).any():
+        return _icc(values)
+    agreement, consistency = np.full(len(values), np.nan), np.full(len(values), np.nan)
+    for i, set_values in enumerate(values):
+        complete = set_values[:, ~np.isnan(set_values).all(axis=0)]
+        complete = complete[~np.isnan(complete).any(axis=1)]
+        if complete.shape[0] > 1 and complete.shape[1] > 1:
+            (agreement[i],), (consistency[i],) = _icc(complete[None])
+    return agreement, consistency
+
+
+def _icc(values):
+    n, k = values.shape[1], values.shape[2]
+    ms_targets, ms_repeats, ms_error = _mean_squares(values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        agreement = (ms_targets - ms_error) / (ms_targets + (k - 1) * ms_error + k * (ms_repeats - ms_error) / n)
+        consistency = (ms_targets - ms_error) / (ms_targets + (k - 1) * ms_error)
+    return agreement, consistency
+
+
+# Function to compute the Bland-Altman bias and 95% limits of agreement of every pair of repeats
+# Returns the pairs of repeats and (sets, pairs) arrays, the repeatability coefficient covers all repeats at once
+def bland_altman(values):
+    values = np.asarray(values, dtype='float64')
+    first, second = np.triu_indices(values.shape[2], k=1)
+    difference = values[:, :, first] - values[:, :, second]
+    bias = np.nanmean(difference, axis=1)
+    sd = np.nanstd(difference, axis=1, ddof=1)
+    # Within-target standard deviation over all repeats, two repeats differ less than this 95% of the time
+    within = np.sqrt(np.nanmean(np.nanvar(values, axis=2, ddof=1), axis=1))
+    return {
+        'pairs': list(zip(first + 1, second + 1)),
+        'bias': bias,
+        'lower': bias - z * sd,
+        'upper': bias + z * sd,
+        'repeatability_coefficient': z * np.sqrt(2) * within,
+    }
+
+
+# Function to compute the coefficient of variation (in %) of the repeats of every target
+# The root mean square over the targets summarises every set
+def coefficient_of_variation(values):
+    values = np.asarray(values, dtype='float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cv = 100 * np.nanstd(values, axis=2, ddof=1) / np.abs(np.nanmean(values, axis=2))
+    return cv, np.sqrt(np.nanmean(cv**2, axis=1))
+
+
+# Function to summarise the agreement of all sets in a table (one row per set)
+def agreement_table(values, sets, measure):
+    agreement, consistency = icc(values)
+    limits = bland_altman(values)
+    _, cv = coefficient_of_variation(values)
+    table = pd.DataFrame({
+        'measure': measure,
+        'set': sets,
+        'targets': values.shape[1],
+        # The repeats that were done in each set, sets with fewer repeats are padded with NaN
+        'repeats': (~np.isnan(values).all(axis=1)).sum(axis=1),
+        'icc_agreement': agreement,
+        'icc_consistency': consistency,
+        'cv': cv,
+        'repeatability_coefficient': limits['repeatability_coefficient'],
+    })
+    # The limits of the widest pair of repeats
+    widest = np.nanargmax(limits['upper'] - limits['lower'], axis=1)
+    rows = np.arange(len(sets))
+    table['ba_bias'] = limits['bias'][rows, widest]
+    table['ba_lower'] = limits['lower'][rows, widest]
+    table['ba_upper'] = limits['upper'][rows, widest]
+    table['ba_pair'] = [limits['pairs'][pair] for pair in widest]
+    return table.set_index(['measure','set'])
+
+
+# #### Repeatability measurements
+
+# Function to stack the measurements of each set (a dictionary of set -> list of repeats) into one array
+# Sets with fewer repeats are padded with NaN
+def stack(measurements):
+    sets = list(measurements)
+    n_repeats = max(len(repeats) for repeats in measurements.values())
+    n_targets = len(next(iter(measurements.values()))[0])
+    values = np.full((len(sets), n_targets, n_repeats), np.nan)
+    for i, repeat_set in enumerate(sets):
+        values[i, :, :len(measurements[repeat_set])] = np.column_stack(measurements[repeat_set])
+    return values, sets
+
+
+# Function to find the repeated tests of a set, numbered by their first number, e.g. 2_O-ring257_3bar.csv
+def repeat_files(pattern):
+    paths = find_acquisitions(pattern)
+    return sorted(paths, key=lambda path: int(re.match(r'(\d+)', os.path.basename(path)).group(1)))
+
+
+# Function to find the repeat sets, one folder per set
+def repeat_sets(data_dir, test):
+    # The sets are found from their tests, so a set may also be compressed or archived (see archive.py)
+    paths = find_acquisitions(os.path.join(data_dir, '*', test, '*.csv'))
+    return sorted({os.path.basename(os.path.dirname(os.path.dirname(path))) for path in paths})
+
+
+# Function to average a signal (in its own unit) over 1 s around each time (in s), all times at once
+def values_at(time, signal, times):
+    nearest = np.searchsorted(times, time - 0.5)
+    inside = (nearest < len(times)) & (np.abs(time - times[np.minimum(nearest, len(times) - 1)]) <= 0.5)
+    index = nearest[inside]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.bincount(index, signal[inside], len(times)) / np.bincount(index, minlength=len(times))
+
+
+# Function to collect the mean friction force range (in N) of every repeated test, the pressures are the targets
+def friction_ranges(data_dir='./data/repeatability'):
+    measurements = {}
+    for repeat_set in repeat_sets(data_dir, 'friction'):
+        tests = repeat_files(os.path.join(data_dir, repeat_set, 'friction', f'*_{model}_{friction_pressures[model][0]}bar.csv'))
+        measurements[repeat_set] = []
+        for path in tests:
+            test = os.path.basename(path).split('_')[0]
+            ranges = []
+            for bar in friction_pressures[model]:
+                test_df = load_run(os.path.join(data_dir, repeat_set, 'friction', f'{test}_{model}_{bar}bar.csv'), ['Time','Pressure(bar)','Force(N)'], drop_amount)
+                friction_force = test_df['Force(N)'] - test_df['Pressure(bar)'] * 10**5 * bore_area(model)
+                ranges.append(np.mean(stroke_ranges(friction_force)[0]))
+            measurements[repeat_set].append(np.array(ranges))
+    return stack(measurements)
+
+
+# Function to collect the static pressure drop (in bar) of every repeated test, the drop_times are the targets
+def static_drops(data_dir='./data/repeatability'):
+    measurements = {}
+    for repeat_set in repeat_sets(data_dir, 'static'):
+        measurements[repeat_set] = []
+        for path in repeat_files(os.path.join(data_dir, repeat_set, 'static', f'*_{model}.csv')):
+            test_df = load_run(path, ['Time','Pressure(bar)'], drop_amount)
+            time = (test_df['Time'].to_numpy() - test_df['Time'].iloc[0]) / 1000
+            pressure_drop = test_df['Pressure(bar)'].to_numpy() - test_df['Pressure(bar)'].iloc[0]
+            measurements[repeat_set].append(values_at(time, pressure_drop, drop_times))
+    return stack(measurements)
+
+
+# Function to collect the pressure at alpha (in bar) of every repeated dynamic test, consecutive windows are the targets
+def dynamic_pressures(data_dir='./data/repeatability', n_windows=dynamic_windows):
+    measurements = {}
+    for repeat_set in repeat_sets(data_dir, 'dynamic'):
+        measurements[repeat_set] = []
+        for path in repeat_files(os.path.join(data_dir, repeat_set, 'dynamic', f'*_{model}.csv')):
+            test = int(os.path.basename(path).split('_')[0])
+            alpha = dynamic_alpha.get(repeat_set, {}).get(test, default_alpha)
+            test_df = load_run(path, ['Time','Laser(mm)','Pressure(bar)'], drop_amount)
+            window = np.minimum((np.arange(len(test_df)) * n_windows) // len(test_df), n_windows - 1)
+            at_alpha = np.abs(test_df['Laser(mm)'].to_numpy() - alpha) < margin
+            with np.errstate(invalid='ignore', divide='ignore'):
+                pressure = np.bincount(window[at_alpha], test_df['Pressure(bar)'].to_numpy()[at_alpha], n_windows) / np.bincount(window[at_alpha], minlength=n_windows)
+            measurements[repeat_set].append(pressure)
+    return stack(measurements)
+
+
+# Function to collect the air-chamber pressure drop (in kPa) of the repeated tests, the drop_times are the targets
+def airchamber_drops(tests=airchamber_tests):
+    measurements = {}
+    for repeat_set, path in tests.items():
+        test_df = read_acquisition(path, delimiter=';', header=1, decimal=',', usecols=[0, 1, 2, 3], names=['Time','Test1','Test2','Test3'])
+        test_df, _ = resample_run(test_df, dt=0.1)
+        time = test_df['Time'].to_numpy()
+        measurements[repeat_set] = [values_at(time, test_df[test].to_numpy(), drop_times) for test in test_df.columns[1:]]
+    return stack(measurements)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='./data/repeatability')
+    parser.add_argument('--output', default='./data/derived/repeatability.csv')
+    args = parser.parse_args()
+
+    collectors = {
+        'friction_range': lambda: friction_ranges(args.data),
+        'static_pressure_drop': lambda: static_drops(args.data),
+        'dynamic_pressure_alpha': lambda: dynamic_pressures(args.data),
+        'airchamber_drop': airchamber_drops,
+    }
+    tables = []
+    for measure, collect in collectors.items():
+        # Tests that are not available are skipped
+        try:
+            values, sets = collect()
+        except (FileNotFoundError, StopIteration, ValueError):
+            print(f'No repeated tests found for {measure}')
+            continue
+        tables.append(agreement_table(values, sets, measure))
+
+    repeatability = pd.concat(tables)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    repeatability.to_csv(args.output)
+    print(repeatability.round(3).to_string())
+    print(f'\n ------ Succesfully saved the repeatability metrics to {args.output} ------')
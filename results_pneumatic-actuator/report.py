@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the tables and figures computed by the results scripts and the appendix are collected into one report,
+as a LaTeX document and as an HTML page. The report is built from what the scripts stored:
+  - the figures in ./figures and ../appendix_compressed-air_chamber/figures
+  - the tables in ./data/derived, e.g. the friction tables of results_friction_force.py and the fitted parameters
+The tables and figures are rendered in a number of processes, and a rendered table is cached (see memo.py) under the
+content of its file, so only the tables that changed are rendered again when the report is rebuilt.
+Tables or figures that were not computed yet are listed in their section.
+
+Run `python3 report.py` to build ./data/derived/report/report.tex and report.html
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import glob
+import html
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from memo import memoize
+
+
+# #### Global variables
+
+# The location of the report
+report_dir = './data/derived/report'
+# The sections of the report with the files (or glob patterns) of their tables and figures, in order
+sections = [
+    {'title': 'Methodology', 'tables': [], 'figures': ['./figures/method_*.pdf']},
+    {'title': 'Friction force',
+     'tables': ['./data/derived/tables/friction_*.csv', './data/derived/friction_parameters.csv', './data/derived/lugre_parameters.csv',
+                './data/derived/stick_slip.csv', './data/derived/friction_comparisons.csv'],
+     'figures': ['./figures/result_frictionforce*.pdf']},
+    {'title': 'Static leakage', 'tables': ['./data/derived/leak_rates.csv'], 'figures': ['./figures/result_static_leakage*.pdf']},
+    {'title': 'Dynamic leakage', 'tables': ['./data/derived/leak_comparisons.csv'], 'figures': ['./figures/result_dynamic_leakage*.pdf']},
+    {'title': 'Repeatability', 'tables': ['./data/derived/repeatability.csv'], 'figures': []},
+    {'title': 'Appendix', 'tables': [],
+     'figures': ['./figures/app_*.pdf', '../appendix_compressed-air_chamber/figures/*.pdf']},
+]
+# The number of significant digits of the numbers in the tables
+digits = 4
+
+
+# #### Functions
+
+# Function to give the name of a table or figure, e.g. 'Friction single test rings' for friction_single_test_rings.csv
+def caption(path):
+    name = os.path.splitext(os.path.basename(path))[0].replace('_', ' ')
+    return name[:1].upper() + name[1:]
+
+
+# Function to escape the special characters of LaTeX in text, parts in math mode ($...$) are kept as they are
+def latex_escape(text):
+    parts = re.split(r'(\$[^$]*\$)', str(text))
+    escape = lambda part: re.sub(r'([&%#_{}])', r'\\\1', part).replace('~', r'\textasciitilde{}').replace('^', r'\textasciicircum{}')
+    return ''.join(part if part.startswith('$') and part.endswith('$') and len(part) > 1 else escape(part) for part in parts)
+
+
+# Function to replace the LaTeX math used in the tables, e.g. $\pm$, by plain text for HTML
+def latex_to_text(text):
+    return str(text).replace(r'$\pm$', '±').replace('$', '')
+
+
+# Function to render a stored table, in LaTeX or HTML
+# The file is an argument of the cached function, so a changed table gives a new key and is rendered again
+@memoize(paths=('path',))
+def render_table(path, output_format, digits=digits):
+    table = pd.read_csv(path, index_col=0)
+    format_number = lambda value: f'{value:.{digits}g}'
+    if output_format == 'latex':
+        table = table.rename(index=latex_escape, columns=latex_escape)
+        table = table.apply(lambda column: column.map(latex_escape, na_action='ignore') if column.dtype == object else column)
+        body = table.to_latex(escape=False, float_format=format_number, na_rep='-')
+        return f'\\begin{{table}}[h]\n\\centering\n\\caption{{{latex_escape(caption(path))}}}\n{body}\\end{{table}}\n'
+    table = table.rename(index=latex_to_text, columns=latex_to_text)
+    table = table.apply(lambda column: column.map(latex_to_text, na_action='ignore') if column.dtype == object else column)
+    body = table.to_html(float_format=format_number, na_rep='-', border=0, classes='table')
+    return f'<figure>\n<figcaption>{html.escape(caption(path))}</figcaption>\n{body}\n</figure>\n'
+
+
+# Function to render a figure, in LaTeX or HTML, the figure is included from its location relative to the report
+# Only the location is written, so a figure is not cached
+def render_figure(path, output_format, directory=report_dir):
+    relative = os.path.relpath(path, directory).replace(os.sep, '/')
+    if output_format == 'latex':
+        return (f'\\begin{{figure}}[h]\n\\centering\n\\includegraphics[width=0.8\\textwidth]{{{relative}}}\n'
+                f'\\caption{{{latex_escape(caption(path))}}}\n\\end{{figure}}\n')
+    source = html.escape(relative)
+    return (f'<figure>\n<object data="{source}" type="application/pdf" width="800" height="500">'
+            f'<a href="{source}">{html.escape(os.path.basename(path))}</a></object>\n'
+            f'<figcaption>{html.escape(caption(path))}</figcaption>\n</figure>\n')
+
+
+def render_part(kind, path, output_format, directory):
+    if kind == 'table':
+        return render_table(path, output_format)
+    return render_figure(path, output_format, directory)
+
+
+# Function to find the tables and figures of the sections, the patterns that match no file are kept as missing
+def collect(sections=sections):
+    collected = []
+    for section in sections:
+        parts, missing = [], []
+        for kind in ['table', 'figure']:
+            for pattern in section[f'{kind}s']:
+                paths = sorted(glob.glob(pattern))
+                parts += [(kind, path) for path in paths]
+                if not paths:
+                    missing.append(pattern)
+        collected.append({'title': section['title'], 'parts': parts, 'missing': missing})
+    return collected
+
+
+# Function to render all tables and figures in all formats in a number of processes
+# Returns the rendered parts per section for each format
+def render(collected, formats, directory=report_dir, workers=None):
+    tasks = [(kind, path, output_format, directory) for output_format in formats for section in collected for kind, path in section['parts']]
+    if workers == 1 or len(tasks) < 2:
+        rendered = [render_part(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            rendered = list(executor.map(render_part, *zip(*tasks)))
+    rendered = iter(rendered)
+    return {output_format: [[next(rendered) for _ in section['parts']] for section in collected] for output_format in formats}
+
+
+def latex_document(collected, rendered):
+    lines = ['\\documentclass{article}', '\\usepackage[margin=2cm]{geometry}', '\\usepackage{booktabs}',
+             '\\usepackage{graphicx}', '\\begin{document}', '']
+    for section, parts in zip(collected, rendered):
+        lines.append(f"\\section{{{latex_escape(section['title'])}}}")
+        lines += parts
+        if section['missing']:
+            lines.append('Not computed yet: ' + ', '.join(f'\\texttt{{{latex_escape(pattern)}}}' for pattern in section['missing']) + '\n')
+        lines.append('\\clearpage\n')
+    lines.append('\\end{document}')
+    return '\n'.join(lines) + '\n'
+
+
+def html_document(collected, rendered):
+    lines = ['<!DOCTYPE html>', '<html>', '<head>', '<meta charset="utf-8">', '<title>Results pneumatic actuator</title>',
+             '<style>body {font-family: sans-serif; max-width: 900px; margin: auto} table {border-collapse: collapse} '
+             'td, th {padding: 2px 8px; text-align: right} figure {margin: 2em 0}</style>', '</head>', '<body>']
+    for section, parts in zip(collected, rendered):
+        lines.append(f"<h2>{html.escape(section['title'])}</h2>")
+        lines += parts
+        if section['missing']:
+            lines.append('<p>Not computed yet: ' + ', '.join(f'<code>{html.escape(pattern)}</code>' for pattern in section['missing']) + '</p>')
+    lines += ['</body>', '</html>']
+    return '\n'.join(lines) + '\n'
+
+
+# Function to build the report in the given formats, returns the paths of the written files
+def build_report(directory=report_dir, formats=('latex','html'), sections=sections, workers=None):
+    os.makedirs(directory, exist_ok=True)
+    collected = collect(sections)
+    rendered = render(collected, formats, directory, workers)
+    written = []
+    for output_format in formats:
+        document = latex_document if output_format == 'latex' else html_document
+        path = os.path.join(directory, 'report.tex' if output_format == 'latex' else 'report.html')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(document(collected, rendered[output_format]))
+        written.append(path)
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=report_dir)
+    parser.add_argument('--formats', nargs='+', default=['latex','html'], choices=['latex','html'])
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    written = build_report(args.output, args.formats, workers=args.workers)
+    print(f'Built the report in {time.perf_counter() - start:.1f} s')
+    print(f'\n ------ Succesfully saved {", ".join(written)} ------')
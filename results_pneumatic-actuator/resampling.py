@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the tests are mapped onto an exactly uniform time grid.
+LabView does not write the samples at a fixed interval: the friction tests are sampled
+every 10-11 ms with gaps of up to a few seconds, the air-chamber tests every 100 ms.
+The timestamps are checked for jitter, gaps and samples going back in time,
+after which all channels are interpolated onto the grid at once.
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import numpy as np
+import pandas as pd
+
+
+# #### Global variables
+
+# An interval longer than this many sample intervals is a gap in the acquisition
+gap_factor = 5
+
+
+# #### Functions
+
+# Function to check the timestamps of a test, the time can be in any unit
+def check_timestamps(time, dt=None, gap_factor=gap_factor):
+    time = np.asarray(time, dtype='float64')
+    intervals = np.diff(time)
+    # The nominal sample interval is the median interval, unless it is given (a single sample has no interval)
+    if dt is None:
+        dt = np.median(intervals) if len(intervals) else np.nan
+    gaps = intervals > gap_factor * dt
+    regular = intervals[(intervals > 0) & ~gaps]
+    return {
+        'samples': len(time),
+        'dt': dt,
+        # Jitter of the regular intervals, relative to the nominal interval
+        'jitter': regular.std() / dt if len(regular) else 0.0,
+        'max_deviation': np.abs(regular - dt).max() / dt if len(regular) else 0.0,
+        'non_monotonic': int((intervals <= 0).sum()),
+        'gaps': int(gaps.sum()),
+        'max_gap': intervals.max() if len(intervals) else 0.0,
+        'gap_time': intervals[gaps].sum(),
+    }
+
+
+# Function to make an exactly uniform grid, every point is start + k * dt
+def uniform_grid(start, stop, dt):
+    return start + dt * np.arange(int(np.floor((stop - start) / dt + 1e-9)) + 1)
+
+
+# Function to linearly interpolate any number of channels onto a grid at once
+# The values are a (samples,) or (samples, channels) array, the time has to be increasing with at least two samples
+def interpolate(time, values, grid):
+    if len(time) < 2:
+        raise ValueError(f'At least two samples are needed to interpolate, got {len(time)}')
+    # For each grid point the sample before it and its relative distance to the next sample
+    i = np.clip(np.searchsorted(time, grid, side='right') - 1, 0, len(time) - 2)
+    weight = np.clip((grid - time[i]) / (time[i + 1] - time[i]), 0, 1)
+    if values.ndim == 2:
+        weight = weight[:, None]
+    return values[i] * (1 - weight) + values[i + 1] * weight
+
+
+# Function to resample a test onto a uniform grid
+# Grid points inside a gap of the acquisition become NaN, unless fill_gaps is set
+# A test with a single (increasing) sample cannot be interpolated, it is returned unchanged
+def resample(time, values, dt=None, gap_factor=gap_factor, fill_gaps=False):
+    time = np.asarray(time, dtype='float64')
+    values = np.asarray(values, dtype='float64')
+    report = check_timestamps(time, dt, gap_factor)
+    dt = report['dt']
+
+    # Samples that go back in time are removed, only strictly increasing timestamps are kept
+    keep = np.ones(len(time), dtype=bool)
+    keep[1:] = time[1:] > np.maximum.accumulate(time)[:-1]
+    time, values = time[keep], values[keep]
+    if len(time) < 2:
+        return time, values, report
+
+    grid = uniform_grid(time[0], time[-1], dt)
+    resampled = interpolate(time, values, grid)
+
+    if not fill_gaps:
+        # Mark the grid points that fall within a gap instead of drawing a straight line through it
+        i = np.clip(np.searchsorted(time, grid, side='right') - 1, 0, len(time) - 2)
+        in_gap = (time[i + 1] - time[i]) > gap_factor * dt
+        resampled[in_gap] = np.nan
+    return grid, resampled, report
+
+
+# Function to resample all channels of a loaded test (see loading.py)
+def resample_run(run_df, dt=None, time_column='Time', gap_factor=gap_factor, fill_gaps=False):
+    channels = [column for column in run_df.columns if column != time_column]
+    grid, resampled, report = resample(run_df[time_column].to_numpy(), run_df[channels].to_numpy(), dt, gap_factor, fill_gaps)
+    resampled_df = pd.DataFrame(resampled, columns=channels)
+    resampled_df.insert(0, time_column, grid)
+    return resampled_df, report
@@ -16,10 +16,9 @@ __email__ = "e.zillen@student.tudelft.nl"
 
 
 # #### Imports
-import math
-import pandas as pd
 import matplotlib.pyplot as plt
-import numpy as np
+from filtering import savgol
+from loading import cached_load_run
 
 
 # #### Global variables
@@ -28,8 +27,10 @@ import numpy as np
 rings = ['O-ring','NAPN','NAP310','PK','KDN','O-ring257','X-ring257']
 # The models with different cross-sectional shape used in this test
 shapes = ['Circle','Stadium','Kidney', 'Stadium_lc', 'Kidney_lc']
-# Remove first 15 data points to avoid deviating starting values
-drop_amount = 15
+# Remove the deviating starting values, the start transient is detected for each test (see loading.py)
+drop_amount = 'auto'
+# The channels used in the dynamic leakage analysis, the force is not needed
+channels = ['Time','Laser(mm)','Pressure(bar)']
 
 
 # # Dynamic leakage test
@@ -59,9 +60,9 @@ dynamic_leakage = {}
 
 # For each model type
 for model in rings+shapes:
-    # Load the data of the corresponding results in .CSV and drop unncessary columns
-    model_df = pd.read_csv(f'./data/dynamic/{model}.csv',delimiter='\s+',header=None,names=(['Time','A','B','C','Laser(mm)','Pressure(bar)','Force(N)']))
-    model_df.drop(columns=['A','B','C'],index=model_df.index[range(drop_amount)],axis=1,inplace=True)
+    # Load the data of the corresponding results in .CSV, only parsing the channels used in this analysis
+    # The loaded test is cached, a second run does not parse the .CSV again (see memo.py)
+    model_df = cached_load_run(f'./data/dynamic/{model}.csv',channels,drop_amount)
 
     # Selecting the data points around the chosen position with the chosen margin
     model_df = model_df[(model_df['Laser(mm)'] > (alpha[model]-margin)) & (model_df['Laser(mm)'] < (alpha[model]+margin))]
@@ -74,17 +75,21 @@ for model in rings+shapes:
     # Set the pressure (in MPa)
     dynamic_leakage[model]['Pressure(bar)'] = model_df['Pressure(bar)']/10
 
+# Filtering the pressure of all tests at once with a zero-phase moving average of 11 samples (in MPa)
+for model, pressure in zip(rings+shapes, savgol([dynamic_leakage[model]['Pressure(bar)'] for model in rings+shapes], window=11, order=1)):
+    dynamic_leakage[model]['PressureFiltered'] = pressure
+
 
 # #### Dynamic leakage plot 25mm
 
-# To smoothen out the lines a sampling [::4] and a rolling window of 10 are applied
-plt.plot(dynamic_leakage['O-ring257']['Time'][::4],dynamic_leakage['O-ring257']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:blue', alpha=0.25, linestyle='dotted',linewidth=3)
-plt.plot(dynamic_leakage['X-ring257']['Time'][::4],dynamic_leakage['X-ring257']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:brown', alpha=0.25, linestyle=(0,(5,2,2)))
-plt.plot(dynamic_leakage['O-ring']['Time'][::4],dynamic_leakage['O-ring']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:blue',label='O-ring', linestyle='dotted',linewidth=3)
-plt.plot(dynamic_leakage['NAPN']['Time'][::4],dynamic_leakage['NAPN']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:orange',label='NAPN',linestyle='dashdot')
-plt.plot(dynamic_leakage['NAP310']['Time'][::4],dynamic_leakage['NAP310']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:green',label='NAP 310', linestyle=(0,(5,2,2)))
-plt.plot(dynamic_leakage['PK']['Time'][::4],dynamic_leakage['PK']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:red',label='PK',linestyle='dashed')
-plt.plot(dynamic_leakage['KDN']['Time'][::4],dynamic_leakage['KDN']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:purple',label='KDN')
+# To smoothen out the lines a sampling [::4] is applied to the filtered pressure
+plt.plot(dynamic_leakage['O-ring257']['Time'][::4],dynamic_leakage['O-ring257']['PressureFiltered'][::4],'tab:blue', alpha=0.25, linestyle='dotted',linewidth=3)
+plt.plot(dynamic_leakage['X-ring257']['Time'][::4],dynamic_leakage['X-ring257']['PressureFiltered'][::4],'tab:brown', alpha=0.25, linestyle=(0,(5,2,2)))
+plt.plot(dynamic_leakage['O-ring']['Time'][::4],dynamic_leakage['O-ring']['PressureFiltered'][::4],'tab:blue',label='O-ring', linestyle='dotted',linewidth=3)
+plt.plot(dynamic_leakage['NAPN']['Time'][::4],dynamic_leakage['NAPN']['PressureFiltered'][::4],'tab:orange',label='NAPN',linestyle='dashdot')
+plt.plot(dynamic_leakage['NAP310']['Time'][::4],dynamic_leakage['NAP310']['PressureFiltered'][::4],'tab:green',label='NAP 310', linestyle=(0,(5,2,2)))
+plt.plot(dynamic_leakage['PK']['Time'][::4],dynamic_leakage['PK']['PressureFiltered'][::4],'tab:red',label='PK',linestyle='dashed')
+plt.plot(dynamic_leakage['KDN']['Time'][::4],dynamic_leakage['KDN']['PressureFiltered'][::4],'tab:purple',label='KDN')
 
 # Set the labels and save the figure
 plt.xlabel('Time (s)')
@@ -96,14 +101,14 @@ plt.clf()
 
 # #### Dynamic leakage plot 25.7mm
 
-# To smoothen out the lines a sampling [::4] and a rolling window of 10 are applied
-plt.plot(dynamic_leakage['O-ring']['Time'][::4],dynamic_leakage['O-ring']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:blue', alpha=0.25, linestyle='dotted',linewidth=3)
-plt.plot(dynamic_leakage['NAPN']['Time'][::4],dynamic_leakage['NAPN']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:orange',alpha=0.25,linestyle='dashdot')
-plt.plot(dynamic_leakage['NAP310']['Time'][::4],dynamic_leakage['NAP310']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:green',alpha=0.25, linestyle=(0,(5,2,2)))
-plt.plot(dynamic_leakage['PK']['Time'][::4],dynamic_leakage['PK']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:red',alpha=0.25,linestyle='dashed')
-plt.plot(dynamic_leakage['KDN']['Time'][::4],dynamic_leakage['KDN']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:purple',alpha=0.25)
-plt.plot(dynamic_leakage['O-ring257']['Time'][::4],dynamic_leakage['O-ring257']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:blue',label='O-ring', linestyle='dotted',linewidth=3)
-plt.plot(dynamic_leakage['X-ring257']['Time'][::4],dynamic_leakage['X-ring257']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:brown',label='X-ring', linestyle=(0,(5,2,2)))
+# To smoothen out the lines a sampling [::4] is applied to the filtered pressure
+plt.plot(dynamic_leakage['O-ring']['Time'][::4],dynamic_leakage['O-ring']['PressureFiltered'][::4],'tab:blue', alpha=0.25, linestyle='dotted',linewidth=3)
+plt.plot(dynamic_leakage['NAPN']['Time'][::4],dynamic_leakage['NAPN']['PressureFiltered'][::4],'tab:orange',alpha=0.25,linestyle='dashdot')
+plt.plot(dynamic_leakage['NAP310']['Time'][::4],dynamic_leakage['NAP310']['PressureFiltered'][::4],'tab:green',alpha=0.25, linestyle=(0,(5,2,2)))
+plt.plot(dynamic_leakage['PK']['Time'][::4],dynamic_leakage['PK']['PressureFiltered'][::4],'tab:red',alpha=0.25,linestyle='dashed')
+plt.plot(dynamic_leakage['KDN']['Time'][::4],dynamic_leakage['KDN']['PressureFiltered'][::4],'tab:purple',alpha=0.25)
+plt.plot(dynamic_leakage['O-ring257']['Time'][::4],dynamic_leakage['O-ring257']['PressureFiltered'][::4],'tab:blue',label='O-ring', linestyle='dotted',linewidth=3)
+plt.plot(dynamic_leakage['X-ring257']['Time'][::4],dynamic_leakage['X-ring257']['PressureFiltered'][::4],'tab:brown',label='X-ring', linestyle=(0,(5,2,2)))
 
 # Set the labels and save the figure
 plt.xlabel('Time (s)')
@@ -115,10 +120,10 @@ plt.clf()
 
 # #### Dynamic leakage plot different shapes
 
-# To smoothen out the lines a rolling window of 10 are applied
-plt.plot(dynamic_leakage['Circle']['Time'],dynamic_leakage['Circle']['Pressure(bar)'].rolling(window=10).mean(),'0.8',label='Circle', linestyle='dotted',linewidth=3)
-plt.plot(dynamic_leakage['Stadium']['Time'],dynamic_leakage['Stadium']['Pressure(bar)'].rolling(window=10).mean(),'tab:olive',label='Stadium',linestyle='dashdot')
-plt.plot(dynamic_leakage['Kidney']['Time'],dynamic_leakage['Kidney']['Pressure(bar)'].rolling(window=10).mean(),'tab:cyan',label='Kidney')
+# To smoothen out the lines the filtered pressure is used
+plt.plot(dynamic_leakage['Circle']['Time'],dynamic_leakage['Circle']['PressureFiltered'],'0.8',label='Circle', linestyle='dotted',linewidth=3)
+plt.plot(dynamic_leakage['Stadium']['Time'],dynamic_leakage['Stadium']['PressureFiltered'],'tab:olive',label='Stadium',linestyle='dashdot')
+plt.plot(dynamic_leakage['Kidney']['Time'],dynamic_leakage['Kidney']['PressureFiltered'],'tab:cyan',label='Kidney')
 
 # Set the labels and save the figure
 plt.xlabel('Time (s)')
@@ -130,12 +135,12 @@ plt.clf()
 
 # #### Dynamic leakage plot different shapes with lower clearance
 
-# To smoothen out the lines a rolling window of 10 are applied
-plt.plot(dynamic_leakage['Stadium']['Time'],dynamic_leakage['Stadium']['Pressure(bar)'].rolling(window=10).mean(),'tab:olive',alpha=0.5,label='Stadium 0.5 mm clearance',linestyle='dashdot')
-plt.plot(dynamic_leakage['Kidney']['Time'],dynamic_leakage['Kidney']['Pressure(bar)'].rolling(window=10).mean(),'tab:cyan',alpha=0.5,label='Kidney 0.5 mm clearance')
-plt.plot(dynamic_leakage['Circle']['Time'],dynamic_leakage['Circle']['Pressure(bar)'].rolling(window=10).mean(),'0.8', alpha=0.5 ,label='Circle 0.5 mm clearance', linestyle='dotted',linewidth=3)
-plt.plot(dynamic_leakage['Stadium_lc']['Time'],dynamic_leakage['Stadium_lc']['Pressure(bar)'].rolling(window=10).mean(),'tab:olive',label='Stadium 0.2 mm clearance',linestyle='dashdot', linewidth=2)
-plt.plot(dynamic_leakage['Kidney_lc']['Time'],dynamic_leakage['Kidney_lc']['Pressure(bar)'].rolling(window=10).mean(),'tab:cyan',label='Kidney 0.2 mm clearance', linewidth=2)
+# To smoothen out the lines the filtered pressure is used
+plt.plot(dynamic_leakage['Stadium']['Time'],dynamic_leakage['Stadium']['PressureFiltered'],'tab:olive',alpha=0.5,label='Stadium 0.5 mm clearance',linestyle='dashdot')
+plt.plot(dynamic_leakage['Kidney']['Time'],dynamic_leakage['Kidney']['PressureFiltered'],'tab:cyan',alpha=0.5,label='Kidney 0.5 mm clearance')
+plt.plot(dynamic_leakage['Circle']['Time'],dynamic_leakage['Circle']['PressureFiltered'],'0.8', alpha=0.5 ,label='Circle 0.5 mm clearance', linestyle='dotted',linewidth=3)
+plt.plot(dynamic_leakage['Stadium_lc']['Time'],dynamic_leakage['Stadium_lc']['PressureFiltered'],'tab:olive',label='Stadium 0.2 mm clearance',linestyle='dashdot', linewidth=2)
+plt.plot(dynamic_leakage['Kidney_lc']['Time'],dynamic_leakage['Kidney_lc']['PressureFiltered'],'tab:cyan',label='Kidney 0.2 mm clearance', linewidth=2)
 
 # Set the labels and save the figure
 plt.xlabel('Time (s)')
@@ -166,9 +171,9 @@ dynamic_rerun = {}
 
 # Iterate all 3 repeated tests and add them to the dictionary
 for test in alpha.keys():
-    # Load the data of the corresponding results in .CSV and drop unncessary columns
-    test_df = pd.read_csv(f'./data/repeatability/rerun/dynamic/{test}_O-ring257.csv',delimiter='\s+',header=None,names=(['Time','A','B','C','Laser(mm)','Pressure(bar)','Force(N)']))
-    test_df.drop(columns=['A','B','C'],index=test_df.index[range(drop_amount)],axis=1,inplace=True)
+    # Load the data of the corresponding results in .CSV, only parsing the channels used in this analysis
+    # The loaded test is cached, a second run does not parse the .CSV again (see memo.py)
+    test_df = cached_load_run(f'./data/repeatability/rerun/dynamic/{test}_O-ring257.csv',channels,drop_amount)
 
     # Selecting the data points around the chosen position with the chosen margin
     test_df = test_df[(test_df['Laser(mm)'] > (alpha[test]-margin)) & (test_df['Laser(mm)'] < (alpha[test]+margin))]
@@ -181,17 +186,21 @@ for test in alpha.keys():
     # Set the pressure (in MPa)dynamic_rerun[test] = {}
     dynamic_rerun[test]['Pressure(bar)'] = test_df['Pressure(bar)']/10
 
-# To smoothen out the lines a sampling [::4] and a rolling window of 10 are applied
-plt.plot(dynamic_leakage['O-ring']['Time'][::4],dynamic_leakage['O-ring']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:grey', alpha=0.25, linestyle='dotted',linewidth=3)
-plt.plot(dynamic_leakage['NAPN']['Time'][::4],dynamic_leakage['NAPN']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:grey',alpha=0.25,linestyle='dashdot')
-plt.plot(dynamic_leakage['NAP310']['Time'][::4],dynamic_leakage['NAP310']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:grey',alpha=0.25, linestyle=(0,(5,2,2)))
-plt.plot(dynamic_leakage['PK']['Time'][::4],dynamic_leakage['PK']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:grey',alpha=0.25,linestyle='dashed')
-plt.plot(dynamic_leakage['KDN']['Time'][::4],dynamic_leakage['KDN']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:grey',alpha=0.25)
-plt.plot(dynamic_leakage['O-ring257']['Time'][::4],dynamic_leakage['O-ring257']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:grey',alpha=0.25, linestyle='dotted',linewidth=3)
-plt.plot(dynamic_leakage['X-ring257']['Time'][::4],dynamic_leakage['X-ring257']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:grey',alpha=0.25, linestyle=(0,(5,2,2)))
-plt.plot(dynamic_rerun[1]['Time'][::4],dynamic_rerun[1]['Pressure(bar)'].rolling(window=10).mean()[::4],'red',label='Test 1',linewidth=2)
-plt.plot(dynamic_rerun[2]['Time'][::4],dynamic_rerun[2]['Pressure(bar)'].rolling(window=10).mean()[::4],'firebrick',label='Test 2',linewidth=2)
-plt.plot(dynamic_rerun[3]['Time'][::4],dynamic_rerun[3]['Pressure(bar)'].rolling(window=10).mean()[::4],'darkred',label='Test 3',linewidth=2)
+# Filtering the pressure of all tests at once with a zero-phase moving average of 11 samples (in MPa)
+for test, pressure in zip(alpha.keys(), savgol([dynamic_rerun[test]['Pressure(bar)'] for test in alpha.keys()], window=11, order=1)):
+    dynamic_rerun[test]['PressureFiltered'] = pressure
+
+# To smoothen out the lines a sampling [::4] is applied to the filtered pressure
+plt.plot(dynamic_leakage['O-ring']['Time'][::4],dynamic_leakage['O-ring']['PressureFiltered'][::4],'tab:grey', alpha=0.25, linestyle='dotted',linewidth=3)
+plt.plot(dynamic_leakage['NAPN']['Time'][::4],dynamic_leakage['NAPN']['PressureFiltered'][::4],'tab:grey',alpha=0.25,linestyle='dashdot')
+plt.plot(dynamic_leakage['NAP310']['Time'][::4],dynamic_leakage['NAP310']['PressureFiltered'][::4],'tab:grey',alpha=0.25, linestyle=(0,(5,2,2)))
+plt.plot(dynamic_leakage['PK']['Time'][::4],dynamic_leakage['PK']['PressureFiltered'][::4],'tab:grey',alpha=0.25,linestyle='dashed')
+plt.plot(dynamic_leakage['KDN']['Time'][::4],dynamic_leakage['KDN']['PressureFiltered'][::4],'tab:grey',alpha=0.25)
+plt.plot(dynamic_leakage['O-ring257']['Time'][::4],dynamic_leakage['O-ring257']['PressureFiltered'][::4],'tab:grey',alpha=0.25, linestyle='dotted',linewidth=3)
+plt.plot(dynamic_leakage['X-ring257']['Time'][::4],dynamic_leakage['X-ring257']['PressureFiltered'][::4],'tab:grey',alpha=0.25, linestyle=(0,(5,2,2)))
+plt.plot(dynamic_rerun[1]['Time'][::4],dynamic_rerun[1]['PressureFiltered'][::4],'red',label='Test 1',linewidth=2)
+plt.plot(dynamic_rerun[2]['Time'][::4],dynamic_rerun[2]['PressureFiltered'][::4],'firebrick',label='Test 2',linewidth=2)
+plt.plot(dynamic_rerun[3]['Time'][::4],dynamic_rerun[3]['PressureFiltered'][::4],'darkred',label='Test 3',linewidth=2)
 
 # Set the labels and save the figure
 plt.xlabel('Time (s)')
@@ -216,9 +225,9 @@ dynamic_reconnected = {}
 
 # Iterate all 3 repeated tests and add them to the dictionary
 for test in range(1,4):
-    # Load the data of the corresponding results in .CSV and drop unncessary columns
-    test_df = pd.read_csv(f'./data/repeatability/reconnected/dynamic/{test}_O-ring257.csv',delimiter='\s+',header=None,names=(['Time','A','B','C','Laser(mm)','Pressure(bar)','Force(N)']))
-    test_df.drop(columns=['A','B','C'],index=test_df.index[range(drop_amount)],axis=1,inplace=True)
+    # Load the data of the corresponding results in .CSV, only parsing the channels used in this analysis
+    # The loaded test is cached, a second run does not parse the .CSV again (see memo.py)
+    test_df = cached_load_run(f'./data/repeatability/reconnected/dynamic/{test}_O-ring257.csv',channels,drop_amount)
 
     # Selecting the data points around the chosen position with the chosen margin
     test_df = test_df[(test_df['Laser(mm)'] > (alpha[test]-margin)) & (test_df['Laser(mm)'] < (alpha[test]+margin))]
@@ -231,17 +240,21 @@ for test in range(1,4):
     # Set the pressure (in MPa)
     dynamic_reconnected[test]['Pressure(bar)'] = test_df['Pressure(bar)']/10
 
-# To smoothen out the lines a sampling [::4] and a rolling window of 10 are applied
-plt.plot(dynamic_leakage['O-ring']['Time'][::4],dynamic_leakage['O-ring']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:grey', alpha=0.25, linestyle='dotted',linewidth=3)
-plt.plot(dynamic_leakage['NAPN']['Time'][::4],dynamic_leakage['NAPN']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:grey',alpha=0.25,linestyle='dashdot')
-plt.plot(dynamic_leakage['NAP310']['Time'][::4],dynamic_leakage['NAP310']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:grey',alpha=0.25, linestyle=(0,(5,2,2)))
-plt.plot(dynamic_leakage['PK']['Time'][::4],dynamic_leakage['PK']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:grey',alpha=0.25,linestyle='dashed')
-plt.plot(dynamic_leakage['KDN']['Time'][::4],dynamic_leakage['KDN']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:grey',alpha=0.25)
-plt.plot(dynamic_leakage['O-ring257']['Time'][::4],dynamic_leakage['O-ring257']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:grey',alpha=0.25, linestyle='dotted',linewidth=3)
-plt.plot(dynamic_leakage['X-ring257']['Time'][::4],dynamic_leakage['X-ring257']['Pressure(bar)'].rolling(window=10).mean()[::4],'tab:grey',alpha=0.25, linestyle=(0,(5,2,2)))
-plt.plot(dynamic_reconnected[1]['Time'][::4],dynamic_reconnected[1]['Pressure(bar)'].rolling(window=10).mean()[::4],'skyblue',label='Test 1',linewidth=2)
-plt.plot(dynamic_reconnected[2]['Time'][::4],dynamic_reconnected[2]['Pressure(bar)'].rolling(window=10).mean()[::4],'cornflowerblue',label='Test 2',linewidth=2)
-plt.plot(dynamic_reconnected[3]['Time'][::4],dynamic_reconnected[3]['Pressure(bar)'].rolling(window=10).mean()[::4],'steelblue',label='Test 3',linewidth=2)
+# Filtering the pressure of all tests at once with a zero-phase moving average of 11 samples (in MPa)
+for test, pressure in zip(range(1,4), savgol([dynamic_reconnected[test]['Pressure(bar)'] for test in range(1,4)], window=11, order=1)):
+    dynamic_reconnected[test]['PressureFiltered'] = pressure
+
+# To smoothen out the lines a sampling [::4] is applied to the filtered pressure
+plt.plot(dynamic_leakage['O-ring']['Time'][::4],dynamic_leakage['O-ring']['PressureFiltered'][::4],'tab:grey', alpha=0.25, linestyle='dotted',linewidth=3)
+plt.plot(dynamic_leakage['NAPN']['Time'][::4],dynamic_leakage['NAPN']['PressureFiltered'][::4],'tab:grey',alpha=0.25,linestyle='dashdot')
+plt.plot(dynamic_leakage['NAP310']['Time'][::4],dynamic_leakage['NAP310']['PressureFiltered'][::4],'tab:grey',alpha=0.25, linestyle=(0,(5,2,2)))
+plt.plot(dynamic_leakage['PK']['Time'][::4],dynamic_leakage['PK']['PressureFiltered'][::4],'tab:grey',alpha=0.25,linestyle='dashed')
+plt.plot(dynamic_leakage['KDN']['Time'][::4],dynamic_leakage['KDN']['PressureFiltered'][::4],'tab:grey',alpha=0.25)
+plt.plot(dynamic_leakage['O-ring257']['Time'][::4],dynamic_leakage['O-ring257']['PressureFiltered'][::4],'tab:grey',alpha=0.25, linestyle='dotted',linewidth=3)
+plt.plot(dynamic_leakage['X-ring257']['Time'][::4],dynamic_leakage['X-ring257']['PressureFiltered'][::4],'tab:grey',alpha=0.25, linestyle=(0,(5,2,2)))
+plt.plot(dynamic_reconnected[1]['Time'][::4],dynamic_reconnected[1]['PressureFiltered'][::4],'skyblue',label='Test 1',linewidth=2)
+plt.plot(dynamic_reconnected[2]['Time'][::4],dynamic_reconnected[2]['PressureFiltered'][::4],'cornflowerblue',label='Test 2',linewidth=2)
+plt.plot(dynamic_reconnected[3]['Time'][::4],dynamic_reconnected[3]['PressureFiltered'][::4],'steelblue',label='Test 3',linewidth=2)
 
 # Set the labels and save the figure
 plt.xlabel('Time (s)')
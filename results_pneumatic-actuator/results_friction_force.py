@@ -15,34 +15,27 @@ __maintainer__ = "Eva Zillen"
 __email__ = "e.zillen@student.tudelft.nl"
 
 # Imports
-import math
+import os
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 from statistics import mean
+from cycles import ensemble
+from friction import friction_forces, stroke_ranges, stroke_speeds
+from hysteresis import hysteresis_loops, save_loops
+from loading import cached_load_run
+from metadata import bore_area, friction_tests
 
 # Global variables
 
-# The diameter (in m) of the pneumatic cylinder
-d_25 = 25 / 1000
-# The radius (in m) of the pneumatic cylinder
-r_25 = d_25 / 2
-# The surface area (in m^2) of the pneumatic cylinder
-area = math.pi * r_25**2
-
-# The diameter (in m) of the pneumatic cylinder for the X-ring and corresponding O-ring
-d_257 = 25.7 / 1000
-# The radius (in m) of the pneumatic cylinder for the X-ring and corresponding O-ring
-r_257 = d_257 / 2
-# The surface area (in m^2) of the pneumatic cylinder for the X-ring and corresponding O-ring
-large_area = math.pi * r_257**2
-
 # The models with different sealing mechanism used in this test
 rings = ['O-ring','NAPN','NAP310','PK','KDN','O-ring257','X-ring257']
 # The models with different cross-sectional shape used in this test
 shapes = ['Circle','Stadium','Kidney','Stadium_lc','Kidney_lc']
-# Remove first 15 data points to avoid deviating starting values
-drop_amount = 15
+# Remove the deviating starting values, the start transient is detected for each test (see loading.py)
+drop_amount = 'auto'
+# The channels used in the friction analysis
+channels = ['Time','Laser(mm)','Pressure(bar)','Force(N)']
 
 
 # # Friction force test
@@ -51,82 +44,50 @@ drop_amount = 15
 # For each model all variables are stored in this nested dictionary
 friction_force = {}
 
-# For each ring type
-for ring in rings:
-    friction_force[ring] = {}
-    for bar in [1,3,5,7]:
-        # Load the data of the corresponding results in .CSV and drop unncessary columns
-        ring_df = pd.read_csv(f'./data/friction/{ring}_{bar}bar.csv',delimiter='\s+',header=None,names=(['Time','A','B','C','Laser(mm)','Pressure(bar)','Force(N)']))
-        ring_df.drop(columns=['A','B','C'],index=ring_df.index[range(drop_amount)],axis=1,inplace=True)
-
-        # Store the data in our larger dictionary
-        friction_force[ring][bar] = {}
-        # Set the time (in s) and laser (in mm)
-        friction_force[ring][bar]['Time'] = ring_df['Time']/1000
-        friction_force[ring][bar]['Laser(mm)'] = ring_df['Laser(mm)']
-        # Set the pressure (in MPa) and force (in N)
-        friction_force[ring][bar]['Pressure(bar)'] = ring_df['Pressure(bar)']/10
-        friction_force[ring][bar]['Force(N)'] = ring_df['Force(N)']
-
-        # Calculate force Fp based on the measured pressure (see equation 2 in the report)
-        # The 25.7 mm rings have a different and larger surface area
-        if '257' in ring:
-            Fp = ring_df['Pressure(bar)'] * 10**5 * large_area
-        else:
-            Fp = ring_df['Pressure(bar)'] * 10**5 * area
-
-        # Calculate the friction force by substracting the measured force with Fp (see equation 3 in the report)
-        FF = ring_df['Force(N)'] - Fp
-        friction_force[ring][bar]['FrictionForce'] = FF
-        friction_force[ring][bar]['FrictionFrom'] = FF[FF>FF.mean()].mean()
-        friction_force[ring][bar]['FrictionTo'] = FF[FF<FF.mean()].mean()
-
-# For each shape type
-for shape in shapes:
-    friction_force[shape] = {}
-    for bar in [1,2,3,4,5,6,7]:
-        # Some shapes extrude at higher pressure, no data is available for them
-        if bar > 3 and shape not in ['Stadium_lc','Kidney_lc','Kidney', 'Circle']:
-            break
-        if bar > 4 and shape not in ['Stadium_lc', 'Kidney_lc', 'Circle']:
-            break
-        if bar > 5 and shape not in ['Kidney_lc', 'Circle']:
-            break
-        # Load the data of the corresponding results in .CSV and drop unncessary columns
-        shape_df = pd.read_csv(f'./data/friction/{shape}_{bar}bar.csv',delimiter='\s+',header=None,names=(['Time','A','B','C','Laser(mm)','Pressure(bar)','Force(N)']))
-        shape_df.drop(columns=['A','B','C'],index=shape_df.index[range(drop_amount)],axis=1,inplace=True)
-
-        # Store the data in our larger dictionary
-        friction_force[shape][bar] = {}
-        # Set the time (in s) and laser (in mm)
-        friction_force[shape][bar]['Time'] = shape_df['Time']/1000
-        friction_force[shape][bar]['Laser(mm)'] = shape_df['Laser(mm)']
-        # Set the pressure (in MPa) and force (in N)
-        friction_force[shape][bar]['Pressure(bar)'] = shape_df['Pressure(bar)']/10
-        friction_force[shape][bar]['Force(N)'] = shape_df['Force(N)']
-
-        # Calculate force Fp based on the measured pressure (see equation 2 in the report)
-        Fp = shape_df['Pressure(bar)'] * 10**5 * area
-
-        # Calculate the friction force by substracting the measured force with Fp (see equation 3 in the report)
-        FF = shape_df['Force(N)'] - Fp
-        friction_force[shape][bar]['FrictionForce'] = FF
-        friction_force[shape][bar]['FrictionFrom'] = FF[FF>FF.mean()].mean()
-        friction_force[shape][bar]['FrictionTo'] = FF[FF<FF.mean()].mean()
+# Load the data of every friction test in .CSV, only parsing the channels used in this analysis
+# The loaded test is cached, a second run does not parse the .CSV again (see memo.py)
+tests = friction_tests()
+test_dfs = [cached_load_run(path,channels,drop_amount) for model,bar,path in tests]
+
+# Calculate the friction force of all tests at once, with the bore area of each model (see friction_kernel() in friction.py)
+# The stadium and kidney shapes use the area of their solved dimensions (see metadata.py)
+FF,friction_from,friction_to = friction_forces(test_dfs,[bore_area(model) for model,bar,path in tests])
+
+for i,(model,bar,path) in enumerate(tests):
+    test_df = test_dfs[i]
+    # Store the data in our larger dictionary
+    friction_force.setdefault(model,{})[bar] = {}
+    # Set the time (in s) and laser (in mm)
+    friction_force[model][bar]['Time'] = test_df['Time']/1000
+    friction_force[model][bar]['Laser(mm)'] = test_df['Laser(mm)']
+    # Set the pressure (in MPa) and force (in N)
+    friction_force[model][bar]['Pressure(bar)'] = test_df['Pressure(bar)']/10
+    friction_force[model][bar]['Force(N)'] = test_df['Force(N)']
+    friction_force[model][bar]['FrictionForce'] = FF[i]
+    friction_force[model][bar]['FrictionFrom'] = friction_from[i]
+    friction_force[model][bar]['FrictionTo'] = friction_to[i]
 
 
 # #### Friction force range definement plot - visual for in methodology
 
+# Only the samples within the zoomed window (in s) are plotted instead of the full series
+zoom = [5,15]
+
+# Function to select the samples of a model at 1 bar within the zoomed window, with a second extra on both sides
+def in_zoom(model):
+    return friction_force[model][1]['Time'].between(zoom[0] - 1, zoom[1] + 1)
+
+
 plt.annotate(text='',xy=(12,friction_force['O-ring'][1]['FrictionFrom']), xytext=(12,friction_force['O-ring'][1]['FrictionTo']), arrowprops=dict(arrowstyle='<->', lw=2))
 plt.hlines(xmin=0, xmax=70,y=friction_force['O-ring'][1]['FrictionFrom'], linestyles='dashed', colors='0', lw=2)
 plt.hlines(xmin=0, xmax=70,y=friction_force['O-ring'][1]['FrictionTo'], linestyles='dashed', colors='0', lw=2)
-plt.plot(friction_force['O-ring'][1]['Time'],friction_force['O-ring'][1]['FrictionForce'],'tab:blue',label='O-ring')
-plt.plot(friction_force['NAPN'][1]['Time'],friction_force['NAPN'][1]['FrictionForce'],'tab:orange',alpha=0.25,label='NAPN')
-plt.plot(friction_force['NAP310'][1]['Time'],friction_force['NAP310'][1]['FrictionForce'],'tab:green',alpha=0.25,label='NAP 330')
-plt.plot(friction_force['PK'][1]['Time'],friction_force['PK'][1]['FrictionForce'],'tab:red',alpha=0.25,label='PK')
-plt.plot(friction_force['KDN'][1]['Time'],friction_force['KDN'][1]['FrictionForce'],'tab:purple', alpha=0.25,label='KDN')
+plt.plot(friction_force['O-ring'][1]['Time'][in_zoom('O-ring')],friction_force['O-ring'][1]['FrictionForce'][in_zoom('O-ring')],'tab:blue',label='O-ring')
+plt.plot(friction_force['NAPN'][1]['Time'][in_zoom('NAPN')],friction_force['NAPN'][1]['FrictionForce'][in_zoom('NAPN')],'tab:orange',alpha=0.25,label='NAPN')
+plt.plot(friction_force['NAP310'][1]['Time'][in_zoom('NAP310')],friction_force['NAP310'][1]['FrictionForce'][in_zoom('NAP310')],'tab:green',alpha=0.25,label='NAP 330')
+plt.plot(friction_force['PK'][1]['Time'][in_zoom('PK')],friction_force['PK'][1]['FrictionForce'][in_zoom('PK')],'tab:red',alpha=0.25,label='PK')
+plt.plot(friction_force['KDN'][1]['Time'][in_zoom('KDN')],friction_force['KDN'][1]['FrictionForce'][in_zoom('KDN')],'tab:purple', alpha=0.25,label='KDN')
 
-plt.xlim([5,15])
+plt.xlim(zoom)
 plt.xlabel('Time (s)')
 plt.ylabel('Force (N)')
 plt.legend(loc='lower center',bbox_to_anchor=(0.5,-0.3),ncol=5)
@@ -138,40 +99,8 @@ plt.clf()
 
 # Function to calculate standard error for a specific test
 def calculate_se(friction_force,model,bar):
-    # Calculate the mean to define retracting and extending parts
-    frictionforce_mean = friction_force[model][bar]['FrictionForce'].mean()
-    # Variable to store the friction force
-    frictionforce = list(friction_force[model][bar]['FrictionForce'])
-    # Variables for results and counter
-    frictionforce_se_means = []
-    i = 0
-
-    # Loop through the data and break them up into separate tests
-    while i < len(frictionforce) - 1:
-        # Lists for retracting and extending parts of a single test
-        retracting = []
-        extending = []
-
-        # First the retracting part of a test is done
-        # Get all values above the mean
-        while len(retracting) < 100 or frictionforce[i] > frictionforce_mean:
-            retracting.append(frictionforce[i])
-            i += 1
-            # Break if it gets below the mean
-            if i > len(frictionforce) - 1:
-                break
-
-        # Secondly the extending part of a test is done
-        # Get all values below the mean
-        while len(extending) < 100 or frictionforce[i] < frictionforce_mean:
-            extending.append(frictionforce[i])
-            i += 1
-            # Break if it gets above the mean
-            if i > len(frictionforce) - 1:
-                break
-
-        # The friction force range is defined as the difference between the mean friction force of the retracting and extending strokes
-        frictionforce_se_means.append(mean(retracting)-mean(extending))
+    # Break the friction force up into the friction force range of each stroke (see friction.py)
+    frictionforce_se_means,extending,retracting = stroke_ranges(friction_force[model][bar]['FrictionForce'])
 
     # Standard error is calculated by the standard deviation of the means
     # Also return the mean of the friction force ranges across the tests
@@ -223,10 +152,12 @@ for shape in shapes:
             print(f'No data for {shape} - {e} bar due to extrusion of the O-ring')
 
 print(std_single_test_rings)
-# print(std_single_test_rings.to_latex(escape=False))
-
 print(std_single_test_shapes)
-# print(std_single_test_shapes.to_latex(escape=False))
+
+# The tables are stored for the report (see report.py), which renders them to LaTeX and HTML
+os.makedirs('./data/derived/tables',exist_ok=True)
+std_single_test_rings.to_csv('./data/derived/tables/friction_single_test_rings.csv')
+std_single_test_shapes.to_csv('./data/derived/tables/friction_single_test_shapes.csv')
 
 
 # #### Friction force range plot 25mm
@@ -364,6 +295,48 @@ plt.savefig('./figures/app_frictionforcerange_shapes_lc.pdf',bbox_inches = 'tigh
 plt.clf()
 
 
+# #### Ensemble cycle
+
+# All extend and retract cycles of a test are averaged into one representative cycle
+# Phase 0 to 0.5 is the retracting stroke and 0.5 to 1 the extending stroke
+friction_cycles = {}
+for model in friction_force:
+    friction_cycles[model] = {bar: ensemble(friction_force[model][bar]) for bar in friction_force[model]}
+
+# Visualize the mean friction force over a cycle with the 5-95 percentile band - 25 mm cylinder at 0.3 MPa
+for ring, color in zip(['O-ring','NAPN','NAP310','PK','KDN'], ['tab:blue','tab:orange','tab:green','tab:red','tab:purple']):
+    cycle = friction_cycles[ring][3]
+    plt.fill_between(cycle['phase'],cycle['FrictionForce']['p5'],cycle['FrictionForce']['p95'],color=color,alpha=0.25,linewidth=0)
+    plt.plot(cycle['phase'],cycle['FrictionForce']['mean'],color,label=ring)
+
+plt.xlabel('Phase of the cycle (-)')
+plt.ylabel('Friction force (N)')
+plt.legend(loc='lower center',bbox_to_anchor=(0.5,-0.3),ncol=5)
+plt.savefig('./figures/result_frictionforce_cycle_25mm.pdf',bbox_inches = 'tight')
+plt.clf()
+
+
+# #### Friction force hysteresis loops
+
+# The friction force of every model and pressure is binned over the position of the piston, for both strokes
+friction_loops = hysteresis_loops({f'{model}_{bar}bar': friction_force[model][bar] for model in friction_force for bar in friction_force[model]})
+# Store the loops to compare them without loading the data again
+os.makedirs('./data/derived',exist_ok=True)
+save_loops('./data/derived/friction_hysteresis_loops.npz',friction_loops)
+
+# Visualize the loops of the O-ring - 25 mm cylinder at all pressures
+for bar, color in zip([1,3,5,7], ['tab:blue','tab:orange','tab:green','tab:red']):
+    loop = friction_loops['labels'].index(f'O-ring_{bar}bar')
+    plt.plot(friction_loops['centres'],friction_loops['mean'][loop,0],color,label=f'{bar/10} MPa')
+    plt.plot(friction_loops['centres'],friction_loops['mean'][loop,1],color,linestyle='dashed')
+
+plt.xlabel('Position (mm)')
+plt.ylabel('Friction force (N)')
+plt.legend()
+plt.savefig('./figures/result_frictionforce_hysteresis_O-ring.pdf',bbox_inches = 'tight')
+plt.clf()
+
+
 # # Repeatablilty
 
 # We performed two repeatability tests
@@ -376,29 +349,23 @@ plt.clf()
 # For each model all variables are stored in this nested dictionary
 friction_rerun = {}
 
-# For each repeated test
-for test in range(1,4):
-    friction_rerun[test] = {}
-    for bar in [1,3,5,7]:
-        # Load the data of the corresponding results in .CSV and drop unncessary columns
-        test_df = pd.read_csv(f'./data/repeatability/rerun/friction/{test}_O-ring257_{bar}bar.csv',delimiter='\s+',header=None,names=(['Time','A','B','C','Laser(mm)','Pressure(bar)','Force(N)']))
-        test_df.drop(columns=['A','B','C'],index=test_df.index[range(drop_amount)],axis=1,inplace=True)
-
-        # Store the data in our larger dictionary
-        friction_rerun[test][bar] = {}
-        # Set the time (in s) and laser (in mm)
-        friction_rerun[test][bar]['Time'] = test_df['Time']/1000
-        friction_rerun[test][bar]['Laser(mm)'] = test_df['Laser(mm)']
-        # Set the pressure (in MPa) and force (in N)
-        friction_rerun[test][bar]['Pressure(bar)'] = test_df['Pressure(bar)']/10
-        friction_rerun[test][bar]['Force(N)'] = test_df['Force(N)']
-
-        # Calculate force Fp based on the measured pressure
-        # The 25.7 mm rings have a different and larger surface area (see equation 2 in the report)
-        Fp = test_df['Pressure(bar)'] * 10**5 * large_area
-
-        # Calculate the friction force by substracting the measured force with Fp (see equation 3 in the report)
-        friction_rerun[test][bar]['FrictionForce'] = test_df['Force(N)'] - Fp
+# Load the data of the repeated tests, the friction force of all of them is calculated at once
+repeated = [(test,bar) for test in range(1,4) for bar in [1,3,5,7]]
+test_dfs = [cached_load_run(f'./data/repeatability/rerun/friction/{test}_O-ring257_{bar}bar.csv',channels,drop_amount) for test,bar in repeated]
+# The 25.7 mm rings have a different and larger surface area (see equation 2 in the report)
+FF,_,_ = friction_forces(test_dfs,[bore_area('O-ring257')]*len(repeated))
+
+for i,(test,bar) in enumerate(repeated):
+    test_df = test_dfs[i]
+    # Store the data in our larger dictionary
+    friction_rerun.setdefault(test,{})[bar] = {}
+    # Set the time (in s) and laser (in mm)
+    friction_rerun[test][bar]['Time'] = test_df['Time']/1000
+    friction_rerun[test][bar]['Laser(mm)'] = test_df['Laser(mm)']
+    # Set the pressure (in MPa) and force (in N)
+    friction_rerun[test][bar]['Pressure(bar)'] = test_df['Pressure(bar)']/10
+    friction_rerun[test][bar]['Force(N)'] = test_df['Force(N)']
+    friction_rerun[test][bar]['FrictionForce'] = FF[i]
 
 # For each test use the calculate_se() function to acquire the mean friction force and standard error
 for test in range(1,4):
@@ -447,30 +414,23 @@ plt.clf()
 # For each model all variables are stored in this nested dictionary
 friction_reconnected = {}
 
-# For each repeated test
-for test in range(1,4):
-    friction_reconnected[test] = {}
-    for bar in [1,3,5,7]:
-        # Load the data of the corresponding results in .CSV and drop unncessary columns
-        test_df = pd.read_csv(f'./data/repeatability/reconnected/friction/{test}_O-ring257_{bar}bar.csv',delimiter='\s+',header=None,names=(['Time','A','B','C','Laser(mm)','Pressure(bar)','Force(N)']))
-        test_df.drop(columns=['A','B','C'],index=test_df.index[range(drop_amount)],axis=1,inplace=True)
-
-        # Store the data in our larger dictionary
-        friction_reconnected[test][bar] = {}
-        # Set the time (in s) and laser (in mm)
-        friction_reconnected[test][bar]['Time'] = test_df['Time']/1000
-        friction_reconnected[test][bar]['Laser(mm)'] = test_df['Laser(mm)']
-        # Set the pressure (in MPa) and force (in N)
-        friction_reconnected[test][bar]['Pressure(bar)'] = test_df['Pressure(bar)']/10
-        friction_reconnected[test][bar]['Force(N)'] = test_df['Force(N)']
-
-        # Calculate force Fp based on the measured pressure
-        # The 25.7 mm rings have a different and larger surface area (see equation 2 in the report)
-        Fp = test_df['Pressure(bar)'] * 10**5 * large_area
-
-        # Calculate the friction force by substracting the measured force with Fp (see equation 3 in the report)
-        friction_reconnected[test][bar]['FrictionForce'] = test_df['Force(N)'] - Fp
-
+# Load the data of the repeated tests, the friction force of all of them is calculated at once
+repeated = [(test,bar) for test in range(1,4) for bar in [1,3,5,7]]
+test_dfs = [cached_load_run(f'./data/repeatability/reconnected/friction/{test}_O-ring257_{bar}bar.csv',channels,drop_amount) for test,bar in repeated]
+# The 25.7 mm rings have a different and larger surface area (see equation 2 in the report)
+FF,_,_ = friction_forces(test_dfs,[bore_area('O-ring257')]*len(repeated))
+
+for i,(test,bar) in enumerate(repeated):
+    test_df = test_dfs[i]
+    # Store the data in our larger dictionary
+    friction_reconnected.setdefault(test,{})[bar] = {}
+    # Set the time (in s) and laser (in mm)
+    friction_reconnected[test][bar]['Time'] = test_df['Time']/1000
+    friction_reconnected[test][bar]['Laser(mm)'] = test_df['Laser(mm)']
+    # Set the pressure (in MPa) and force (in N)
+    friction_reconnected[test][bar]['Pressure(bar)'] = test_df['Pressure(bar)']/10
+    friction_reconnected[test][bar]['Force(N)'] = test_df['Force(N)']
+    friction_reconnected[test][bar]['FrictionForce'] = FF[i]
 
 # For each test use the calculate_se() function to acquire the mean friction force and standard error
 for test in range(1,4):
@@ -518,63 +478,8 @@ plt.clf()
 
 # To fairly compare the calculated friction force range to the friction force of conventional pneumatic actuators, we have to take the velocity of the piston into account. For this we calculate the velocity of the piston during the tests.
 # We will only calculate the speeds for specifically the O-ring - 3 bar
-time = list(friction_force['O-ring'][3]['Time'])
-laser = list(friction_force['O-ring'][3]['Laser(mm)'])
-
-# Boolean variables to keep track of which peak we are looking for next (low or high)
-high_peak_found = False
-low_peak_found = False
-
-# The peaks will be stored in lists as tuples
-high_peaks = []
-low_peaks = []
-
-# For each distance measured by the laser, find both peaks
-for cur_distance in range(0,len(laser)):
-    # Get the previous and next distance points of the laser
-    previous_distances = laser[cur_distance-20:cur_distance]
-    next_distances = laser[cur_distance:cur_distance+20]
-
-    # Make sure both lists are not empty
-    if previous_distances != [] and next_distances != []:
-        # A peak can be found if the distance is higher (or lower) than all the surrounding distances
-        if (all(laser[cur_distance] >= i for i in previous_distances) and all(laser[cur_distance] >= i for i in next_distances)) == True and high_peak_found == False:
-            # If this is true, add the distance and time to our list
-            high_peaks.append((laser[cur_distance], time[cur_distance]))
-            # A high peak has been found, next will be a low peak
-            high_peak_found = True
-            low_peak_found = False
-        # The next peak can be found if the distance is higher (or lower) than all the surrounding distances
-        if (all(laser[cur_distance] <= i for i in previous_distances) and all(laser[cur_distance] <= i for i in next_distances)) == True and low_peak_found == False:
-            low_peaks.append((laser[cur_distance], time[cur_distance]))
-            low_peak_found = True
-            high_peak_found = False
-
-# List to store extending speeds for each run
-extending_speeds = []
-# For each high peak, calculate the speed
-for i in range(0, len(high_peaks)):
-    # Delta distance (in mm) is the difference between the high peak and next low peak
-    delta_distance = high_peaks[i][0] - low_peaks[i][0]
-    # Same goes for the time (in s)
-    delta_time = high_peaks[i][1] - low_peaks[i][1]
-    # Calculate speed (in mm/s)
-    speed = delta_distance/delta_time
-    # Add speed to our list
-    extending_speeds.append(speed)
-
-# List to store extending speeds for each run
-retracting_speeds = []
-# For each low peak, calculate the speed
-for i in range(0, len(low_peaks)-1):
-    # Delta distance (in mm) is the difference between the low peak and next high peak (therefore +1)
-    delta_distance = low_peaks[i][0] - high_peaks[i+1][0]
-    # Same goes for the time (in s)
-    delta_time =  low_peaks[i][1] - high_peaks[i+1][1]
-    # Calculate speed (in mm/s)
-    speed = delta_distance/delta_time
-    # Add speed to our list
-    retracting_speeds.append(speed)
+# The peaks of the laser give the speed of every stroke, the speeds are cached (see stroke_speeds() in friction.py)
+extending_speeds,retracting_speeds = stroke_speeds(friction_force['O-ring'][3]['Time'],friction_force['O-ring'][3]['Laser(mm)'])
 
 print(f'\nAverage extending speed at a pressure of 0.3MPa: {mean(extending_speeds)} mm/s')
 print(f'Average retracting speed at a pressure of 0.3MPa: {mean(retracting_speeds)} mm/s')
@@ -16,10 +16,9 @@ __email__ = "e.zillen@student.tudelft.nl"
 
 
 # #### Imports
-import math
-import pandas as pd
 import matplotlib.pyplot as plt
-import numpy as np
+from filtering import savgol
+from loading import cached_load_run
 
 
 # #### Global variables
@@ -28,8 +27,10 @@ import numpy as np
 rings = ['O-ring','NAPN','NAP310','PK','KDN','O-ring257','X-ring257']
 # The models with different cross-sectional shape used in this test
 shapes = ['Circle','Stadium','Kidney','Stadium_lc','Kidney_lc']
-# Remove first 15 data points to avoid deviating starting values
-drop_amount = 15
+# Remove the deviating starting values, the start transient is detected for each test (see loading.py)
+drop_amount = 'auto'
+# The channels used in the static leakage analysis, the laser and force are not needed
+channels = ['Time','Pressure(bar)']
 
 
 # # Static leakage test
@@ -40,20 +41,20 @@ static_leakage = {}
 
 # For each model type
 for model in rings+shapes:
-    # Load the data of the corresponding results in .CSV and drop unncessary columns
-    model_df = pd.read_csv(f'./data/static/{model}.csv',delimiter='\s+',header=None,names=(['Time','A','B','C','Laser(mm)','Pressure(bar)','Force(N)']))
-    model_df.drop(columns=['A','B','C'],index=model_df.index[range(drop_amount)],axis=1,inplace=True)
+    # Load the data of the corresponding results in .CSV, only parsing the channels used in this analysis
+    # The loaded test is cached, a second run does not parse the .CSV again (see memo.py)
+    model_df = cached_load_run(f'./data/static/{model}.csv',channels,drop_amount)
 
     # Store the data in our larger dictionary
     static_leakage[model] = {}
-    # Filtering the data with a rolling window and sampling the data (in s)
-    static_leakage[model]['Time'] = model_df['Time'].head(130000).rolling(window=100).mean()[::1000]/1000
+    # Sampling the time (in s)
+    static_leakage[model]['Time'] = model_df['Time'].head(130000)[::1000]/1000
     # Define the pressure drop by reducing each pressure value with the first pressure value (in bar)
-    static_leakage[model]['PressureDrop(bar)'] = model_df['Pressure(bar)'] - model_df['Pressure(bar)'][drop_amount]
-    # Filtering the pressure with a rolling window and sampling the data (in MPa)
-    static_leakage[model]['PressureDrop(bar)'] = static_leakage[model]['PressureDrop(bar)'].head(130000).rolling(window=100).mean()[::1000]/10
-    # Ensure the first value is equal to 0 to prevent NaN
-    static_leakage[model]['PressureDrop(bar)'][drop_amount] = 0
+    static_leakage[model]['PressureDrop(bar)'] = (model_df['Pressure(bar)'] - model_df['Pressure(bar)'].iloc[0]).head(130000)
+
+# Filtering the pressure of all tests at once with a zero-phase Savitzky-Golay filter and sampling the data (in MPa)
+for model, pressure_drop in zip(rings+shapes, savgol([static_leakage[model]['PressureDrop(bar)'] for model in rings+shapes], window=101, order=2)):
+    static_leakage[model]['PressureDrop(bar)'] = pressure_drop[::1000]/10
 
 
 # #### Static leakage plot 25mm
@@ -149,20 +150,20 @@ static_rerun = {}
 
 # Iterate all 3 repeated tests and add them to the dictionary
 for test in range(1,4):
-    # Load the data of the corresponding results in .CSV and drop unncessary columns
-    test_df = pd.read_csv(f'./data/repeatability/rerun/static/{test}_O-ring257.csv',delimiter='\s+',header=None,names=(['Time','A','B','C','Laser(mm)','Pressure(bar)','Force(N)']))
-    test_df.drop(columns=['A','B','C'],index=test_df.index[range(drop_amount)],axis=1,inplace=True)
+    # Load the data of the corresponding results in .CSV, only parsing the channels used in this analysis
+    # The loaded test is cached, a second run does not parse the .CSV again (see memo.py)
+    test_df = cached_load_run(f'./data/repeatability/rerun/static/{test}_O-ring257.csv',channels,drop_amount)
 
     # Store the data in the dictionary
     static_rerun[test] = {}
-    # Filtering the data with a rolling window and sampling the data (in s)
-    static_rerun[test]['Time'] = test_df['Time'].head(130000).rolling(window=100).mean()[::1000]/1000
+    # Sampling the time (in s)
+    static_rerun[test]['Time'] = test_df['Time'].head(130000)[::1000]/1000
     # Define the pressure drop by reducing each pressure value with the first pressure value (in bar)
-    static_rerun[test]['PressureDrop(bar)'] = test_df['Pressure(bar)'] - test_df['Pressure(bar)'][drop_amount]
-    # Filtering the pressure with a rolling window and sampling the data (in MPa)
-    static_rerun[test]['PressureDrop(bar)'] = static_rerun[test]['PressureDrop(bar)'].head(130000).rolling(window=100).mean()[::1000]/10
-    # Ensure the first value is equal to 0 to prevent NaN
-    static_rerun[test]['PressureDrop(bar)'][drop_amount] = 0
+    static_rerun[test]['PressureDrop(bar)'] = (test_df['Pressure(bar)'] - test_df['Pressure(bar)'].iloc[0]).head(130000)
+
+# Filtering the pressure of all tests at once with a zero-phase Savitzky-Golay filter and sampling the data (in MPa)
+for test, pressure_drop in zip(range(1,4), savgol([static_rerun[test]['PressureDrop(bar)'] for test in range(1,4)], window=101, order=2)):
+    static_rerun[test]['PressureDrop(bar)'] = pressure_drop[::1000]/10
 
 plt.plot(static_leakage['O-ring']['Time'],static_leakage['O-ring']['PressureDrop(bar)'],'tab:grey',alpha=0.25, linestyle='dotted',linewidth=3)
 plt.plot(static_leakage['NAPN']['Time'],static_leakage['NAPN']['PressureDrop(bar)'],'tab:grey',alpha=0.25, linestyle='dashdot')
@@ -189,20 +190,20 @@ static_reconnected = {}
 
 # Iterate all 3 repeated tests and add them to the dictionary
 for test in range(1,4):
-    # Load the data of the corresponding results in .CSV and drop unncessary columns
-    test_df = pd.read_csv(f'./data/repeatability/reconnected/static/{test}_O-ring257.csv',delimiter='\s+',header=None,names=(['Time','A','B','C','Laser(mm)','Pressure(bar)','Force(N)']))
-    test_df.drop(columns=['A','B','C'],index=test_df.index[range(drop_amount)],axis=1,inplace=True)
+    # Load the data of the corresponding results in .CSV, only parsing the channels used in this analysis
+    # The loaded test is cached, a second run does not parse the .CSV again (see memo.py)
+    test_df = cached_load_run(f'./data/repeatability/reconnected/static/{test}_O-ring257.csv',channels,drop_amount)
 
     # Store the data in the dictionary
     static_reconnected[test] = {}
-    # Filtering the data with a rolling window and sampling the data (in s)
-    static_reconnected[test]['Time'] = test_df['Time'].head(130000).rolling(window=100).mean()[::1000]/1000
+    # Sampling the time (in s)
+    static_reconnected[test]['Time'] = test_df['Time'].head(130000)[::1000]/1000
     # Define the pressure drop by reducing each pressure value with the first pressure value (in bar)
-    static_reconnected[test]['PressureDrop(bar)'] = test_df['Pressure(bar)'] - test_df['Pressure(bar)'][drop_amount]
-    # Filtering the pressure with a rolling window and sampling the data (in MPa)
-    static_reconnected[test]['PressureDrop(bar)'] = static_reconnected[test]['PressureDrop(bar)'].head(130000).rolling(window=100).mean()[::1000]/10
-    # Ensure the first value is equal to 0 to preven NaN
-    static_reconnected[test]['PressureDrop(bar)'][drop_amount] = 0
+    static_reconnected[test]['PressureDrop(bar)'] = (test_df['Pressure(bar)'] - test_df['Pressure(bar)'].iloc[0]).head(130000)
+
+# Filtering the pressure of all tests at once with a zero-phase Savitzky-Golay filter and sampling the data (in MPa)
+for test, pressure_drop in zip(range(1,4), savgol([static_reconnected[test]['PressureDrop(bar)'] for test in range(1,4)], window=101, order=2)):
+    static_reconnected[test]['PressureDrop(bar)'] = pressure_drop[::1000]/10
 
 # Substracting the initial pressure from the data to account for pressure drop
 plt.plot(static_leakage['O-ring']['Time'],static_leakage['O-ring']['PressureDrop(bar)'],'tab:grey',alpha=0.25, linestyle='dotted',linewidth=3)
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the computed metrics of the actuator tests are served as JSON over HTTP on the local machine,
+so they can be used without running the scripts. Requests are handled in parallel threads, and the metrics
+are kept in an in-process LRU cache (on top of the cache of the loaded tests, see memo.py).
+
+Run `python3 service.py --port 8000` and request e.g.
+  /models                                      the tested models and their pressures
+  /friction?model=O-ring&bar=3                 friction force range of one test (as calculate_se() in the results)
+  /friction?model=O-ring                       the same for all pressures of a model
+  /velocity?model=O-ring&bar=3                 extending and retracting speeds
+  /leakage/static?model=O-ring                 static leakage summary, all models without model=
+  /leakage/dynamic?model=O-ring                dynamic leakage summary, all models without model=
+  /dimensions?ID=22&S=3.5                      piston groove, stadium and kidney dimensions of any O-ring
+  /cache                                       hits and misses of the cache
+Run `python3 load_test.py` to measure the latency of a running service
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import functools
+import json
+import math
+import os
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from batch import analyse_dynamic, analyse_static
+from friction import stroke_ranges, stroke_speeds
+from loading import cached_load_run, drop_amount
+from metadata import bore_area, bore_diameter, friction_pressures, rings, shapes
+from validation import ValidationError
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'method_dimension-calculations'))
+from geometry import groove, kidney, stadium
+
+
+# #### Global variables
+
+host = '127.0.0.1'
+port = 8000
+# The number of results kept per metric
+cache_size = 1024
+# The folder with the friction, static and dynamic tests
+data_dir = './data'
+
+
+# #### Cache
+
+# Decorator to keep the last results of a metric in memory, e.g. @LRUCache(cache_size) above the definition
+# When several threads ask for the same missing result, only one computes it and the others wait for it
+class LRUCache:
+    def __init__(self, maxsize=cache_size):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.computing = {}
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.get(func, (args, tuple(sorted(kwargs.items()))), args, kwargs)
+        wrapper.cache = self
+        return wrapper
+
+    def get(self, func, key, args, kwargs):
+        while True:
+            with self.lock:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return self.entries[key]
+                done = self.computing.get(key)
+                if done is None:
+                    done = self.computing[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Another thread computes the result, a failure there is retried here
+            done.wait()
+
+        try:
+            value = func(*args, **kwargs)
+            with self.lock:
+                self.entries[key] = value
+                if len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+            return value
+        finally:
+            with self.lock:
+                del self.computing[key]
+            done.set()
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries), 'maxsize': self.maxsize}
+
+
+# #### Metrics
+
+# Function to give the friction force range (in N) of a test, as calculate_se() in results_friction_force.py
+@LRUCache(cache_size)
+def friction_metrics(model, bar):
+    test_df = cached_load_run(os.path.join(data_dir, 'friction', f'{model}_{bar}bar.csv'), ['Time','Pressure(bar)','Force(N)'], drop_amount)
+    # Calculate the friction force by substracting Fp from the measured force (see equation 3 in the report)
+    friction_force = test_df['Force(N)'] - test_df['Pressure(bar)'] * 10**5 * bore_area(model)
+    ranges, extending, retracting = stroke_ranges(friction_force)
+    return {'model': model, 'bar': bar, 'strokes': len(ranges), 'mean_range': np.mean(ranges), 'se_range': np.std(ranges),
+            'friction_from': friction_force[friction_force > friction_force.mean()].mean(),
+            'friction_to': friction_force[friction_force < friction_force.mean()].mean(),
+            'extending_mean': np.mean(extending), 'extending_std': np.std(extending),
+            'retracting_mean': np.mean(retracting), 'retracting_std': np.std(retracting)}
+
+
+# Function to give the speeds (in mm/s) of the strokes of a test
+@LRUCache(cache_size)
+def velocity_metrics(model, bar):
+    test_df = cached_load_run(os.path.join(data_dir, 'friction', f'{model}_{bar}bar.csv'), ['Time','Laser(mm)'], drop_amount)
+    extending, retracting = stroke_speeds(test_df['Time'] / 1000, test_df['Laser(mm)'])
+    return {'model': model, 'bar': bar, 'extending_speed': np.mean(extending), 'retracting_speed': np.mean(retracting),
+            'extending_strokes': len(extending), 'retracting_strokes': len(retracting)}
+
+
+@LRUCache(cache_size)
+def static_metrics(model):
+    return analyse_static(os.path.join(data_dir, 'static', f'{model}.csv'))
+
+
+@LRUCache(cache_size)
+def dynamic_metrics(model):
+    return analyse_dynamic(os.path.join(data_dir, 'dynamic', f'{model}.csv'))
+
+
+# Function to give the piston groove and the non-circular shapes (in mm and mm^2) of an O-ring,
+# the shapes have the area of a circular cylinder with the given diameter (in mm)
+@LRUCache(cache_size)
+def dimension_metrics(ID, S, r_sq=0.1, C=0.5, diameter=25):
+    A_target = math.pi * (diameter / 2)**2
+    D, L, stadium_area = stadium(ID, S, A_target)
+    a, r, kidney_area = kidney(ID, S, A_target=A_target)
+    return {'ID': ID, 'S': S, **groove(ID, S, r_sq, C),
+            'stadium': {'D': D[0], 'L': L[0], 'area': stadium_area[0]},
+            'kidney': {'a': a[0], 'r': r[0], 'area': kidney_area[0]}}
+
+
+# #### Endpoints
+
+def model_argument(query, models=rings + shapes):
+    model = query['model']
+    if model not in models:
+        raise KeyError(f'Unknown model {model}, choose from {models}')
+    return model
+
+
+def bar_argument(query, model):
+    bar = int(query['bar'])
+    if bar not in friction_pressures[model]:
+        raise KeyError(f'No friction test of {model} at {bar} bar, choose from {friction_pressures[model]}')
+    return bar
+
+
+# The endpoints give a model per pressure, or all models, when the pressure or model is left out
+def friction_endpoint(query):
+    model = model_argument(query)
+    if 'bar' in query:
+        return friction_metrics(model, bar_argument(query, model))
+    return [friction_metrics(model, bar) for bar in friction_pressures[model]]
+
+
+def velocity_endpoint(query):
+    model = model_argument(query)
+    if 'bar' in query:
+        return velocity_metrics(model, bar_argument(query, model))
+    return [velocity_metrics(model, bar) for bar in friction_pressures[model]]
+
+
+def static_endpoint(query):
+    if 'model' in query:
+        return static_metrics(model_argument(query))
+    return [static_metrics(model) for model in rings + shapes]
+
+
+def dynamic_endpoint(query):
+    if 'model' in query:
+        return dynamic_metrics(model_argument(query))
+    return [dynamic_metrics(model) for model in rings + shapes]
+
+
+def dimensions_endpoint(query):
+    # The O-ring is required, the other arguments have their defaults
+    missing = [name for name in ['ID','S'] if name not in query]
+    if missing:
+        raise KeyError(f'Missing {missing}, give the inner diameter ID and cross section S of the O-ring (in mm)')
+    arguments = {name: float(query[name]) for name in ['ID','S','r_sq','C','diameter'] if name in query}
+    return dimension_metrics(**arguments)
+
+
+def models_endpoint(query):
+    return [{'model': model, 'type': 'ring' if model in rings else 'shape', 'bore_diameter': bore_diameter[model],
+             'friction_pressures': friction_pressures[model]} for model in rings + shapes]
+
+
+def cache_endpoint(query):
+    return {metric.__name__: metric.cache.info() for metric in metrics}
+
+
+endpoints = {
+    '/models': models_endpoint,
+    '/friction': friction_endpoint,
+    '/velocity': velocity_endpoint,
+    '/leakage/static': static_endpoint,
+    '/leakage/dynamic': dynamic_endpoint,
+    '/dimensions': dimensions_endpoint,
+    '/cache': cache_endpoint,
+}
+metrics = [friction_metrics, velocity_metrics, static_metrics, dynamic_metrics, dimension_metrics]
+
+
+# Function to make a result valid JSON: NumPy numbers become Python numbers and NaN becomes null
+def to_json(value):
+    if isinstance(value, dict):
+        return {key: to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return to_json(value.tolist())
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+# #### Server
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        endpoint = endpoints.get(url.path.rstrip('/') or '/models')
+        if endpoint is None:
+            return self.respond(404, {'error': f'Unknown endpoint {url.path}', 'endpoints': list(endpoints)})
+        try:
+            self.respond(200, endpoint(query))
+        except (KeyError, ValueError) as exception:
+            # A missing or invalid argument, a failed validation is a problem of the test itself
+            if isinstance(exception, ValidationError):
+                return self.respond(422, {'error': str(exception), 'issues': exception.report['issues']})
+            return self.respond(400, {'error': f'{type(exception).__name__}: {exception}'})
+        except FileNotFoundError as exception:
+            self.respond(404, {'error': str(exception)})
+        except Exception as exception:
+            self.respond(500, {'error': f'{type(exception).__name__}: {exception}'})
+
+    def respond(self, status, result):
+        body = json.dumps(to_json(result)).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Only failed requests are logged, a load test would otherwise flood the terminal
+    def log_request(self, code='-', size='-'):
+        if isinstance(code, int) and code >= 400:
+            super().log_request(code, size)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many clients may connect at once, the default queue of 5 connections would make them retry
+    request_queue_size = 128
+
+
+def serve(host=host, port=port):
+    return MetricsServer((host, port), MetricsHandler)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=host)
+    parser.add_argument('--port', type=int, default=port)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port)
+    print(f' ------ Serving the actuator metrics on http://{args.host}:{args.port} (Ctrl+C to stop) ------')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the force signals are analysed in the frequency domain to reveal stick-slip.
+Stick-slip shows as oscillations of the force well above the stroke frequency, which the mean friction range hides.
+The Welch power spectral densities of all runs and channels are computed with a single FFT call:
+the overlapping segments of all signals are stacked into one array, windowed and transformed together.
+The mean cycle of a test is subtracted before the stick-slip and noise bands are computed,
+otherwise the leakage of the stroke harmonics dominates the lowest frequencies of these bands.
+
+Run `python3 spectral.py` to rank all friction tests in ./data/friction
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import as_strided
+from scipy import signal
+
+from loading import drop_amount, load_run
+from cycles import cycle_boundaries, stack_cycles
+from metadata import bore_area, friction_tests
+from resampling import resample_run
+
+
+# #### Global variables
+
+# The channels used in the spectral analysis
+channels = ['Time','Laser(mm)','Pressure(bar)','Force(N)']
+# The common sample interval (in ms) of all runs, the friction tests are sampled every 10-11 ms
+# This is slightly faster than the acquisition, so the bands are cut off at its Nyquist frequency (see cap_bands())
+dt = 10
+# Segment length (in samples) and overlap of the Welch method, 256 samples give a resolution of 0.39 Hz
+nperseg = 256
+overlap = 0.5
+# The frequency bands (in Hz): the stroke itself (about 0.12 Hz and its harmonics), stick-slip and sensor noise
+# The bands are cut off at the Nyquist frequency of the acquisition (about 45 Hz), resampling adds no information above it
+bands = {'stroke': (0, 2), 'stick_slip': (2, 20), 'noise': (20, 50)}
+
+
+# #### Functions
+
+# The window is computed once for every segment length, it is not to be changed in place
+@lru_cache(maxsize=None)
+def welch_window(nperseg, name='hann'):
+    window = signal.get_window(name, nperseg)
+    window.flags.writeable = False
+    return window
+
+
+# Function to cut a signal into overlapping segments, without copying the data
+def segments(values, nperseg=nperseg, step=None):
+    values = np.ascontiguousarray(values, dtype='float64')
+    step = step or nperseg // 2
+    n_segments = max((len(values) - nperseg) // step + 1, 0)
+    return as_strided(values, shape=(n_segments, nperseg), strides=(values.strides[0] * step, values.strides[0]), writeable=False)
+
+
+# Function to compute the Welch power spectral density of a number of signals at once (in unit^2/Hz)
+# Segments that contain a gap of the acquisition (NaN) are left out of the average
+def welch(signals, fs, nperseg=nperseg, overlap=overlap):
+    step = max(int(nperseg * (1 - overlap)), 1)
+    stacked = [segments(values, nperseg, step) for values in signals]
+    owner = np.repeat(np.arange(len(signals)), [len(segment) for segment in stacked])
+    stacked = np.concatenate(stacked) if len(owner) else np.empty((0, nperseg))
+    valid = ~np.isnan(stacked).any(axis=1)
+    stacked, owner = stacked[valid], owner[valid]
+
+    # Remove the mean of every segment, apply the window and transform all segments in one call
+    window = welch_window(nperseg)
+    spectrum = np.fft.rfft((stacked - stacked.mean(axis=1, keepdims=True)) * window, axis=1)
+    power = np.abs(spectrum)**2 / (fs * (window**2).sum())
+    # One-sided density: all frequencies except zero (and Nyquist for an even length) appear twice
+    power[:, 1:(nperseg + 1) // 2] *= 2
+
+    # Average the segments of each signal, signals without a complete segment are NaN
+    count = np.bincount(owner, minlength=len(signals))
+    total = np.zeros((len(signals), power.shape[1]))
+    np.add.at(total, owner, power)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        psd = total / count[:, None]
+    return np.fft.rfftfreq(nperseg, 1 / fs), psd
+
+
+# Function to integrate the density over each band, giving the power (in unit^2) of every signal per band
+def band_power(frequencies, psd, bands=bands):
+    df = frequencies[1] - frequencies[0]
+    return {band: psd[:, (frequencies >= low) & (frequencies < high)].sum(axis=1) * df for band, (low, high) in bands.items()}
+
+
+# Function to find the lowest Nyquist frequency (in Hz) of a number of tests, from their median sample interval (in ms)
+def native_nyquist(tests, time_column='Time'):
+    return min(1000 / (2 * np.median(np.diff(test_df[time_column].to_numpy()))) for _, _, test_df in tests)
+
+
+# Function to cut off the bands at a maximum frequency (in Hz), bands above it are left out
+def cap_bands(bands, maximum):
+    return {band: (low, min(high, maximum)) for band, (low, high) in bands.items() if low < maximum}
+
+
+# Function to subtract the mean cycle from the channels of a uniformly sampled test
+# Every sample gets its phase within its cycle, and the mean cycle at that phase is subtracted
+# Samples before the first and after the last complete cycle become NaN, the Welch method leaves them out
+def subtract_mean_cycle(test_df, channels, time_column='Time'):
+    stacked = stack_cycles(test_df, channels, time_column=time_column)
+    start, top, end = cycle_boundaries(test_df['Laser(mm)'])
+    time = test_df[time_column].to_numpy()
+
+    # The phase runs from 0 to 0.5 from the start to the top of a cycle, and from 0.5 to 1 to its end
+    phase = np.full(len(time), np.nan)
+    for first, middle, last in zip(start, top, end):
+        phase[first:middle] = 0.5 * (time[first:middle] - time[first]) / (time[middle] - time[first])
+        phase[middle:last] = 0.5 + 0.5 * (time[middle:last] - time[middle]) / (time[last] - time[middle])
+
+    residual_df = pd.DataFrame(index=test_df.index)
+    for channel in channels:
+        mean_cycle = np.nanmean(stacked['cycles'][channel], axis=0)
+        residual_df[channel] = test_df[channel].to_numpy() - np.interp(phase, stacked['phase'], mean_cycle, period=1)
+    return residual_df
+
+
+# Function to find the frequency (in Hz) at which each density stands out the most above its background in a band
+# The background is a power law fitted to the band, the densities without a mean cycle still fall with the frequency
+# Signals without a complete segment get NaN
+def peak_frequency(frequencies, psd, band):
+    in_band = (frequencies >= band[0]) & (frequencies < band[1])
+    x = np.log10(frequencies[in_band])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        y = np.log10(psd[:, in_band])
+    valid = np.isfinite(y).all(axis=1)
+    peaks = np.full(len(psd), np.nan)
+    if valid.any():
+        slope, intercept = np.polyfit(x, y[valid].T, 1)
+        excess = y[valid] - (slope[:, None] * x + intercept[:, None])
+        peaks[valid] = frequencies[in_band][excess.argmax(axis=1)]
+    return peaks
+
+
+# Function to compute the stick-slip indicators of the Force(N) and FrictionForce of a number of tests
+# The tests are a list of (model, bar, test), each test being loaded with the spectral channels
+def stick_slip(tests, dt=dt, nperseg=nperseg, overlap=overlap):
+    signals, residuals, rows = [], [], []
+    for model, bar, test_df in tests:
+        # Map all tests onto the same uniform grid, the FFT needs a constant sample interval
+        uniform_df, _ = resample_run(test_df, dt)
+        uniform_df['FrictionForce'] = uniform_df['Force(N)'] - uniform_df['Pressure(bar)'] * 10**5 * bore_area(model)
+        residual_df = subtract_mean_cycle(uniform_df, ['Force(N)','FrictionForce'])
+        signals += [uniform_df['Force(N)'].to_numpy(), uniform_df['FrictionForce'].to_numpy()]
+        residuals += [residual_df['Force(N)'].to_numpy(), residual_df['FrictionForce'].to_numpy()]
+        rows += [(model, bar, 'Force(N)'), (model, bar, 'FrictionForce')]
+
+    # The stroke band of the signals themselves, the other bands of the signals without their mean cycle
+    frequencies, psd = welch(signals + residuals, 1000 / dt, nperseg, overlap)
+    psd, residual_psd = psd[:len(signals)], psd[len(signals):]
+    capped = cap_bands(bands, native_nyquist(tests))
+    power = {**band_power(frequencies, residual_psd, capped), 'stroke': band_power(frequencies, psd, capped)['stroke']}
+    indicators = pd.DataFrame(rows, columns=['model','bar','channel'])
+    for band in capped:
+        # The power of a band is expressed as the RMS (in N) of the force within that band
+        indicators[f'{band}_rms'] = np.sqrt(power[band])
+    # The stick-slip indicator is the oscillation within the stick-slip band relative to the force of the stroke itself
+    indicators['stick_slip_ratio'] = indicators['stick_slip_rms'] / indicators['stroke_rms']
+    # The frequency of the most prominent oscillation in the stick-slip band, once the mean cycle is removed
+    indicators['stick_slip_peak'] = peak_frequency(frequencies, residual_psd, capped['stick_slip'])
+    return indicators.set_index(['model','bar','channel']), frequencies, psd
+
+
+# Function to rank the models on the stick-slip of their friction force, the highest ratio first
+def stick_slip_ranking(indicators, channel='FrictionForce'):
+    friction = indicators.xs(channel, level='channel')
+    ranking = friction.groupby(level='model').agg(
+        mean_ratio=('stick_slip_ratio','mean'),
+        max_ratio=('stick_slip_ratio','max'),
+        max_rms=('stick_slip_rms','max'),
+        peak_frequency=('stick_slip_peak','median'),
+    )
+    # The pressure at which the stick-slip is the strongest
+    ranking['worst_bar'] = friction['stick_slip_ratio'].groupby(level='model').idxmax().map(lambda index: index[1])
+    return ranking.sort_values('mean_ratio', ascending=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='./data/friction')
+    parser.add_argument('--output', default='./data/derived/stick_slip.csv')
+    args = parser.parse_args()
+
+    tests = [(model, bar, load_run(path, channels, drop_amount)) for model, bar, path in friction_tests(args.data)]
+    indicators, frequencies, psd = stick_slip(tests)
+    ranking = stick_slip_ranking(indicators)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    indicators.to_csv(args.output)
+    print(ranking.round(3).to_string())
+    print(f'\n ------ Succesfully saved the stick-slip indicators to {args.output} ------')
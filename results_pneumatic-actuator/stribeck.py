@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the friction force is related to the velocity of the piston (Stribeck curve).
+For every friction test the laser position is differentiated into the instantaneous velocity,
+after which a Coulomb + viscous and a Stribeck friction model are fitted.
+All tests are fitted in parallel and collected in a parameter table for controller design.
+
+Run `python3 stribeck.py` to fit all tests in ./data/friction
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import curve_fit
+
+from filtering import savgol
+from loading import drop_amount, load_run
+from metadata import bore_area, friction_tests
+from resampling import resample_run
+
+
+# #### Global variables
+
+# The channels used to relate friction to velocity
+channels = ['Time','Laser(mm)','Pressure(bar)','Force(N)']
+# Window (in samples) of the Savitzky-Golay differentiator, about 0.2 s at 10 ms
+window = 21
+# Samples slower than this (in mm/s) are turning points, they are left out of the fit
+min_velocity = 0.5
+# The exponent of the Stribeck curve, 2 gives the commonly used Gaussian shape
+stribeck_exponent = 2
+
+
+# #### Functions
+
+# Function to compute the velocity (in mm/s) and friction force (in N) of a test
+def velocity_friction(test_df, area, window=window):
+    # Map the test onto a uniform grid first, so the differentiator sees a constant sample interval (in ms)
+    uniform_df, report = resample_run(test_df)
+    velocity = savgol([uniform_df['Laser(mm)'].to_numpy()], window, order=2, fs=1000 / report['dt'], deriv=1)[0]
+    # Calculate the friction force by substracting Fp from the measured force (see equation 3 in the report)
+    friction_force = uniform_df['Force(N)'].to_numpy() - uniform_df['Pressure(bar)'].to_numpy() * 10**5 * area
+    # Gaps of the acquisition are NaN after resampling and are left out
+    valid = ~np.isnan(velocity) & ~np.isnan(friction_force)
+    return velocity[valid], friction_force[valid]
+
+
+# The friction models, an offset F0 accounts for the difference between the real and nominal piston area
+def coulomb_viscous(v, F0, Fc, b):
+    return F0 + Fc * np.sign(v) + b * v
+
+
+def stribeck(v, F0, Fc, Fs, vs, b):
+    return F0 + np.sign(v) * (Fc + (Fs - Fc) * np.exp(-np.abs(v / vs)**stribeck_exponent)) + b * v
+
+
+# Function to fit both friction models to the velocity and friction force of a test
+def fit_friction_models(velocity, friction_force, min_velocity=min_velocity):
+    moving = np.abs(velocity) > min_velocity
+    v, F = velocity[moving], friction_force[moving]
+
+    # Coulomb + viscous friction is linear in its parameters and is solved by least squares
+    design = np.column_stack((np.ones_like(v), np.sign(v), v))
+    (F0, Fc, b), *_ = np.linalg.lstsq(design, F, rcond=None)
+    result = {'samples': len(v), 'v_min': np.abs(v).min(), 'v_max': np.abs(v).max(),
+              'F0': F0, 'Fc': Fc, 'b': b, 'rmse_cv': np.sqrt(np.mean((coulomb_viscous(v, F0, Fc, b) - F)**2))}
+
+    # The Stribeck model starts from the Coulomb + viscous fit, with the static friction at the Coulomb friction
+    try:
+        p0 = [F0, Fc, Fc, np.median(np.abs(v)) / 2, b]
+        bounds = ([-np.inf, 0, 0, 1e-3, -np.inf], [np.inf, np.inf, np.inf, np.inf, np.inf])
+        (F0_s, Fc_s, Fs_s, vs_s, b_s), _ = curve_fit(stribeck, v, F, p0=p0, bounds=bounds, maxfev=5000)
+        rmse = np.sqrt(np.mean((stribeck(v, F0_s, Fc_s, Fs_s, vs_s, b_s) - F)**2))
+    except (RuntimeError, ValueError):
+        # The measured velocities may not cover the Stribeck region, then no fit is found
+        F0_s = Fc_s = Fs_s = vs_s = b_s = rmse = np.nan
+    result.update({'F0_s': F0_s, 'Fc_s': Fc_s, 'Fs_s': Fs_s, 'vs_s': vs_s, 'b_s': b_s, 'rmse_s': rmse})
+    return result
+
+
+# Function to fit a single friction test, run in a separate process
+def fit_test(test):
+    model, bar, path = test
+    test_df = load_run(path, channels, drop_amount)
+    velocity, friction_force = velocity_friction(test_df, bore_area(model))
+    return {'model': model, 'bar': bar, **fit_friction_models(velocity, friction_force)}
+
+
+# Function to fit all tests in parallel and collect the parameters in a table (one row per model and pressure)
+def fit_all(tests, workers=None):
+    with ProcessPoolExecutor(workers) as executor:
+        rows = list(executor.map(fit_test, tests))
+    return pd.DataFrame(rows).set_index(['model','bar'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='./data/friction')
+    parser.add_argument('--output', default='./data/derived/friction_parameters.csv')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    parameters = fit_all(friction_tests(args.data), args.workers)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    parameters.to_csv(args.output)
+    print(parameters.round(3).to_string())
+    print(f'\n ------ Succesfully saved the friction parameters to {args.output} ------')
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the batch runner is checked on a worker that dies while it analyses a file,
+and on files in a folder that is no known analysis.
+
+Run `python3 -m pytest test_batch.py` in this folder
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import multiprocessing
+import os
+
+import pytest
+
+import batch
+
+
+# #### Functions
+
+# Analysis that ends its worker process without raising, as when the worker runs out of memory
+def analyse_crash(path):
+    os._exit(1)
+
+
+def analyse_name(path):
+    return {'name': os.path.basename(path)}
+
+
+# The workers find the added analyses only when they are forked from this process
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='the workers are not forked')
+def test_crashed_worker(tmp_path, monkeypatch, capsys):
+    monkeypatch.setitem(batch.analyses, 'crash', analyse_crash)
+    monkeypatch.setitem(batch.analyses, 'name', analyse_name)
+    files = [(str(tmp_path / f'{index}.csv'), 'name') for index in range(20)]
+    files.insert(5, (str(tmp_path / 'crash.csv'), 'crash'))
+    store = batch.ResultStore(str(tmp_path / 'batch.sqlite'))
+
+    batch.run_batch(files, store, workers=2)
+
+    statuses = dict(store.connection.execute('SELECT path, status FROM runs'))
+    # Every file is recorded, the crashed file as failed, and the files after the crash are analysed by a new pool
+    assert set(statuses) == {path for path, _ in files}
+    assert statuses[str(tmp_path / 'crash.csv')] == 'failed'
+    assert statuses[files[-1][0]] == 'done'
+    assert 'BrokenProcessPool' in store.failures().set_index('path').loc[str(tmp_path / 'crash.csv'), 'error']
+
+
+def test_unknown_analysis(tmp_path):
+    (tmp_path / 'chamber').mkdir()
+    (tmp_path / 'friction').mkdir()
+    for folder in ('chamber', 'friction'):
+        (tmp_path / folder / 'O-ring_1bar.csv').write_text('')
+    files = batch.batch_files([str(tmp_path / '*' / '*.csv')])
+    assert sorted(analysis for _, analysis in files) == ['chamber', 'friction']
+
+    # A file in an unknown folder fails, instead of being analysed as a friction test
+    path, analysis, status, result, error, _ = batch.run_file(str(tmp_path / 'chamber' / 'O-ring_1bar.csv'), 'chamber')
+    assert status == 'failed' and result is None
+    assert 'Unknown analysis chamber' in error
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the ring buffer and the parsing of the stream of the ingestion server are checked.
+
+Run `python3 -m pytest test_ingestion.py` in this folder
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+import ingestion
+import leak_alarm
+
+
+# #### Global variables
+
+# A leaking air chamber, sampled every 100 ms instead of the 11 ms of the static tests
+chamber_test = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'appendix_compressed-air_chamber', 'data', 'Ultimaker_015.csv')
+
+
+# #### Functions
+
+# Writer of a connection that is only closed, the server does not answer
+class ClosedWriter:
+    def get_extra_info(self, name):
+        return None
+
+    def close(self):
+        pass
+
+
+# Server that keeps its closed sessions, to check their buffers and metrics
+class KeepingServer(ingestion.IngestionServer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.closed = []
+
+    def close_session(self, session):
+        super().close_session(session)
+        self.closed.append(session)
+
+
+# Function to stream the given bytes through the server and return its sessions
+def stream(data, **kwargs):
+    async def run():
+        server = KeepingServer(batch_size=4, **kwargs)
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        await server.handle(reader, ClosedWriter())
+        return server.closed
+    return asyncio.run(run())
+
+
+def test_ring_buffer_small_blocks():
+    ring = ingestion.RingBuffer(5, 1)
+    for block in np.arange(12.0).reshape(4, 3, 1):
+        ring.extend(block)
+    assert ring.count == 12
+    assert ring.view()[:, 0].tolist() == [7, 8, 9, 10, 11]
+
+
+def test_ring_buffer_block_larger_than_capacity():
+    ring = ingestion.RingBuffer(5, 1)
+    ring.extend(np.arange(3.0)[:, None])
+    ring.extend(np.arange(3.0, 15.0)[:, None])
+    # All samples are counted, and the last capacity samples are kept in the order they were received
+    assert ring.count == 15
+    assert ring.view()[:, 0].tolist() == [10, 11, 12, 13, 14]
+    ring.extend(np.array([[15.0], [16.0]]))
+    assert ring.view()[:, 0].tolist() == [12, 13, 14, 15, 16]
+
+
+def test_parse_lines_leaves_out_malformed_lines():
+    data = b'1 2 3 4 5 6 7\n8 9 10\n11 12 13 14 15 16 17\n18 19 x 21 22 23 24\n\n25 26 27 28 29 30 31\n'
+    samples, bad_lines = ingestion.parse_lines(data)
+    assert bad_lines == 2
+    # The samples after a malformed line keep their channels
+    assert samples[:, 0].tolist() == [1, 11, 25]
+    assert samples[:, -1].tolist() == [7, 17, 31]
+
+
+def test_stream_with_header_and_malformed_line():
+    lines = [' '.join(str(10 * i + j) for j in range(7)) for i in range(10)]
+    lines[4] = '40 41 42'
+    session, = stream(('# test=friction model=O-ring\n' + '\n'.join(lines)).encode())
+    assert session.header == {'test': 'friction', 'model': 'O-ring'}
+    # The last line has no line ending, but is still received
+    assert session.ring.count == 9
+    assert session.bad_lines == 1
+    assert session.ring.view()[:, 0].tolist() == [0, 10, 20, 30, 50, 60, 70, 80, 90]
+
+
+def test_metrics_take_the_model_of_the_header():
+    lines = '\n'.join(' '.join(str(10 * i + j) for j in range(7)) for i in range(10))
+    session, = stream(f'# test=friction model=X-ring257\n{lines}'.encode())
+    assert session.metrics[0].area == ingestion.bore_area('X-ring257')
+    session, = stream(f'# test=dynamic model=O-ring\n{lines}'.encode())
+    assert [metric.name for metric in session.metrics] == ['dynamic_leakage', 'wear']
+
+
+def test_header_without_required_model():
+    lines = '\n'.join(' '.join(str(10 * i + j) for j in range(7)) for i in range(10))
+    # The wear trend needs the bore of the cylinder, the stream is refused and no session is started
+    assert stream(f'# test=dynamic\n{lines}'.encode()) == []
+
+
+# Function to replay a recorded test through a server on a local TCP port, returns the snapshot of its session
+def replay_snapshot(path, test):
+    async def run():
+        server = ingestion.IngestionServer()
+        listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            await ingestion.replay(path, port=port, speed=0, test=test)
+            # The server closes the session after the replay client has closed the connection
+            for _ in range(500):
+                await asyncio.sleep(0.01)
+                if server.finished:
+                    break
+        return server.finished[0][1]
+    return asyncio.run(run())
+
+
+@pytest.mark.skipif(not os.path.isfile(chamber_test), reason='the air-chamber tests are not available')
+def test_chamber_alarm_time():
+    # The alarm time of the streamed chamber is the alarm time of the leak alarm on the recorded test
+    alarm, _, _ = leak_alarm.replay([chamber_test], 'airchamber')
+    snapshot = replay_snapshot(chamber_test, 'chamber')
+    assert alarm.alarm_time()[0] == pytest.approx(6.7, abs=0.1)
+    assert snapshot['leak_alarm']['Leaking']
+    assert snapshot['leak_alarm']['AlarmTime'] == pytest.approx(alarm.alarm_time()[0], abs=0.2)
+
+
+def test_finished_sessions_are_released():
+    lines = '\n'.join(' '.join(str(10 * i + j) for j in range(7)) for i in range(10))
+
+    async def run():
+        server = ingestion.IngestionServer(batch_size=4, history=2)
+        for _ in range(3):
+            reader = asyncio.StreamReader()
+            reader.feed_data(f'# test=friction model=O-ring\n{lines}'.encode())
+            reader.feed_eof()
+            await server.handle(reader, ClosedWriter())
+        return server
+    server = asyncio.run(run())
+    # No session is kept after its connection ended, only the snapshots of the last two
+    assert server.sessions == {}
+    assert [name for name, _ in server.finished] == ['unix#2', 'unix#3']
+    assert server.finished[-1][1]['samples'] == 10
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the detection of the start transient of a test is checked on hiccups and restarts of the time,
+and the data quality of a cached test is checked to be logged on every load.
+
+Run `python3 -m pytest test_loading.py` in this folder
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import logging
+
+import numpy as np
+
+import loading
+import memo
+
+
+# #### Functions
+
+# A pressure (in bar) that settles after a short transient, sampled every 10-11 ms
+def settling_test(n_samples=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    pressure = 3 + 0.5 * np.exp(-np.arange(n_samples) / 5) + 0.002 * rng.standard_normal(n_samples)
+    time = np.cumsum(rng.choice([10.0, 11.0], n_samples))
+    return pressure, time
+
+
+def test_hiccup_does_not_move_the_cut():
+    pressure, time = settling_test()
+    settled = loading.detect_transient(pressure)
+    # A single dropped sample after a hiccup of about 290 ms, well within the searched start of the test
+    time[200:] += 280
+    assert loading.detect_transient(pressure, time) == settled
+
+
+def test_restart_moves_the_cut():
+    pressure, time = settling_test()
+    # A gap of seconds, and time going back, are restarts of the acquisition
+    gap, reset = time.copy(), time.copy()
+    gap[200:] += 3000
+    reset[300:] -= reset[300]
+    assert loading.detect_transient(pressure, gap) == 200
+    assert loading.detect_transient(pressure, reset) == 300
+
+
+def test_cache_hit_logs_the_data_quality(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(memo, 'cache', memo.Cache(str(tmp_path / 'cache')))
+    pressure, time = settling_test()
+    test = np.zeros((len(time), len(loading.columns)))
+    test[:, loading.columns.index('Time')] = time
+    test[:, loading.columns.index('Pressure(bar)')] = pressure
+    # A missing stretch of the laser, which validation reports
+    test[1000:1200, loading.columns.index('Laser(mm)')] = np.nan
+    path = tmp_path / 'test.csv'
+    np.savetxt(path, test, delimiter='\t')
+
+    parsed = []
+    read_acquisition = loading.read_acquisition
+    monkeypatch.setattr(loading, 'read_acquisition', lambda *args, **kwargs: parsed.append(args) or read_acquisition(*args, **kwargs))
+
+    messages = []
+    for _ in range(2):
+        caplog.clear()
+        with caplog.at_level(logging.INFO, logger='loading'):
+            run_df = loading.cached_load_run(str(path), drop_amount='auto')
+        messages.append([record.getMessage() for record in caplog.records])
+
+    # The second load is a cache hit, with the same warnings and cut as the first
+    assert len(parsed) == 1
+    assert messages[0] == messages[1]
+    assert any('dropping the first' in message for message in messages[1])
+    assert any(record.levelno == logging.WARNING for record in caplog.records)
+    assert run_df.attrs['drop_amount'] == loading.detect_transient(pressure, time)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, loaded acquisitions are checked for the faults that otherwise show up as odd figures or errors later on.
+All checks are done column-wise on one array of the loaded channels:
+  - Time has to increase monotonically, and the spread (jitter) and gaps (dropped samples) of the intervals are reported
+  - every channel has to stay within its physical range
+  - a sensor that saturates stays at its maximum or minimum value for a long time (a plateau)
+  - missing values (NaN) are counted, and long runs of them are an error
+The result is a report per run, with an issue for every failed check. Errors make a run unusable, warnings do not.
+
+Run `python3 validation.py './data/friction/*.csv'` to validate acquisitions and print their issues
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+# #### Global variables
+
+# The physical range of every channel: time in ms, voltages of the data acquisition in V, position in mm,
+# pressure in bar (gauge) and force in N
+limits = {
+    'Time': (0, np.inf),
+    'A': (-10, 10),
+    'B': (-10, 10),
+    'C': (-10, 10),
+    'Laser(mm)': (-5, 45),
+    'Pressure(bar)': (-1, 10),
+    'Force(N)': (-1000, 1000),
+}
+# The channels of sensors that can saturate, the pressure is left out as it stays constant during a static test
+saturating = ['A','C','Laser(mm)','Force(N)']
+# A plateau at the maximum or minimum of a channel this long (in samples) is a saturated sensor
+plateau_length = 100
+# The longest run of missing values (in samples) that is still accepted
+max_nan_run = 10
+# Intervals longer than this times the median interval are gaps with dropped samples
+gap_factor = 1.75
+# Warn when the interval spread (standard deviation over median) or the part of the samples that was dropped is above these
+max_jitter = 0.25
+max_dropped = 0.02
+
+
+# #### Functions
+
+class ValidationError(ValueError):
+    def __init__(self, report):
+        self.report = report
+        super().__init__(f"{report.get('path', 'run')} failed validation: {summary(report)}")
+
+
+# Function to find the longest run of True in every column of a 2D mask
+def longest_runs(mask):
+    padded = np.zeros((mask.shape[1], mask.shape[0] + 2), dtype='bool')
+    padded[:, 1:-1] = mask.T
+    # Every run starts and ends with a change, the changes of each column come in (start, end) pairs
+    changes = np.flatnonzero(padded[:, 1:] != padded[:, :-1])
+    start, end = changes[0::2], changes[1::2]
+    longest = np.zeros(mask.shape[1], dtype='int64')
+    np.maximum.at(longest, start // (mask.shape[0] + 1), end - start)
+    return longest
+
+
+# Function to check a loaded run, returns the report with the measured values and the issues
+def validate_run(run_df, limits=limits, saturating=saturating, plateau_length=plateau_length, max_nan_run=max_nan_run,
+                 gap_factor=gap_factor, max_jitter=max_jitter, max_dropped=max_dropped):
+    channels = list(run_df.columns)
+    values = run_df.to_numpy(dtype='float64')
+    issues = []
+
+    def issue(check, channel, severity, message):
+        issues.append({'check': check, 'channel': channel, 'severity': severity, 'message': message})
+
+    if len(values) < 2:
+        issue('length', None, 'error', f'only {len(values)} samples')
+        return {'samples': len(values), 'status': 'error', 'issues': issues, 'channels': {}}
+
+    # All channels at once: missing values, extremes and range
+    missing = np.isnan(values)
+    nan_count = missing.sum(axis=0)
+    nan_run = longest_runs(missing)
+    with np.errstate(invalid='ignore'):
+        low = np.nanmin(np.where(missing.all(axis=0), 0, values), axis=0)
+        high = np.nanmax(np.where(missing.all(axis=0), 0, values), axis=0)
+    bounds = np.array([limits.get(channel, (-np.inf, np.inf)) for channel in channels], dtype='float64')
+    out_of_range = ((values < bounds[:, 0]) | (values > bounds[:, 1])).sum(axis=0)
+    # A saturated sensor stays at its extreme value, so the plateau is the longest run at the maximum or minimum
+    plateau_high, plateau_low = longest_runs(values == high), longest_runs(values == low)
+    plateau = np.maximum(plateau_high, plateau_low)
+
+    report = {'samples': len(values), 'channels': {}}
+    for i, channel in enumerate(channels):
+        report['channels'][channel] = {'min': float(low[i]), 'max': float(high[i]), 'nan': int(nan_count[i]),
+                                       'nan_run': int(nan_run[i]), 'out_of_range': int(out_of_range[i]), 'plateau': int(plateau[i])}
+        if nan_run[i] > max_nan_run:
+            issue('nan', channel, 'error', f'{nan_run[i]} missing values in a row ({nan_count[i]} in total)')
+        elif nan_count[i]:
+            issue('nan', channel, 'warning', f'{nan_count[i]} missing values')
+        if out_of_range[i]:
+            issue('range', channel, 'error', f'{out_of_range[i]} values outside {tuple(bounds[i])} (from {low[i]:g} to {high[i]:g})')
+        if channel in saturating and plateau[i] >= plateau_length and high[i] > low[i]:
+            issue('saturation', channel, 'error', f'{plateau[i]} samples in a row at {high[i] if plateau_high[i] >= plateau_low[i] else low[i]:g}')
+
+    # The time: monotonicity, jitter and dropped samples
+    if 'Time' in channels:
+        intervals = np.diff(values[:, channels.index('Time')])
+        backwards = int((intervals <= 0).sum())
+        median = float(np.nanmedian(intervals))
+        regular = intervals[(intervals > 0) & (intervals <= gap_factor * median)]
+        gaps = intervals[intervals > gap_factor * median]
+        dropped = int(np.round(gaps / median).sum() - len(gaps)) if median > 0 else 0
+        jitter = float(regular.std() / median) if median > 0 and len(regular) else np.nan
+        report['time'] = {'interval': median, 'jitter': jitter, 'backwards': backwards, 'gaps': len(gaps), 'dropped': dropped}
+        if backwards:
+            issue('monotonic', 'Time', 'error', f'time does not increase at {backwards} samples')
+        if jitter > max_jitter:
+            issue('jitter', 'Time', 'warning', f'interval spread of {jitter:.0%} of the {median:g} ms interval')
+        if dropped > max_dropped * len(values):
+            issue('dropped', 'Time', 'warning', f'{dropped} samples dropped in {len(gaps)} gaps')
+
+    report['status'] = 'error' if any(item['severity'] == 'error' for item in issues) else 'warning' if issues else 'ok'
+    report['issues'] = issues
+    return report
+
+
+# Function to describe the issues of a report in one line
+def summary(report):
+    if not report['issues']:
+        return 'ok'
+    return '; '.join(f"{item['severity']} {item['check']} {item['channel'] or ''}: {item['message']}" for item in report['issues'])
+
+
+if __name__ == '__main__':
+    from archive import find_acquisitions
+    from loading import columns, load_run
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('patterns', nargs='+', help='files or glob patterns of the acquisitions')
+    args = parser.parse_args()
+
+    rows = []
+    for path in sorted(path for pattern in args.patterns for path in find_acquisitions(pattern)):
+        report = load_run(path, columns, drop_amount=0).attrs['validation']
+        rows.append({'path': path, 'status': report['status'], 'issues': summary(report)})
+    print(pd.DataFrame(rows).to_string(index=False))
+    print(f'\n ------ Succesfully validated {len(rows)} acquisitions ------')
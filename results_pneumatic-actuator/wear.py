@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+In this module, the wear of a seal is followed cycle by cycle over long (endurance) tests.
+The test is read in blocks and every completed extend and retract cycle is reduced to its metrics:
+  - the friction force range, the mean friction force above and below the mean of the cycle (as in calculate_se())
+  - the pressure at position alpha, as in the dynamic leakage test
+  - the duration and stroke of the cycle
+A cycle starts each time the piston passes low_position on the way down, after it passed high_position.
+Only the samples of the unfinished cycle are kept between blocks, and the trend of every metric is fitted
+with an online linear regression over the cycle number, so the memory does not grow with the length of the test.
+The fitted rate of every metric is extrapolated to the cycle at which it reaches its wear limit (the lifetime).
+The start transient is not dropped and the test is not validated, the first (incomplete) cycle is left out.
+
+Run `python3 wear.py './data/dynamic/*.csv'` to write the cycles of every test and the fitted rates to ./data/derived/wear
+"""
+
+__author__ = "Eva Zillen"
+__copyright__ = "Copyright 2021, TU Delft Biomechanical Design"
+__credits__ = ["Eva Zillen, Heike Vallery, Gerwin Smit"]
+__license__ = "CC0-1.0 License"
+__version__ = "1.0.0"
+__maintainer__ = "Eva Zillen"
+__email__ = "e.zillen@student.tudelft.nl"
+
+
+# #### Imports
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from archive import find_acquisitions, iter_acquisition
+from friction import friction_kernel
+from loading import columns
+from metadata import bore_area
+
+
+# #### Global variables
+
+# The positions (in mm) of the laser that mark the low and high part of a cycle
+low_position = 8
+high_position = 28
+# The position (in mm) and margin where the pressure is compared, as in results_dynamic_leakage.py
+alpha = 37.7
+margin = 0.02
+# The longest cycle (in samples), the samples of a longer unfinished cycle are dropped (e.g. when the piston stands still)
+max_cycle = 2**14
+# The number of rows parsed at once
+block_size = 2**16
+# The value of a metric at the end of the lifetime, relative to its fitted value at the first cycle
+# The friction increases when a seal wears, the pressure at alpha drops when it leaks more
+wear_limits = {'FrictionRange': 1.5, 'PressureAlpha': 0.8}
+# The metrics of every cycle
+cycle_columns = ['Cycle','Time(s)','Duration(s)','Stroke(mm)','FrictionFrom','FrictionTo','FrictionRange','PressureAlpha','Samples']
+# The location of the cycle tables and fitted rates
+wear_dir = './data/derived/wear'
+
+
+# #### Functions
+
+class OnlineRegression:
+    # Least squares line y = intercept + slope * x, updated with blocks of points
+    # Only the count, means and co-moments are kept, blocks are combined as in a parallel variance calculation
+    def __init__(self):
+        self.n = 0
+        self.mean_x = self.mean_y = 0.0
+        self.cxx = self.cxy = self.cyy = 0.0
+
+    def update(self, x, y):
+        x, y = np.asarray(x, dtype='float64'), np.asarray(y, dtype='float64')
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[valid], y[valid]
+        if len(x) == 0:
+            return
+        n, mean_x, mean_y = len(x), x.mean(), y.mean()
+        total = self.n + n
+        dx, dy = mean_x - self.mean_x, mean_y - self.mean_y
+        self.cxx += ((x - mean_x)**2).sum() + dx * dx * self.n * n / total
+        self.cxy += ((x - mean_x) * (y - mean_y)).sum() + dx * dy * self.n * n / total
+        self.cyy += ((y - mean_y)**2).sum() + dy * dy * self.n * n / total
+        self.mean_x += dx * n / total
+        self.mean_y += dy * n / total
+        self.n = total
+
+    # Returns the slope, intercept and the standard error of the slope
+    def fit(self):
+        if self.n < 3 or self.cxx == 0:
+            return np.nan, self.mean_y if self.n else np.nan, np.nan
+        slope = self.cxy / self.cxx
+        residual = max(self.cyy - slope * self.cxy, 0) / (self.n - 2)
+        return slope, self.mean_y - slope * self.mean_x, np.sqrt(residual / self.cxx)
+
+
+# Function to give the cycle at which a line reaches the wear limit (relative to its value at cycle 0)
+# A metric that does not move towards its limit gives an infinite lifetime, too few cycles give NaN
+def lifetime(slope, intercept, limit):
+    if np.isnan(slope):
+        return np.nan
+    failure = limit * intercept
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cycles = (failure - intercept) / slope
+    return cycles if np.isfinite(cycles) and cycles > 0 else np.inf
+
+
+class CycleTracker:
+    # Splits a stream of samples (time in ms, laser in mm, pressure in bar, force in N) into cycles
+    channels = ['Time','Laser(mm)','Pressure(bar)','Force(N)']
+
+    def __init__(self, area, alpha=alpha, margin=margin, low=low_position, high=high_position, max_cycle=max_cycle):
+        self.area, self.alpha, self.margin, self.low, self.high, self.max_cycle = area, alpha, margin, low, high, max_cycle
+        # The samples since the start of the unfinished cycle, and the position state carried into its first sample
+        self.pending = np.empty((0, len(self.channels)))
+        self.state = 0
+        # Whether the pending samples start at a cycle boundary, the samples before the first boundary are no cycle
+        self.aligned = False
+        self.cycles = 0
+        self.trends = {metric: OnlineRegression() for metric in wear_limits}
+        self.duration = 0.0
+
+    # Function to add a block of samples (samples, channels), returns the metrics of the cycles completed in the block
+    def update(self, block):
+        samples = np.concatenate((self.pending, np.asarray(block, dtype='float64')))
+        time, laser, pressure, force = samples.T
+
+        # Label the samples low (-1) or high (1) with hysteresis, the label is carried from the start of the pending samples
+        event = np.where(laser < self.low, -1, np.where(laser > self.high, 1, 0))
+        last = np.maximum.accumulate(np.where(event != 0, np.arange(len(event)), -1))
+        state = np.where(last >= 0, event[np.maximum(last, 0)], self.state)
+        previous = np.concatenate(([self.state], state[:-1]))
+        boundaries = np.flatnonzero((state == -1) & (previous == 1))
+
+        starts = np.concatenate(([0] if self.aligned else [], boundaries)).astype('int64')
+        cycles = self.measure(samples, starts)
+        if len(boundaries):
+            self.aligned = True
+            self.state = -1
+            self.pending = samples[boundaries[-1]:]
+        else:
+            self.pending = samples
+        # A cycle this long is no cycle, only its end is kept and the cycle is left out
+        if len(self.pending) > self.max_cycle:
+            cut = len(self.pending) - self.max_cycle
+            self.state = state[len(samples) - len(self.pending) + cut - 1]
+            self.pending = self.pending[cut:]
+            self.aligned = False
+        return cycles
+
+    # Function to calculate the metrics of the cycles between the starts, all cycles at once
+    def measure(self, samples, starts):
+        if len(starts) < 2:
+            return pd.DataFrame(columns=cycle_columns)
+        part = samples[starts[0]:starts[-1]]
+        offsets = starts - starts[0]
+        time, laser, pressure, force = part.T
+        first, lengths = offsets[:-1], np.diff(offsets)
+
+        _, _, friction_from, friction_to = friction_kernel(pressure, force, offsets, np.full(len(first), self.area))
+        at_alpha = np.abs(laser - self.alpha) < self.margin
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pressure_alpha = np.add.reduceat(np.where(at_alpha, pressure, 0), first) / np.add.reduceat(at_alpha, first)
+        cycle = self.cycles + np.arange(len(first))
+        self.cycles += len(first)
+
+        cycles = pd.DataFrame({
+            'Cycle': cycle,
+            'Time(s)': time[first] / 1000,
+            'Duration(s)': (samples[starts[1:], 0] - samples[starts[:-1], 0]) / 1000,
+            'Stroke(mm)': np.maximum.reduceat(laser, first) - np.minimum.reduceat(laser, first),
+            'FrictionFrom': friction_from,
+            'FrictionTo': friction_to,
+            'FrictionRange': friction_from - friction_to,
+            'PressureAlpha': pressure_alpha,
+            'Samples': lengths,
+        })
+        for metric, trend in self.trends.items():
+            trend.update(cycles['Cycle'], cycles[metric])
+        self.duration += cycles['Duration(s)'].sum()
+        return cycles
+
+    # Function to give the fitted rate (per 1000 cycles) and the lifetime of every metric
+    def result(self):
+        result = {'Cycles': self.cycles}
+        mean_duration = self.duration / self.cycles if self.cycles else np.nan
+        for metric, trend in self.trends.items():
+            slope, intercept, slope_se = trend.fit()
+            cycles = lifetime(slope, intercept, wear_limits[metric])
+            result.update({f'{metric}_start': intercept, f'{metric}_rate': slope * 1000, f'{metric}_rate_se': slope_se * 1000,
+                           f'{metric}_lifetime_cycles': cycles, f'{metric}_lifetime_hours': cycles * mean_duration / 3600})
+        return result
+
+
+class WearMetric:
+    # The wear trend of a streamed dynamic or endurance test (see ingestion.py), the model gives the bore of the cylinder
+    name = 'wear'
+
+    def __init__(self, model, **kwargs):
+        self.tracker = CycleTracker(bore_area(model), **kwargs)
+        self.indices = [columns.index(channel) for channel in CycleTracker.channels]
+
+    def update(self, batch):
+        self.tracker.update(batch[:, self.indices])
+
+    def result(self):
+        return self.tracker.result()
+
+
+# Function to follow the wear of a test, read in blocks of rows
+# The cycles are appended to a .csv (when given) block by block, returns the fitted rates and lifetimes
+def wear_trend(path, model='O-ring', output=None, block_size=block_size, **kwargs):
+    tracker = CycleTracker(bore_area(model), **kwargs)
+    if output is not None:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        pd.DataFrame(columns=cycle_columns).to_csv(output, index=False)
+    blocks = iter_acquisition(path, block_size, delimiter=r'\s+', header=None, names=columns, usecols=CycleTracker.channels,
+                              dtype={channel: 'float64' for channel in CycleTracker.channels})
+    for block in blocks:
+        cycles = tracker.update(block[CycleTracker.channels].to_numpy())
+        if output is not None and len(cycles):
+            cycles.to_csv(output, mode='a', header=False, index=False)
+    return tracker.result()
+
+
+if __name__ == '__main__':
+    from batch import file_model
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('patterns', nargs='+', help='files or glob patterns of the acquisitions')
+    parser.add_argument('--alpha', type=float, default=alpha)
+    parser.add_argument('--output', default=wear_dir)
+    args = parser.parse_args()
+
+    rates = []
+    for path in sorted(path for pattern in args.patterns for path in find_acquisitions(pattern)):
+        model, _ = file_model(path)
+        name = os.path.splitext(os.path.basename(path))[0]
+        rates.append({'path': path, 'model': model, **wear_trend(path, model, os.path.join(args.output, f'{name}_cycles.csv'), alpha=args.alpha)})
+
+    rates = pd.DataFrame(rates)
+    os.makedirs(args.output, exist_ok=True)
+    rates.to_csv(os.path.join(args.output, 'wear_rates.csv'), index=False)
+    print(rates[['path','Cycles','FrictionRange_rate','FrictionRange_lifetime_cycles','PressureAlpha_rate','PressureAlpha_lifetime_cycles']].round(3).to_string(index=False))
+    print(f'\n ------ Succesfully saved the cycles and wear rates to {args.output} ------')